@@ -0,0 +1,51 @@
+"""Status pengiriman broadcast per target (tabel ``broadcast_deliveries``).
+
+Setiap putaran broadcast diberi nomor ``round``; baris target ditimpa saat
+putaran baru mengirim ke target tersebut. Target yang sudah ``sent`` pada
+putaran berjalan dilewati ketika broadcast dilanjutkan setelah terputus.
+"""
+from __future__ import annotations
+
+from typing import Dict, Optional, Sequence, Set
+
+from core.infra.database import get_db_connection, transaction
+
+
+def fetch_sent_targets(task_id: int, round_no: int) -> Set[int]:
+    rows = get_db_connection().execute(
+        "SELECT target FROM broadcast_deliveries WHERE task_id = ? AND round = ? AND status = 'sent'",
+        (task_id, round_no),
+    ).fetchall()
+    return {row['target'] for row in rows}
+
+
+def record_delivery(
+    task_id: int,
+    target: int,
+    round_no: int,
+    ok: bool,
+    attempts: int,
+    error: Optional[str] = None,
+) -> None:
+    with transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO broadcast_deliveries "
+            "(task_id, target, round, status, attempts, sent_at, error, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, CASE WHEN ? THEN CURRENT_TIMESTAMP END, ?, CURRENT_TIMESTAMP)",
+            (task_id, target, round_no, 'sent' if ok else 'failed', attempts, ok, error),
+        )
+
+
+def fetch_pool_memberships(userbot_ids: Sequence[int]) -> Dict[int, Set[int]]:
+    """Chat yang diikuti tiap akun pada pool, berdasarkan tabel ``groups`` (hasil sync_groups)."""
+    memberships: Dict[int, Set[int]] = {userbot_id: set() for userbot_id in userbot_ids}
+    if not userbot_ids:
+        return memberships
+    placeholders = ', '.join('?' for _ in userbot_ids)
+    rows = get_db_connection().execute(
+        f"SELECT userbot_id, telegram_group_id FROM groups WHERE userbot_id IN ({placeholders})",
+        tuple(userbot_ids),
+    ).fetchall()
+    for row in rows:
+        memberships[row['userbot_id']].add(row['telegram_group_id'])
+    return memberships
@@ -0,0 +1,34 @@
+"""Akses kunci-nilai pada tabel ``config``.
+
+Kolom ``userbot_id`` bernilai NULL untuk konfigurasi global. SQLite
+menganggap setiap NULL berbeda pada constraint UNIQUE, sehingga penyimpanan
+memakai UPDATE lalu INSERT bila belum ada baris, bukan ``ON CONFLICT``.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from core.infra.database import get_db_connection, transaction
+
+
+def get_config_value(key: str, userbot_id: Optional[int] = None) -> Optional[str]:
+    row = get_db_connection().execute(
+        "SELECT value FROM config WHERE key = ? AND userbot_id IS ?", (key, userbot_id)
+    ).fetchone()
+    return row['value'] if row else None
+
+
+def set_config_value(key: str, value: str, userbot_id: Optional[int] = None) -> None:
+    with transaction() as conn:
+        cursor = conn.execute(
+            "UPDATE config SET value = ? WHERE key = ? AND userbot_id IS ?", (value, key, userbot_id)
+        )
+        if cursor.rowcount == 0:
+            conn.execute(
+                "INSERT INTO config (userbot_id, key, value) VALUES (?, ?, ?)", (userbot_id, key, value)
+            )
+
+
+def delete_config_value(key: str, userbot_id: Optional[int] = None) -> None:
+    with transaction() as conn:
+        conn.execute("DELETE FROM config WHERE key = ? AND userbot_id IS ?", (key, userbot_id))
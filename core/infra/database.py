@@ -1,21 +1,339 @@
 import sqlite3
 import os
 import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Tuple
 
 # Siapkan logger untuk modul database
 logger = logging.getLogger(__name__)
 
 DB_FILE = os.path.join('data', 'userbots.db')
+BUSY_TIMEOUT_MS = 5000
+# Ukuran cache prepared statement per koneksi (sqlite3 menyimpan statement yang sudah dikompilasi).
+STATEMENT_CACHE_SIZE = 256
 
-def get_db_connection():
-    """Membuat dan mengembalikan koneksi ke database SQLite."""
-    # Pastikan direktori 'data' ada
-    os.makedirs(os.path.dirname(DB_FILE), exist_ok=True)
+_local = threading.local()
+_connections: List[sqlite3.Connection] = []
+_connections_lock = threading.Lock()
+# Dinaikkan oleh close_db_connections agar thread lain membuka koneksi baru.
+_generation = 0
+_data_dir_ready = False
 
-    conn = sqlite3.connect(DB_FILE)
+
+def _connect() -> sqlite3.Connection:
+    """Buka koneksi baru dengan pengaturan WAL, synchronous=NORMAL, dan busy timeout."""
+    global _data_dir_ready
+    if not _data_dir_ready:
+        # Pastikan direktori 'data' ada (cukup sekali per proses)
+        os.makedirs(os.path.dirname(DB_FILE), exist_ok=True)
+        _data_dir_ready = True
+
+    conn = sqlite3.connect(
+        DB_FILE,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,
+    )
     conn.row_factory = sqlite3.Row
+    # WAL membuat wizard dan userbot bisa membaca sambil ada penulisan berjalan.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return conn
+
+
+def get_db_connection() -> sqlite3.Connection:
+    """
+    Mengembalikan koneksi SQLite thread-local yang dipakai ulang.
+
+    Koneksi dibuat sekali per thread dan tetap terbuka; pemanggil tidak boleh
+    menutupnya. Gunakan :func:`transaction` untuk operasi tulis.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'generation', None) != _generation:
+        conn = _connect()
+        with _connections_lock:
+            _connections.append(conn)
+            _local.conn = conn
+            _local.generation = _generation
     return conn
 
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """Jalankan blok dalam satu transaksi: commit bila sukses, rollback bila error."""
+    conn = get_db_connection()
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+
+def close_db_connections() -> None:
+    """Tutup semua koneksi thread-local. Dipanggil saat layanan berhenti."""
+    global _generation
+    with _connections_lock:
+        connections = list(_connections)
+        _connections.clear()
+        _generation += 1
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:  # pragma: no cover - koneksi sudah rusak
+            pass
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> set:
+    return {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _migrate_group_columns(conn: sqlite3.Connection) -> None:
+    """Tambahkan kolom group_type & username pada instalasi lama."""
+    columns = _table_columns(conn, 'groups')
+    if 'group_type' not in columns:
+        conn.execute("ALTER TABLE groups ADD COLUMN group_type TEXT")
+    if 'username' not in columns:
+        conn.execute("ALTER TABLE groups ADD COLUMN username TEXT")
+
+
+def _migrate_hot_path_indexes(conn: sqlite3.Connection) -> None:
+    """Indeks untuk query yang dipakai runner dan layar wizard."""
+    # Runner: WHERE status = ? ORDER BY id
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status, id)")
+    # Job Status / Stop Jobs: WHERE userbot_id = ? ORDER BY id DESC
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_userbot ON tasks(userbot_id, id)")
+    # Watcher Logs: WHERE userbot_id = ? AND command = ? ORDER BY id DESC
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_userbot_command ON tasks(userbot_id, command, id)")
+    # Daftar grup (covering): WHERE userbot_id = ? [AND group_type = ?] ORDER BY group_name
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_groups_userbot_type_name "
+        "ON groups(userbot_id, group_type, group_name, telegram_group_id, username)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_groups_userbot_name "
+        "ON groups(userbot_id, group_name, telegram_group_id, group_type, username)"
+    )
+
+
+def _migrate_task_archive(conn: sqlite3.Connection) -> None:
+    """Kolom updated_at untuk umur task dan tabel arsip untuk retensi."""
+    if 'updated_at' not in _table_columns(conn, 'tasks'):
+        conn.execute("ALTER TABLE tasks ADD COLUMN updated_at TIMESTAMP")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS tasks_archive (
+        id INTEGER PRIMARY KEY,
+        userbot_id INTEGER NOT NULL,
+        process_id TEXT NOT NULL,
+        command TEXT NOT NULL,
+        status TEXT NOT NULL,
+        start_time TIMESTAMP,
+        updated_at TIMESTAMP,
+        details TEXT,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_archive_userbot ON tasks_archive(userbot_id, id)")
+
+
+def _migrate_sheet_spool(conn: sqlite3.Connection) -> None:
+    """Spool baris Google Sheets per watcher (lihat core.infra.sheet_spool)."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sheet_spool (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        process_id TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sheet_spool_process ON sheet_spool(process_id, id)")
+
+
+def _migrate_telethon_entities(conn: sqlite3.Connection) -> None:
+    """Cache entitas Telethon per userbot (lihat services.userbot.entity_session)."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS telethon_entities (
+        userbot_id INTEGER NOT NULL,
+        entity_id INTEGER NOT NULL,
+        access_hash INTEGER NOT NULL,
+        username TEXT,
+        phone TEXT,
+        name TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (userbot_id, entity_id),
+        FOREIGN KEY(userbot_id) REFERENCES userbots(id)
+    ) WITHOUT ROWID
+    """)
+
+
+def _migrate_broadcast_deliveries(conn: sqlite3.Connection) -> None:
+    """Status pengiriman broadcast per (task, target) untuk melanjutkan broadcast yang terputus."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+        task_id INTEGER NOT NULL,
+        target INTEGER NOT NULL,
+        round INTEGER NOT NULL DEFAULT 1,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        sent_at TIMESTAMP,
+        error TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (task_id, target)
+    ) WITHOUT ROWID
+    """)
+
+
+def _migrate_task_next_run(conn: sqlite3.Connection) -> None:
+    """Kolom next_run_at untuk scheduler broadcast (UTC, format 'YYYY-MM-DD HH:MM:SS')."""
+    if 'next_run_at' not in _table_columns(conn, 'tasks'):
+        conn.execute("ALTER TABLE tasks ADD COLUMN next_run_at TIMESTAMP")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_next_run ON tasks(next_run_at) WHERE next_run_at IS NOT NULL")
+
+
+def _migrate_runner_workers(conn: sqlite3.Connection) -> None:
+    """Registry worker runner untuk mode sharding (lihat core.infra.worker_registry)."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS runner_workers (
+        worker_id TEXT PRIMARY KEY,
+        pid INTEGER,
+        started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        heartbeat_at TIMESTAMP NOT NULL
+    )
+    """)
+
+
+def _migrate_task_leases(conn: sqlite3.Connection) -> None:
+    """Kolom klaim task: runner pemegang (worker_id) dan batas lease (UTC)."""
+    columns = _table_columns(conn, 'tasks')
+    if 'worker_id' not in columns:
+        conn.execute("ALTER TABLE tasks ADD COLUMN worker_id TEXT")
+    if 'lease_until' not in columns:
+        conn.execute("ALTER TABLE tasks ADD COLUMN lease_until TIMESTAMP")
+
+
+def _migrate_sheet_spool_dead_letter(conn: sqlite3.Connection) -> None:
+    """Kolom dead-letter sheet_spool dan indeks process_id arsip untuk drainer spool yatim."""
+    columns = _table_columns(conn, 'sheet_spool')
+    if 'failed_at' not in columns:
+        conn.execute("ALTER TABLE sheet_spool ADD COLUMN failed_at TIMESTAMP")
+    if 'error' not in columns:
+        conn.execute("ALTER TABLE sheet_spool ADD COLUMN error TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_archive_process ON tasks_archive(process_id)")
+
+
+# Migrasi berurutan; versi tersimpan di PRAGMA user_version. Jangan ubah migrasi
+# yang sudah dirilis, tambahkan entri baru di akhir daftar.
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "kolom group_type & username pada groups", _migrate_group_columns),
+    (2, "indeks query tasks & groups", _migrate_hot_path_indexes),
+    (3, "tasks.updated_at & tabel tasks_archive", _migrate_task_archive),
+    (4, "tabel sheet_spool", _migrate_sheet_spool),
+    (5, "tabel telethon_entities", _migrate_telethon_entities),
+    (6, "tabel broadcast_deliveries", _migrate_broadcast_deliveries),
+    (7, "tasks.next_run_at", _migrate_task_next_run),
+    (8, "tabel runner_workers", _migrate_runner_workers),
+    (9, "tasks.worker_id & tasks.lease_until", _migrate_task_leases),
+    (10, "dead-letter sheet_spool", _migrate_sheet_spool_dead_letter),
+]
+
+
+def apply_migrations(conn: sqlite3.Connection) -> int:
+    """Jalankan migrasi yang belum diterapkan, masing-masing dalam satu transaksi."""
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Baca ulang di dalam transaksi: proses lain mungkin sudah bermigrasi.
+            current = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version <= current:
+                conn.rollback()
+                continue
+            migrate(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        current = version
+        logger.info("Migrasi database v%s diterapkan: %s", version, description)
+    return current
+
+
+# Query utama beserta indeks yang wajib dipakai (lihat audit_query_plans).
+HOT_QUERIES: List[Tuple[str, str, Tuple[Any, ...], str]] = [
+    (
+        "runner: task pending",
+        "SELECT * FROM tasks WHERE status = 'pending' ORDER BY id",
+        (),
+        "idx_tasks_status",
+    ),
+    (
+        "runner: permintaan stop",
+        "SELECT id, userbot_id, process_id, worker_id, "
+        "(lease_until IS NULL OR lease_until < datetime('now')) AS lease_expired "
+        "FROM tasks WHERE status = 'stop_requested' ORDER BY id",
+        (),
+        "idx_tasks_status",
+    ),
+    (
+        "wizard: daftar task userbot",
+        "SELECT id, process_id, command, status, start_time, details FROM tasks WHERE userbot_id = ? "
+        "ORDER BY id DESC LIMIT ? OFFSET ?",
+        (1, 10, 0),
+        "idx_tasks_userbot",
+    ),
+    (
+        "wizard: task per command",
+        "SELECT id, process_id, command, status, start_time, details FROM tasks "
+        "WHERE userbot_id = ? AND command = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+        (1, 'watcher', 8, 0),
+        "idx_tasks_userbot_command",
+    ),
+    (
+        "wizard: stop jobs aktif",
+        "SELECT id, process_id, command, status, start_time, details FROM tasks "
+        "WHERE userbot_id = ? AND status IN (?, ?, ?, ?, ?) ORDER BY id DESC LIMIT ? OFFSET ?",
+        (1, 'pending', 'claimed', 'running', 'scheduled', 'interval', 10, 0),
+        "idx_tasks_userbot",
+    ),
+    (
+        "wizard: grup per tipe",
+        "SELECT telegram_group_id, group_name, group_type, username FROM groups "
+        "WHERE userbot_id = ? AND group_type = ? ORDER BY group_name",
+        (1, 'group'),
+        "idx_groups_userbot_type_name",
+    ),
+    (
+        "wizard: semua grup",
+        "SELECT telegram_group_id, group_name, group_type, username FROM groups WHERE userbot_id = ? ORDER BY group_name",
+        (1,),
+        "idx_groups_userbot_name",
+    ),
+    (
+        "watcher: spool Sheets",
+        "SELECT id, payload FROM sheet_spool WHERE process_id = ? AND failed_at IS NULL ORDER BY id LIMIT ?",
+        ('watcher-1', 50),
+        "idx_sheet_spool_process",
+    ),
+]
+
+
+def audit_query_plans(conn: sqlite3.Connection) -> List[Tuple[str, str, bool]]:
+    """Periksa EXPLAIN QUERY PLAN untuk HOT_QUERIES: (nama, plan, memakai indeks yang diharapkan)."""
+    results = []
+    for name, sql, params, index_name in HOT_QUERIES:
+        plan_rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        plan = " | ".join(row['detail'] for row in plan_rows)
+        uses_index = index_name in plan and 'USE TEMP B-TREE' not in plan
+        results.append((name, plan, uses_index))
+    return results
+
+
 def initialize_database():
     """
     Inisialisasi database dan membuat tabel jika belum ada.
@@ -44,7 +362,7 @@ def initialize_database():
             userbot_id INTEGER NOT NULL,
             process_id TEXT NOT NULL UNIQUE,
             command TEXT NOT NULL, -- 'auto_reply', 'watcher', 'broadcast'
-            status TEXT NOT NULL, -- 'running', 'stopped', 'error'
+            status TEXT NOT NULL, -- 'pending', 'running', 'stop_requested', 'stopped', 'error', ...
             start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             details TEXT, -- JSON dengan detail seperti target grup, keywords, dll.
             FOREIGN KEY(userbot_id) REFERENCES userbots(id)
@@ -78,24 +396,14 @@ def initialize_database():
         )
         """)
 
-        # Pastikan kolom baru tersedia pada instalasi lama.
-        try:
-            cursor.execute("ALTER TABLE groups ADD COLUMN group_type TEXT")
-        except sqlite3.OperationalError:
-            pass
-        try:
-            cursor.execute("ALTER TABLE groups ADD COLUMN username TEXT")
-        except sqlite3.OperationalError:
-            pass
-
         conn.commit()
-        logger.info("Database berhasil diinisialisasi. Semua tabel sudah siap.")
+        version = apply_migrations(conn)
+        logger.info("Database berhasil diinisialisasi (schema v%s). Semua tabel sudah siap.", version)
     except sqlite3.Error as e:
         logger.error(f"Terjadi kesalahan saat inisialisasi database: {e}")
-        raise
-    finally:
         if 'conn' in locals() and conn:
-            conn.close()
+            conn.rollback()
+        raise
 
 if __name__ == '__main__':
     # Setup basic logging for standalone execution
@@ -103,3 +411,10 @@ if __name__ == '__main__':
     print("Menjalankan inisialisasi database...")
     initialize_database()
     print("Inisialisasi selesai.")
+
+    print("Audit query plan:")
+    failed = 0
+    for name, plan, ok in audit_query_plans(get_db_connection()):
+        failed += 0 if ok else 1
+        print(f"  [{'OK' if ok else 'GAGAL'}] {name}: {plan}")
+    raise SystemExit(1 if failed else 0)
@@ -2,19 +2,34 @@
 from __future__ import annotations
 
 import asyncio
+import json
+import logging
 import os
 import re
+import threading
+import time
+from datetime import datetime, timedelta
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Iterable, Optional, Sequence
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 import gspread
 from google.oauth2.service_account import Credentials
 from gspread.exceptions import APIError, SpreadsheetNotFound, WorksheetNotFound
+from requests.exceptions import RequestException
+
+from core.infra.config_store import delete_config_value, get_config_value, set_config_value
 
 DEFAULT_CREDENTIAL_PATH = Path("credentials/service_account.json")
 DEFAULT_SCOPES = ("https://www.googleapis.com/auth/spreadsheets",)
 ENV_CREDENTIAL_PATH = "GOOGLE_SHEETS_CREDENTIAL_FILE"
+# Handle spreadsheet/worksheet di-cache sebentar agar watcher berikutnya tidak membuka ulang.
+WORKSHEET_CACHE_TTL = 600.0
+# Token diperbarui di latar belakang bila sisa umurnya kurang dari margin ini.
+TOKEN_REFRESH_MARGIN = timedelta(minutes=10)
+TOKEN_REFRESH_CHECK_INTERVAL = 300.0
+
+logger = logging.getLogger(__name__)
 
 
 class GoogleSheetsError(RuntimeError):
@@ -37,6 +52,31 @@ class GoogleSheetsConfigError(GoogleSheetsError):
     """Raised when the provided sheet reference is not valid."""
 
 
+class GoogleSheetsTransientError(GoogleSheetsError):
+    """Raised for quota (429) and server (5xx) errors that are worth retrying."""
+
+
+def _status_code(exc: APIError) -> Optional[int]:
+    return getattr(getattr(exc, "response", None), "status_code", None)
+
+
+def _translate_write_error(exc: Exception) -> GoogleSheetsError:
+    if isinstance(exc, APIError):
+        status = _status_code(exc)
+        if status == 429 or (status is not None and status >= 500):
+            return GoogleSheetsTransientError(f"Google Sheets sibuk (HTTP {status}).")
+        if status == 403:
+            return GoogleSheetsPermissionError("Service account tidak memiliki akses menulis ke sheet.")
+        if status == 404:
+            return GoogleSheetsNotFoundError("Spreadsheet atau worksheet tujuan sudah tidak ada.")
+        return GoogleSheetsError(f"API Google Sheets menolak penulisan (HTTP {status}).")
+    if isinstance(exc, (RequestException, OSError, TimeoutError)):
+        # Timeout / koneksi putus dianggap sementara.
+        return GoogleSheetsTransientError(f"Gagal menghubungi Google Sheets: {exc}")
+    # Selain itu (TypeError, ValueError, ...) berasal dari isi baris; mengulang tidak akan membantu.
+    return GoogleSheetsError(f"Baris tidak dapat ditulis ke Google Sheets: {exc!r}")
+
+
 def _resolve_credential_path(path: Path) -> Path:
     """Resolve credential file with fallbacks (env var / auto-detect)."""
 
@@ -69,25 +109,145 @@ def _resolve_credential_path(path: Path) -> Path:
     )
 
 
-def _authorize_client(
-    credential_path: Path | None = None,
-    scopes: Sequence[str] | None = None,
-) -> gspread.Client:
+@dataclass(slots=True)
+class _ClientEntry:
+    client: Any
+    credentials: Any
+
+
+@dataclass(slots=True)
+class _HandleEntry:
+    spreadsheet: Any
+    worksheet: Any
+    expires_at: float
+
+
+# Satu klien terotorisasi per (file kredensial, scopes) untuk seluruh proses.
+_clients: Dict[Tuple[str, Tuple[str, ...]], _ClientEntry] = {}
+_handles: Dict[Tuple[str, Tuple[str, ...], str], _HandleEntry] = {}
+_cache_lock = threading.Lock()
+_refresh_task: Optional[asyncio.Task[None]] = None
+# Header yang sudah diverifikasi per (spreadsheet_id, worksheet_id); cerminan dari tabel config.
+_verified_headers: Dict[Tuple[str, int], Tuple[str, ...]] = {}
+
+
+def _header_config_key(spreadsheet_id: str, worksheet_id: int) -> str:
+    return f"sheets_header:{spreadsheet_id}:{worksheet_id}"
+
+
+def _load_verified_header(spreadsheet_id: str, worksheet_id: int) -> Optional[Tuple[str, ...]]:
+    cache_key = (spreadsheet_id, worksheet_id)
+    if cache_key in _verified_headers:
+        return _verified_headers[cache_key]
+    value = get_config_value(_header_config_key(spreadsheet_id, worksheet_id))
+    if value is None:
+        return None
+    try:
+        header = tuple(json.loads(value))
+    except (TypeError, ValueError):
+        return None
+    _verified_headers[cache_key] = header
+    return header
+
+
+def _store_verified_header(spreadsheet_id: str, worksheet_id: int, header: Tuple[str, ...]) -> None:
+    set_config_value(_header_config_key(spreadsheet_id, worksheet_id), json.dumps(list(header)))
+    _verified_headers[(spreadsheet_id, worksheet_id)] = header
+
+
+def _forget_verified_header(spreadsheet_id: str, worksheet_id: int) -> None:
+    _verified_headers.pop((spreadsheet_id, worksheet_id), None)
+    delete_config_value(_header_config_key(spreadsheet_id, worksheet_id))
+
+
+def _client_key(credential_path: Path | None, scopes: Sequence[str] | None) -> Tuple[str, Tuple[str, ...]]:
     path = credential_path or DEFAULT_CREDENTIAL_PATH
     if isinstance(path, str):  # pragma: no cover - defensive
         path = Path(path)
-
     path = _resolve_credential_path(path)
+    return str(path.resolve()), tuple(scopes or DEFAULT_SCOPES)
 
-    try:
-        credentials = Credentials.from_service_account_file(str(path), scopes=scopes or DEFAULT_SCOPES)
-    except Exception as exc:  # pragma: no cover - depends on credential content
-        raise GoogleSheetsCredentialsError("File kredensial tidak valid atau rusak.") from exc
 
-    try:
-        return gspread.authorize(credentials)
-    except Exception as exc:  # pragma: no cover - jaringan
-        raise GoogleSheetsError("Gagal mengotorisasi klien Google Sheets.") from exc
+def _shared_client(key: Tuple[str, Tuple[str, ...]]) -> _ClientEntry:
+    with _cache_lock:
+        entry = _clients.get(key)
+        if entry is not None:
+            return entry
+
+        try:
+            credentials = Credentials.from_service_account_file(key[0], scopes=key[1])
+        except Exception as exc:  # pragma: no cover - depends on credential content
+            raise GoogleSheetsCredentialsError("File kredensial tidak valid atau rusak.") from exc
+
+        try:
+            client = gspread.authorize(credentials)
+        except Exception as exc:  # pragma: no cover - jaringan
+            raise GoogleSheetsError("Gagal mengotorisasi klien Google Sheets.") from exc
+
+        entry = _ClientEntry(client=client, credentials=credentials)
+        _clients[key] = entry
+        logger.info("Klien Google Sheets diotorisasi untuk %s", key[0])
+        return entry
+
+
+def invalidate_sheet_cache(sheet_ref: Optional[str] = None) -> None:
+    """Buang handle worksheet yang di-cache (semua, atau hanya untuk ``sheet_ref``)."""
+    with _cache_lock:
+        if sheet_ref is None:
+            _handles.clear()
+            return
+        sheet_ref = sheet_ref.strip()
+        for key in [key for key in _handles if key[2] == sheet_ref]:
+            del _handles[key]
+
+
+def _token_needs_refresh(credentials: Any) -> bool:
+    expiry = getattr(credentials, "expiry", None)
+    if not getattr(credentials, "token", None) or expiry is None:
+        return True
+    # google-auth menyimpan expiry sebagai UTC naive.
+    return expiry - datetime.utcnow() < TOKEN_REFRESH_MARGIN
+
+
+def _refresh_tokens_sync() -> None:
+    from google.auth.transport.requests import Request
+
+    with _cache_lock:
+        entries = list(_clients.items())
+    for key, entry in entries:
+        if not _token_needs_refresh(entry.credentials):
+            continue
+        try:
+            entry.credentials.refresh(Request())
+        except Exception as exc:  # pragma: no cover - jaringan
+            logger.warning("Gagal memperbarui token Google Sheets untuk %s: %s", key[0], exc)
+
+
+async def _refresh_tokens_loop() -> None:
+    while _clients:
+        await asyncio.to_thread(_refresh_tokens_sync)
+        await asyncio.sleep(TOKEN_REFRESH_CHECK_INTERVAL)
+
+
+def _ensure_token_refresher() -> None:
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.create_task(_refresh_tokens_loop())
+
+
+async def close_shared_clients() -> None:
+    """Hentikan refresh token latar belakang dan kosongkan cache klien/handle."""
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        try:
+            await _refresh_task
+        except asyncio.CancelledError:
+            pass
+        _refresh_task = None
+    with _cache_lock:
+        _clients.clear()
+        _handles.clear()
 
 
 def _extract_gid(sheet_ref: str) -> Optional[int]:
@@ -118,6 +278,7 @@ class GoogleSheetsRecorder:
     spreadsheet_id: str
     worksheet_id: int
     _lock: asyncio.Lock
+    sheet_ref: str = ""
 
     @classmethod
     async def create(
@@ -126,7 +287,9 @@ class GoogleSheetsRecorder:
         credential_path: Path | None = None,
         scopes: Sequence[str] | None = None,
     ) -> "GoogleSheetsRecorder":
-        return await asyncio.to_thread(cls._create_sync, sheet_ref, credential_path, scopes)
+        recorder = await asyncio.to_thread(cls._create_sync, sheet_ref, credential_path, scopes)
+        _ensure_token_refresher()
+        return recorder
 
     @classmethod
     def _create_sync(
@@ -139,8 +302,35 @@ class GoogleSheetsRecorder:
             raise GoogleSheetsConfigError("Referensi Google Sheets belum diisi.")
 
         sheet_ref = sheet_ref.strip()
-        client = _authorize_client(credential_path, scopes)
+        client_key = _client_key(credential_path, scopes)
+        client = _shared_client(client_key).client
+        handle_key = (*client_key, sheet_ref)
+
+        with _cache_lock:
+            cached = _handles.get(handle_key)
+        if cached is not None and cached.expires_at > time.monotonic():
+            spreadsheet, worksheet = cached.spreadsheet, cached.worksheet
+        else:
+            spreadsheet, worksheet = cls._open_worksheet(client, sheet_ref)
+            with _cache_lock:
+                _handles[handle_key] = _HandleEntry(
+                    spreadsheet=spreadsheet,
+                    worksheet=worksheet,
+                    expires_at=time.monotonic() + WORKSHEET_CACHE_TTL,
+                )
 
+        return cls(
+            worksheet=worksheet,
+            spreadsheet_title=getattr(spreadsheet, "title", ""),
+            worksheet_title=getattr(worksheet, "title", ""),
+            spreadsheet_id=getattr(spreadsheet, "id", ""),
+            worksheet_id=getattr(worksheet, "id", 0),
+            _lock=asyncio.Lock(),
+            sheet_ref=sheet_ref,
+        )
+
+    @staticmethod
+    def _open_worksheet(client: Any, sheet_ref: str) -> Tuple[Any, Any]:
         gid = _extract_gid(sheet_ref)
 
         try:
@@ -178,40 +368,70 @@ class GoogleSheetsRecorder:
         if worksheet is None:  # pragma: no cover - defensive
             raise GoogleSheetsNotFoundError("Worksheet tidak tersedia.")
 
-        return cls(
-            worksheet=worksheet,
-            spreadsheet_title=getattr(spreadsheet, "title", ""),
-            worksheet_title=getattr(worksheet, "title", ""),
-            spreadsheet_id=getattr(spreadsheet, "id", ""),
-            worksheet_id=getattr(worksheet, "id", 0),
-            _lock=asyncio.Lock(),
-        )
+        return spreadsheet, worksheet
 
     async def append_row(self, values: Iterable[Any]) -> None:
         """Append a single row to the bound worksheet."""
 
-        row = ["" if value is None else str(value) for value in values]
+        await self.append_rows([values])
+
+    async def append_rows(self, rows: Iterable[Iterable[Any]]) -> None:
+        """Append several rows with a single ``append_rows`` API call.
+
+        API failures are raised as :class:`GoogleSheetsError`; quota and server
+        errors use :class:`GoogleSheetsTransientError` so callers can retry.
+        """
+
+        payload = [_format_row(values) for values in rows]
+        if not payload:
+            return
 
         async with self._lock:
-            await asyncio.to_thread(
-                self.worksheet.append_row,
-                row,
-                value_input_option="USER_ENTERED",
-            )
+            try:
+                await asyncio.to_thread(
+                    self.worksheet.append_rows,
+                    payload,
+                    value_input_option="USER_ENTERED",
+                )
+            except GoogleSheetsError:
+                raise
+            except Exception as exc:
+                status = _status_code(exc) if isinstance(exc, APIError) else None
+                if status == 400:
+                    # Kemungkinan struktur sheet berubah; verifikasi header lagi saat start berikutnya.
+                    await asyncio.to_thread(_forget_verified_header, self.spreadsheet_id, self.worksheet_id)
+                elif status == 404:
+                    # Worksheet dihapus/dipindah: handle cache tidak valid, buka ulang saat create berikutnya.
+                    invalidate_sheet_cache(self.sheet_ref)
+                raise _translate_write_error(exc) from exc
 
     async def ensure_header(self, header: Sequence[str]) -> None:
-        """Ensure the worksheet header exists, inserting if necessary."""
+        """Ensure the worksheet header exists, inserting if necessary.
 
+        The result is remembered per worksheet (in memory and in the ``config``
+        table), so later starts skip the API call until a write to this
+        worksheet fails with HTTP 400.
+        """
+
+        expected = tuple(header)
         async with self._lock:
+            verified = await asyncio.to_thread(_load_verified_header, self.spreadsheet_id, self.worksheet_id)
+            if verified == expected:
+                return
+
             def _get_existing_first_row() -> list[list[str]]:
                 return self.worksheet.get_values("1:1")
 
             existing = await asyncio.to_thread(_get_existing_first_row)
-            if existing:
-                return
+            if not existing:
+                await asyncio.to_thread(
+                    self.worksheet.insert_row,
+                    list(header),
+                    1,
+                )
 
-            await asyncio.to_thread(
-                self.worksheet.insert_row,
-                list(header),
-                1,
-            )
+            await asyncio.to_thread(_store_verified_header, self.spreadsheet_id, self.worksheet_id, expected)
+
+
+def _format_row(values: Iterable[Any]) -> List[str]:
+    return ["" if value is None else str(value) for value in values]
@@ -0,0 +1,102 @@
+"""Spool baris Google Sheets di SQLite agar tidak hilang saat Sheets tidak tersedia.
+
+Setiap baris match watcher ditulis ke tabel ``sheet_spool`` lebih dulu, lalu
+dikirim ke Sheets per batch oleh ``BufferedSheetsWriter``. Baris baru dihapus
+setelah ``append_rows`` berhasil, sehingga gangguan jaringan atau restart
+userbot tidak membuang data. Baris yang isinya ditolak Sheets (HTTP 400,
+data tidak valid) ditandai ``failed_at`` (dead-letter) dan tidak dikirim lagi;
+izin yang dicabut atau sheet yang hilang tidak membuat baris dibuang.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, Dict, List, Sequence, Tuple
+
+from core.infra.database import get_db_connection, transaction
+from core.infra.task_repository import ARCHIVABLE_STATUSES
+
+
+def spool_row(process_id: str, row: Sequence[str]) -> None:
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO sheet_spool (process_id, payload) VALUES (?, ?)",
+            (process_id, json.dumps(list(row), ensure_ascii=False)),
+        )
+
+
+def fetch_spooled_rows(process_id: str, limit: int) -> List[Tuple[int, List[str]]]:
+    rows = get_db_connection().execute(
+        "SELECT id, payload FROM sheet_spool WHERE process_id = ? AND failed_at IS NULL ORDER BY id LIMIT ?",
+        (process_id, limit),
+    ).fetchall()
+    return [(row['id'], json.loads(row['payload'])) for row in rows]
+
+
+def delete_spooled_rows(ids: Sequence[int]) -> None:
+    if not ids:
+        return
+    placeholders = ', '.join('?' for _ in ids)
+    with transaction() as conn:
+        conn.execute(f"DELETE FROM sheet_spool WHERE id IN ({placeholders})", tuple(ids))
+
+
+def dead_letter_spooled_rows(ids: Sequence[int], error: str) -> None:
+    if not ids:
+        return
+    placeholders = ', '.join('?' for _ in ids)
+    with transaction() as conn:
+        conn.execute(
+            f"UPDATE sheet_spool SET failed_at = CURRENT_TIMESTAMP, error = ? WHERE id IN ({placeholders})",
+            (error, *ids),
+        )
+
+
+def fetch_orphaned_spools() -> List[Dict[str, Any]]:
+    """Spool yang tidak lagi punya watcher hidup: task-nya sudah berstatus akhir, diarsip, atau hilang.
+
+    Setiap entri berisi ``process_id`` serta ``userbot_id`` dan ``details`` task
+    (dari ``tasks`` atau ``tasks_archive``; ``None`` bila task tidak ditemukan).
+    """
+    placeholders = ', '.join('?' for _ in ARCHIVABLE_STATUSES)
+    rows = get_db_connection().execute(
+        "SELECT s.process_id, COALESCE(t.userbot_id, a.userbot_id) AS userbot_id, "
+        "COALESCE(t.details, a.details) AS details "
+        "FROM (SELECT DISTINCT process_id FROM sheet_spool WHERE failed_at IS NULL) AS s "
+        "LEFT JOIN tasks AS t ON t.process_id = s.process_id "
+        "LEFT JOIN tasks_archive AS a ON a.process_id = s.process_id "
+        f"WHERE t.id IS NULL OR t.status IN ({placeholders})",
+        ARCHIVABLE_STATUSES,
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def count_spooled_rows(process_id: str) -> int:
+    row = get_db_connection().execute(
+        "SELECT COUNT(*) AS total FROM sheet_spool WHERE process_id = ? AND failed_at IS NULL", (process_id,)
+    ).fetchone()
+    return row['total'] if row else 0
+
+
+class SheetRowSpool:
+    """Antrian ``RowQueue`` yang tahan restart untuk satu ``process_id`` watcher."""
+
+    durable = True
+
+    def __init__(self, process_id: str) -> None:
+        self.process_id = process_id
+
+    async def put(self, row: List[str]) -> None:
+        await asyncio.to_thread(spool_row, self.process_id, row)
+
+    async def peek(self, limit: int) -> List[Tuple[int, List[str]]]:
+        return await asyncio.to_thread(fetch_spooled_rows, self.process_id, limit)
+
+    async def ack(self, keys: Sequence[int]) -> None:
+        await asyncio.to_thread(delete_spooled_rows, list(keys))
+
+    async def dead_letter(self, keys: Sequence[int], error: str) -> None:
+        await asyncio.to_thread(dead_letter_spooled_rows, list(keys), error)
+
+    async def depth(self) -> int:
+        return await asyncio.to_thread(count_spooled_rows, self.process_id)
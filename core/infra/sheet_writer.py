@@ -0,0 +1,273 @@
+"""Batched, retrying writes to Google Sheets on top of :class:`GoogleSheetsRecorder`.
+
+Rows are queued (in memory or in the durable ``sheet_spool``) and shipped with
+one ``append_rows`` call per batch; see :class:`BufferedSheetsWriter`.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Iterable, List, Optional, Protocol, Sequence, Tuple
+
+from core.infra.google_sheets import (
+    GoogleSheetsError,
+    GoogleSheetsNotFoundError,
+    GoogleSheetsPermissionError,
+    GoogleSheetsRecorder,
+    GoogleSheetsTransientError,
+    _format_row,
+)
+
+logger = logging.getLogger(__name__)
+
+# Error yang menyangkut sheet, bukan isi baris: baris tetap di antrian dan dicoba lagi nanti.
+_SHEET_LEVEL_ERRORS = (GoogleSheetsTransientError, GoogleSheetsPermissionError, GoogleSheetsNotFoundError)
+
+
+async def append_rows_with_retry(
+    recorder: GoogleSheetsRecorder,
+    rows: Sequence[Sequence[Any]],
+    max_retries: int = 5,
+    base_backoff: float = 1.0,
+    max_backoff: float = 60.0,
+) -> None:
+    """``recorder.append_rows`` with exponential backoff (plus jitter) on transient errors."""
+    for attempt in range(max_retries + 1):
+        try:
+            await recorder.append_rows(rows)
+            return
+        except GoogleSheetsTransientError as exc:
+            if attempt == max_retries:
+                raise
+            delay = min(max_backoff, base_backoff * (2 ** attempt))
+            delay += random.uniform(0, delay / 2)
+            logger.warning("Penulisan Sheets ditunda %.1fs (percobaan %s): %s", delay, attempt + 1, exc)
+            await asyncio.sleep(delay)
+
+
+class RowQueue(Protocol):
+    """Storage behind :class:`BufferedSheetsWriter`; ``peek`` returns ``(key, row)`` in FIFO order."""
+
+    durable: bool
+
+    async def put(self, row: List[str]) -> None: ...
+
+    async def peek(self, limit: int) -> List[Tuple[int, List[str]]]: ...
+
+    async def ack(self, keys: Sequence[int]) -> None: ...
+
+    async def depth(self) -> int: ...
+
+    async def dead_letter(self, keys: Sequence[int], error: str) -> None: ...
+
+
+class MemoryRowQueue:
+    """In-process row queue for :class:`BufferedSheetsWriter` (lost on restart)."""
+
+    durable = False
+
+    def __init__(self) -> None:
+        self._rows: Deque[Tuple[int, List[str]]] = deque()
+        self._next_key = 0
+
+    async def put(self, row: List[str]) -> None:
+        self._next_key += 1
+        self._rows.append((self._next_key, row))
+
+    async def peek(self, limit: int) -> List[Tuple[int, List[str]]]:
+        return [self._rows[idx] for idx in range(min(limit, len(self._rows)))]
+
+    async def ack(self, keys: Sequence[int]) -> None:
+        done = set(keys)
+        while self._rows and self._rows[0][0] in done:
+            self._rows.popleft()
+
+    async def depth(self) -> int:
+        return len(self._rows)
+
+    async def dead_letter(self, keys: Sequence[int], error: str) -> None:
+        # Tanpa penyimpanan permanen, baris yang ditolak cukup dibuang.
+        await self.ack(keys)
+
+
+FlushCallback = Callable[[int, Optional[GoogleSheetsError], int], Awaitable[None]]
+
+
+@dataclass(eq=False)
+class BufferedSheetsWriter:
+    """Accumulate rows and ship them to a recorder with one ``append_rows`` per batch.
+
+    A batch is flushed once ``batch_size`` rows are queued or ``max_delay``
+    seconds after the first queued row. Transient errors are retried with
+    exponential backoff (plus jitter). ``on_flush`` receives the rows written,
+    the error (if any) and the remaining queue depth.
+
+    With the default :class:`MemoryRowQueue` at most ``max_queue`` rows are
+    held; :meth:`append` waits for room when it is full and a batch that keeps
+    failing is dropped. With a durable queue (e.g. ``SheetRowSpool``) rows are
+    never dropped: :meth:`append` only writes locally, failed batches stay
+    queued and are retried with a growing pause, and rows left over from a
+    previous run are drained on :meth:`start`. Errors about the sheet itself
+    (quota, outages, missing access, deleted worksheet) keep every row queued
+    until the sheet is usable again; rows the API rejects for their content
+    (HTTP 400, invalid data) are moved to the queue's dead-letter instead, so
+    one bad row cannot block the rows behind it.
+    """
+
+    recorder: GoogleSheetsRecorder
+    queue: RowQueue = field(default_factory=MemoryRowQueue)
+    batch_size: int = 50
+    max_delay: float = 2.0
+    max_queue: int = 1000
+    max_retries: int = 5
+    base_backoff: float = 1.0
+    max_backoff: float = 60.0
+    on_flush: Optional[FlushCallback] = None
+    _queued: int = field(default=0, init=False)
+    _failures: int = field(default=0, init=False)
+    _has_data: asyncio.Event = field(default_factory=asyncio.Event, init=False)
+    _full: asyncio.Event = field(default_factory=asyncio.Event, init=False)
+    _space: asyncio.Condition = field(default_factory=asyncio.Condition, init=False)
+    _flush_lock: asyncio.Lock = field(default_factory=asyncio.Lock, init=False)
+    _loop_task: Optional[asyncio.Task[None]] = field(default=None, init=False)
+
+    @property
+    def pending(self) -> int:
+        return self._queued
+
+    async def start(self) -> None:
+        if self._loop_task is not None:
+            return
+        self._queued = await self.queue.depth()
+        if self._queued:
+            logger.info("Melanjutkan %s baris Sheets yang tertunda.", self._queued)
+            self._has_data.set()
+        self._loop_task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the background loop and try once more to ship queued rows."""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+        while self._queued:
+            written = await self.flush(max_retries=0 if self.queue.durable else None)
+            if not written and self.queue.durable:
+                # Sisa baris tetap di spool dan dikirim saat job berjalan lagi.
+                break
+
+    async def append(self, values: Iterable[Any]) -> None:
+        row = _format_row(values)
+        if self.queue.durable:
+            await self.queue.put(row)
+        else:
+            async with self._space:
+                await self._space.wait_for(lambda: self._queued < self.max_queue)
+                await self.queue.put(row)
+        self._queued += 1
+        self._has_data.set()
+        if self._queued >= self.batch_size:
+            self._full.set()
+
+    async def flush(self, max_retries: Optional[int] = None) -> int:
+        """Send one batch now; returns the number of rows written."""
+        async with self._flush_lock:
+            entries = await self.queue.peek(self.batch_size)
+            if not entries:
+                self._queued = 0
+                self._has_data.clear()
+                return 0
+
+            keys = [key for key, _ in entries]
+            error: Optional[GoogleSheetsError] = None
+            written_keys: List[int] = keys
+            dead_keys: List[int] = []
+            try:
+                await append_rows_with_retry(
+                    self.recorder,
+                    [row for _, row in entries],
+                    self.max_retries if max_retries is None else max_retries,
+                    self.base_backoff,
+                    self.max_backoff,
+                )
+            except GoogleSheetsError as exc:
+                error = exc
+                written_keys = []
+                if not self.queue.durable:
+                    dead_keys = keys
+                    logger.error("Membuang %s baris Sheets setelah gagal: %s", len(keys), error)
+                elif not isinstance(exc, _SHEET_LEVEL_ERRORS):
+                    written_keys, dead_keys = await self._split_rejected(entries, exc)
+                    if dead_keys:
+                        logger.error("Memindahkan %s baris Sheets ke dead-letter: %s", len(dead_keys), error)
+
+            if written_keys:
+                await self.queue.ack(written_keys)
+            if dead_keys:
+                await self.queue.dead_letter(dead_keys, str(error))
+            resolved = len(written_keys) + len(dead_keys)
+            self._queued = max(0, self._queued - resolved)
+            if resolved == len(keys):
+                self._failures = 0
+            else:
+                self._failures += 1
+                logger.error(
+                    "Gagal mengirim %s baris Sheets, tetap disimpan di spool: %s", len(keys) - resolved, error
+                )
+            if not self._queued:
+                self._has_data.clear()
+            if self._queued < self.batch_size:
+                self._full.clear()
+            async with self._space:
+                self._space.notify_all()
+
+        written = len(written_keys)
+        if self.on_flush is not None:
+            await self.on_flush(written, error, self._queued)
+        return written
+
+    async def _split_rejected(
+        self, entries: List[Tuple[int, List[str]]], error: GoogleSheetsError
+    ) -> Tuple[List[int], List[int]]:
+        """Pisahkan batch yang isinya ditolak menjadi (terkirim, dead-letter).
+
+        Batch dikirim ulang per baris untuk menemukan baris yang bermasalah.
+        Error tingkat sheet di tengah jalan menghentikan pemisahan; sisa baris
+        tetap di antrian.
+        """
+        if len(entries) == 1:
+            return [], [key for key, _ in entries]
+        written: List[int] = []
+        dead: List[int] = []
+        for key, row in entries:
+            try:
+                await self.recorder.append_rows([row])
+            except _SHEET_LEVEL_ERRORS:
+                break
+            except GoogleSheetsError:
+                dead.append(key)
+            else:
+                written.append(key)
+        return written, dead
+
+    async def _run(self) -> None:
+        while True:
+            await self._has_data.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), self.max_delay)
+            except asyncio.TimeoutError:
+                pass
+            while self._queued:
+                await self.flush()
+                if self._failures:
+                    # Spool tetap utuh; beri jeda yang makin panjang sebelum mencoba lagi.
+                    await asyncio.sleep(min(self.max_backoff, self.base_backoff * (2 ** self._failures)))
+                    continue
+                if self._queued < self.batch_size:
+                    break
@@ -0,0 +1,255 @@
+"""Repository kecil untuk tabel ``tasks`` dengan pembaruan JSON atomik di SQL.
+
+Semua perubahan kolom ``details`` dilakukan lewat ``json_set`` dalam satu
+statement sehingga dua pembaruan bersamaan pada task yang sama tidak saling
+menimpa, dan blob JSON tidak perlu dibaca-ulang ke Python.
+"""
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from core.infra.database import get_db_connection, transaction
+
+# Detail yang rusak (bukan JSON valid) diperlakukan sebagai objek kosong.
+_DETAILS_BASE = "CASE WHEN json_valid(details) THEN details ELSE '{}' END"
+
+INFLIGHT_STATUSES = ('claimed', 'running', 'scheduled', 'interval')
+# Lease task milik runner; diperpanjang tiap heartbeat, lease kedaluwarsa berarti runner mati/hang.
+TASK_LEASE_SECONDS = 60
+# Status akhir yang boleh dipindahkan ke tasks_archive oleh retensi.
+ARCHIVABLE_STATUSES = ('completed', 'error', 'stopped')
+
+
+def _json_path(key: str) -> str:
+    if '"' in key:
+        raise ValueError(f"Kunci detail tidak boleh mengandung tanda kutip: {key!r}")
+    return f'$."{key}"'
+
+
+def _details_patch(updates: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """Bangun ekspresi ``json_set`` untuk ``updates`` (semantik ``dict.update``)."""
+    args: List[str] = []
+    params: List[Any] = []
+    for key, value in updates.items():
+        args.append("?, json(?)")
+        params.extend((_json_path(key), json.dumps(value)))
+    return f"json_set({_DETAILS_BASE}, {', '.join(args)})", params
+
+
+def update_task_status(task_id: int, status: str, note: Optional[str] = None) -> None:
+    with transaction() as conn:
+        if note is None:
+            conn.execute(
+                "UPDATE tasks SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (status, task_id),
+            )
+            return
+        expression, params = _details_patch({'last_status_note': note})
+        conn.execute(
+            f"UPDATE tasks SET status = ?, details = {expression}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (status, *params, task_id),
+        )
+
+
+def merge_task_details(task_id: int, updates: Dict[str, Any]) -> None:
+    merge_task_details_many({task_id: updates})
+
+
+def merge_task_details_many(batch: Dict[int, Dict[str, Any]]) -> None:
+    """Gabungkan detail beberapa task dalam satu transaksi."""
+    with transaction() as conn:
+        for task_id, updates in batch.items():
+            if not updates:
+                continue
+            expression, params = _details_patch(updates)
+            conn.execute(f"UPDATE tasks SET details = {expression} WHERE id = ?", (*params, task_id))
+
+
+def get_task_status(task_id: int) -> str:
+    row = get_db_connection().execute("SELECT status FROM tasks WHERE id = ?", (task_id,)).fetchone()
+    return row['status'] if row else 'unknown'
+
+
+def mark_task_error(task_id: int, message: str) -> None:
+    expression, params = _details_patch({'error': message})
+    with transaction() as conn:
+        conn.execute(
+            f"UPDATE tasks SET status = 'error', details = {expression}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (*params, task_id),
+        )
+
+
+def acknowledge_stop(task_id: int, stopped_at: str) -> None:
+    """Ubah 'stop_requested' menjadi 'stopped' setelah runner menghentikan job."""
+    expression, params = _details_patch({'stopped_at': stopped_at})
+    with transaction() as conn:
+        conn.execute(
+            f"UPDATE tasks SET status = 'stopped', details = {expression}, updated_at = CURRENT_TIMESTAMP "
+            "WHERE id = ? AND status = 'stop_requested'",
+            (*params, task_id),
+        )
+
+
+def get_next_run_at(task_id: int) -> Optional[datetime]:
+    row = get_db_connection().execute("SELECT next_run_at FROM tasks WHERE id = ?", (task_id,)).fetchone()
+    if not row or not row['next_run_at']:
+        return None
+    try:
+        return datetime.fromisoformat(row['next_run_at'])
+    except ValueError:
+        return None
+
+
+def set_next_run_at(
+    task_id: int,
+    next_run_at: Optional[datetime],
+    details: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Simpan waktu jalan berikutnya (UTC); ``None`` menandakan jadwal selesai.
+
+    ``details`` (misalnya penghitung ronde) ikut ditulis dalam statement yang
+    sama, sehingga crash tidak bisa memisahkan keduanya.
+    """
+    value = next_run_at.isoformat(sep=' ', timespec='seconds') if next_run_at else None
+    with transaction() as conn:
+        if not details:
+            conn.execute(
+                "UPDATE tasks SET next_run_at = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (value, task_id),
+            )
+            return
+        expression, params = _details_patch(details)
+        conn.execute(
+            f"UPDATE tasks SET next_run_at = ?, details = {expression}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (value, *params, task_id),
+        )
+
+
+def fetch_pending_tasks() -> List[Dict[str, Any]]:
+    rows = get_db_connection().execute(
+        "SELECT * FROM tasks WHERE status = 'pending' ORDER BY id"
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def fetch_stop_requests() -> List[Dict[str, Any]]:
+    rows = get_db_connection().execute(
+        "SELECT id, userbot_id, process_id, worker_id, "
+        "(lease_until IS NULL OR lease_until < datetime('now')) AS lease_expired "
+        "FROM tasks WHERE status = 'stop_requested' ORDER BY id"
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def claim_task(task_id: int, worker_id: str, lease_seconds: float = TASK_LEASE_SECONDS) -> bool:
+    """Klaim task pending secara atomik; False bila runner lain sudah mengklaimnya lebih dulu."""
+    with transaction() as conn:
+        cursor = conn.execute(
+            "UPDATE tasks SET status = 'claimed', worker_id = ?, lease_until = datetime('now', ?), "
+            "updated_at = CURRENT_TIMESTAMP WHERE id = ? AND status = 'pending'",
+            (worker_id, f"+{int(lease_seconds)} seconds", task_id),
+        )
+        return cursor.rowcount == 1
+
+
+def renew_leases(worker_id: str, task_ids: Iterable[int], lease_seconds: float = TASK_LEASE_SECONDS) -> Set[int]:
+    """Perpanjang lease ``task_ids``; mengembalikan id yang masih dipegang ``worker_id``.
+
+    Task yang sudah diambil ulang (lease kedaluwarsa) atau dihentikan runner
+    lain tidak ikut dikembalikan, sehingga pemanggil bisa menghentikan job-nya.
+    """
+    ids = list(task_ids)
+    if not ids:
+        return set()
+    id_list = ', '.join('?' for _ in ids)
+    with transaction() as conn:
+        conn.execute(
+            f"UPDATE tasks SET lease_until = datetime('now', ?) "
+            f"WHERE id IN ({id_list}) AND worker_id = ? AND status != 'stopped'",
+            (f"+{int(lease_seconds)} seconds", *ids, worker_id),
+        )
+        rows = conn.execute(
+            f"SELECT id FROM tasks WHERE id IN ({id_list}) AND worker_id = ? AND status != 'stopped'",
+            (*ids, worker_id),
+        ).fetchall()
+    return {row['id'] for row in rows}
+
+
+def release_worker_tasks(worker_id: str, task_ids: Optional[Iterable[int]] = None) -> int:
+    """Lepas task in-flight milik ``worker_id`` (semua, atau hanya ``task_ids``) ke pending."""
+    placeholders = ', '.join('?' for _ in INFLIGHT_STATUSES)
+    sql = (
+        "UPDATE tasks SET status = 'pending', worker_id = NULL, lease_until = NULL, "
+        f"updated_at = CURRENT_TIMESTAMP WHERE worker_id = ? AND status IN ({placeholders})"
+    )
+    params: List[Any] = [worker_id, *INFLIGHT_STATUSES]
+    if task_ids is not None:
+        ids = list(task_ids)
+        if not ids:
+            return 0
+        sql += f" AND id IN ({', '.join('?' for _ in ids)})"
+        params.extend(ids)
+    with transaction() as conn:
+        return conn.execute(sql, params).rowcount
+
+
+def reclaim_expired_leases() -> int:
+    """Kembalikan task in-flight yang lease-nya kedaluwarsa (atau belum punya lease) ke pending."""
+    placeholders = ', '.join('?' for _ in INFLIGHT_STATUSES)
+    with transaction() as conn:
+        cursor = conn.execute(
+            "UPDATE tasks SET status = 'pending', worker_id = NULL, lease_until = NULL, "
+            f"updated_at = CURRENT_TIMESTAMP WHERE status IN ({placeholders}) "
+            "AND (lease_until IS NULL OR lease_until < datetime('now'))",
+            INFLIGHT_STATUSES,
+        )
+        return cursor.rowcount
+
+
+def reset_inflight_tasks() -> int:
+    """Kembalikan semua task in-flight ke pending; hanya aman bila tidak ada runner lain yang hidup."""
+    placeholders = ', '.join('?' for _ in INFLIGHT_STATUSES)
+    with transaction() as conn:
+        cursor = conn.execute(
+            "UPDATE tasks SET status = 'pending', worker_id = NULL, lease_until = NULL "
+            f"WHERE status IN ({placeholders})",
+            INFLIGHT_STATUSES,
+        )
+        return cursor.rowcount
+
+
+def archive_terminal_tasks(max_age_days: int, batch_size: int = 500) -> int:
+    """Pindahkan task berstatus akhir yang lebih tua dari ``max_age_days`` ke ``tasks_archive``.
+
+    Diproses per ``batch_size`` baris agar transaksi tulis tetap singkat.
+    """
+    placeholders = ', '.join('?' for _ in ARCHIVABLE_STATUSES)
+    cutoff = f"-{int(max_age_days)} days"
+    archived = 0
+    while True:
+        with transaction() as conn:
+            ids = [
+                row['id']
+                for row in conn.execute(
+                    f"SELECT id FROM tasks WHERE status IN ({placeholders}) "
+                    "AND COALESCE(updated_at, start_time) < datetime('now', ?) ORDER BY id LIMIT ?",
+                    (*ARCHIVABLE_STATUSES, cutoff, batch_size),
+                )
+            ]
+            if not ids:
+                return archived
+            id_list = ', '.join('?' for _ in ids)
+            conn.execute(
+                "INSERT OR REPLACE INTO tasks_archive "
+                "(id, userbot_id, process_id, command, status, start_time, updated_at, details) "
+                "SELECT id, userbot_id, process_id, command, status, start_time, updated_at, details "
+                f"FROM tasks WHERE id IN ({id_list})",
+                ids,
+            )
+            conn.execute(f"DELETE FROM broadcast_deliveries WHERE task_id IN ({id_list})", ids)
+            conn.execute(f"DELETE FROM tasks WHERE id IN ({id_list})", ids)
+        archived += len(ids)
+        if len(ids) < batch_size:
+            return archived
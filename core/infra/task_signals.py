@@ -0,0 +1,130 @@
+"""Local wake-up channel between the wizard and the userbot task runner.
+
+The wizard writes a task row, commits, then sends a tiny datagram to a Unix
+domain socket owned by the runner. The runner wakes immediately instead of
+waiting for the next poll. Signals are best-effort: if the runner is not
+listening, the slow fallback poll still picks the row up.
+
+In sharded mode every worker listens on its own socket next to the default
+one (``userbot.<worker_id>.sock``); a signal is sent to all of them.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+ENV_SIGNAL_SOCKET = "TASK_SIGNAL_SOCKET"
+DEFAULT_SIGNAL_SOCKET = Path("data") / "userbot.sock"
+
+
+def _socket_path() -> Path:
+    override = os.getenv(ENV_SIGNAL_SOCKET)
+    return Path(override) if override else DEFAULT_SIGNAL_SOCKET
+
+
+def worker_socket_path(worker_id: str) -> Path:
+    """Socket sinyal milik satu worker dalam mode sharding."""
+    base = _socket_path()
+    return base.with_name(f"{base.stem}.{worker_id}{base.suffix}")
+
+
+def _signal_targets() -> list[Path]:
+    base = _socket_path()
+    return [base, *sorted(base.parent.glob(f"{base.stem}.*{base.suffix}"))]
+
+
+def notify_task_runner(kind: str = "tasks") -> bool:
+    """Kirim sinyal ke task runner. Mengembalikan False bila tidak ada runner yang mendengarkan."""
+    if not hasattr(socket, "AF_UNIX"):  # pragma: no cover - platform tanpa Unix socket
+        return False
+
+    delivered = False
+    payload = kind.encode("utf-8")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.setblocking(False)
+        for path in _signal_targets():
+            try:
+                sock.sendto(payload, str(path))
+                delivered = True
+            except OSError:
+                # Runner belum berjalan atau antrean socket penuh; fallback poll tetap berjalan.
+                continue
+    return delivered
+
+
+class TaskSignalListener:
+    """Listener datagram Unix socket yang membangunkan loop runner."""
+
+    def __init__(self, path: Path | None = None) -> None:
+        self._path = path or _socket_path()
+        self._sock: socket.socket | None = None
+        self._event = asyncio.Event()
+
+    @property
+    def active(self) -> bool:
+        return self._sock is not None
+
+    def start(self) -> bool:
+        if not hasattr(socket, "AF_UNIX"):  # pragma: no cover - platform tanpa Unix socket
+            logger.warning("Unix socket tidak didukung; runner memakai polling biasa.")
+            return False
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self._path.unlink()
+        except FileNotFoundError:
+            pass
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            sock.bind(str(self._path))
+            sock.setblocking(False)
+            asyncio.get_running_loop().add_reader(sock.fileno(), self._on_readable)
+        except OSError as exc:
+            sock.close()
+            logger.warning("Gagal membuka socket sinyal %s: %s", self._path, exc)
+            return False
+
+        self._sock = sock
+        logger.info("Mendengarkan sinyal task di %s", self._path)
+        return True
+
+    def _on_readable(self) -> None:
+        assert self._sock is not None
+        while True:
+            try:
+                self._sock.recv(64)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:  # pragma: no cover - socket ditutup saat membaca
+                break
+        self._event.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Tunggu sinyal hingga ``timeout`` detik. True bila dibangunkan oleh sinyal."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._event.clear()
+
+    def close(self) -> None:
+        if self._sock is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self._sock.fileno())
+        except RuntimeError:  # pragma: no cover - loop sudah berhenti
+            pass
+        self._sock.close()
+        self._sock = None
+        try:
+            self._path.unlink()
+        except FileNotFoundError:
+            pass
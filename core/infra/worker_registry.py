@@ -0,0 +1,43 @@
+"""Registry worker runner userbot untuk mode sharding.
+
+Setiap worker menulis heartbeat ke tabel ``runner_workers``. Worker yang
+heartbeat-nya lebih tua dari TTL dianggap mati; worker lain lalu menghitung
+ulang pembagian userbot tanpa worker tersebut.
+"""
+from __future__ import annotations
+
+from typing import Iterable, List, Optional
+
+from core.infra.database import get_db_connection, transaction
+
+
+def heartbeat(worker_id: str, pid: Optional[int] = None) -> None:
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO runner_workers (worker_id, pid, heartbeat_at) VALUES (?, ?, datetime('now')) "
+            "ON CONFLICT(worker_id) DO UPDATE SET "
+            "pid = COALESCE(excluded.pid, runner_workers.pid), heartbeat_at = excluded.heartbeat_at",
+            (worker_id, pid),
+        )
+
+
+def reset_workers(worker_ids: Iterable[str]) -> None:
+    """Ganti isi registry dengan ``worker_ids`` (dipanggil supervisor sebelum worker dijalankan).
+
+    Semua worker langsung terdaftar sehingga pembagian awal sudah final dan
+    tidak berpindah-pindah selama worker satu per satu selesai start.
+    """
+    with transaction() as conn:
+        conn.execute("DELETE FROM runner_workers")
+        conn.executemany(
+            "INSERT INTO runner_workers (worker_id, heartbeat_at) VALUES (?, datetime('now'))",
+            [(worker_id,) for worker_id in worker_ids],
+        )
+
+
+def live_workers(ttl_seconds: float) -> List[str]:
+    rows = get_db_connection().execute(
+        "SELECT worker_id FROM runner_workers WHERE heartbeat_at >= datetime('now', ?) ORDER BY worker_id",
+        (f"-{int(ttl_seconds)} seconds",),
+    ).fetchall()
+    return [row['worker_id'] for row in rows]
@@ -0,0 +1,250 @@
+"""Compiled keyword matching shared by the watcher and auto reply commands.
+
+All keywords of one match type are compiled into a single regex shaped like a
+trie (``ab(?:c|d)?`` instead of ``abc|abd|ab``), so a message is scanned once
+no matter how many keywords a job has. Text is lowercased once by the caller
+and reused for every check.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Mapping, Optional, Set, Tuple
+
+CONTAINS = "contains"
+SPECIFIC = "specific"
+ANY = "any"
+ALL = "all"
+
+_WORD_CHAR = re.compile(r"\w")
+
+
+def _normalize_terms(values: Iterable[Any]) -> Tuple[str, ...]:
+    return tuple(str(item).strip().lower() for item in values or [] if str(item).strip())
+
+
+def _build_trie_pattern(terms: Iterable[str]) -> str:
+    root: Dict[str, dict] = {}
+    for term in terms:
+        node = root
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node: Dict[str, dict]) -> str:
+        is_end = "" in node
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1:
+            return f"(?:{branches[0]})?" if is_end else branches[0]
+        body = "(?:" + "|".join(branches) + ")"
+        return body + "?" if is_end else body
+
+    return emit(root)
+
+
+@dataclass(frozen=True, slots=True)
+class KeywordRule:
+    """Normalized keyword configuration of a watcher or auto reply job."""
+
+    keywords: Tuple[str, ...]
+    exclusions: Tuple[str, ...] = ()
+    keyword_match_type: str = CONTAINS
+    keyword_logic: str = ANY
+    exclusion_match_type: str = CONTAINS
+    exclusion_logic: str = ANY
+
+    @classmethod
+    def from_details(cls, details: Mapping[str, Any]) -> "KeywordRule":
+        keyword_match_type = str(details.get("keyword_match_type") or CONTAINS).lower()
+        keyword_logic = str(details.get("keyword_logic") or ANY).lower()
+        exclusion_match_type = str(details.get("exclusion_match_type") or CONTAINS).lower()
+        exclusion_logic = str(details.get("exclusion_logic") or ANY).lower()
+        return cls(
+            keywords=_normalize_terms(details.get("keywords", [])),
+            exclusions=_normalize_terms(details.get("exclusions", [])),
+            keyword_match_type=SPECIFIC if keyword_match_type == SPECIFIC else CONTAINS,
+            keyword_logic=ALL if keyword_logic == ALL else ANY,
+            exclusion_match_type=SPECIFIC if exclusion_match_type == SPECIFIC else CONTAINS,
+            exclusion_logic=ALL if exclusion_logic == ALL else ANY,
+        )
+
+
+class TermScanner:
+    """Single compiled regex over a set of terms that share one match type.
+
+    ``contains`` terms match anywhere in the lowercased text; ``specific``
+    terms must be bounded by ``\\b`` on both sides, like the old per-keyword
+    ``re.search(r"\\bword\\b", text, re.IGNORECASE)`` checks. Matching runs on
+    the lowercased text, which is equivalent to ``IGNORECASE`` for lowercase
+    terms.
+    """
+
+    def __init__(self, terms: Iterable[str], mode: str = CONTAINS) -> None:
+        self.mode = SPECIFIC if mode == SPECIFIC else CONTAINS
+        self.terms: Tuple[str, ...] = tuple(dict.fromkeys(term for term in terms if term))
+        self._index = {term: idx for idx, term in enumerate(self.terms)}
+        self._search_re: Optional[re.Pattern[str]] = None
+        self._scan_re: Optional[re.Pattern[str]] = None
+        if self.terms:
+            body = _build_trie_pattern(self.terms)
+            if self.mode == SPECIFIC:
+                self._search_re = re.compile(rf"\b(?:{body})\b")
+                self._scan_re = re.compile(rf"(?=\b({body})\b)")
+            else:
+                self._search_re = re.compile(body)
+                self._scan_re = re.compile(rf"(?=({body}))")
+        # The scan reports the longest term starting at each position; shorter
+        # terms that are prefixes of it (and valid at that cut) match there too.
+        self._implied: Dict[int, Tuple[int, ...]] = {
+            idx: self._prefix_terms(term) for idx, term in enumerate(self.terms)
+        }
+
+    def _prefix_terms(self, term: str) -> Tuple[int, ...]:
+        implied = []
+        for length in range(1, len(term)):
+            idx = self._index.get(term[:length])
+            if idx is None:
+                continue
+            if self.mode == SPECIFIC:
+                left = bool(_WORD_CHAR.match(term[length - 1]))
+                right = bool(_WORD_CHAR.match(term[length]))
+                if left == right:
+                    continue
+            implied.append(idx)
+        return tuple(implied)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def mask_for(self, terms: Iterable[str], offset: int = 0) -> int:
+        """Bitmask of ``terms`` using the ids reported by :meth:`scan`, shifted by ``offset``."""
+        mask = 0
+        for term in terms:
+            mask |= 1 << (offset + self._index[term])
+        return mask
+
+    def search(self, lowered: str) -> bool:
+        """True as soon as any term matches."""
+        return bool(self._search_re and self._search_re.search(lowered))
+
+    def all_present(self, lowered: str) -> bool:
+        """True when every term matches."""
+        if not self.terms:
+            return False
+        if self.mode == CONTAINS:
+            # Substring check per term short-circuits on the first miss and is cheaper than a scan.
+            return all(term in lowered for term in self.terms)
+        return len(self.scan(lowered, limit=len(self.terms))) == len(self.terms)
+
+    def scan(self, lowered: str, limit: Optional[int] = None) -> Set[int]:
+        """Return the indexes of all matched terms, stopping early at ``limit`` hits."""
+        found: Set[int] = set()
+        if self._scan_re is None:
+            return found
+        for match in self._scan_re.finditer(lowered):
+            idx = self._index[match.group(1)]
+            found.add(idx)
+            found.update(self._implied[idx])
+            if limit is not None and len(found) >= limit:
+                break
+        return found
+
+
+class KeywordMatcher:
+    """Evaluate a :class:`KeywordRule` against message text in one pass per term set."""
+
+    def __init__(self, rule: KeywordRule) -> None:
+        self.rule = rule
+        self._keywords = TermScanner(rule.keywords, rule.keyword_match_type)
+        self._exclusions = TermScanner(rule.exclusions, rule.exclusion_match_type)
+
+    def match(self, text: str, lowered: Optional[str] = None) -> bool:
+        if not self._keywords:
+            return False
+        if lowered is None:
+            lowered = text.lower()
+        if not self._satisfied(self._keywords, self.rule.keyword_logic, lowered):
+            return False
+        if not self._exclusions:
+            return True
+        return not self._satisfied(self._exclusions, self.rule.exclusion_logic, lowered)
+
+    @staticmethod
+    def _satisfied(scanner: TermScanner, logic: str, lowered: str) -> bool:
+        if logic == ALL:
+            return scanner.all_present(lowered)
+        return scanner.search(lowered)
+
+
+@dataclass(frozen=True, slots=True)
+class _RuleMasks:
+    keywords: int
+    exclusions: int
+    keyword_logic: str
+    exclusion_logic: str
+
+
+class KeywordIndex:
+    """Combined index over the terms of several rules (e.g. every job watching one chat).
+
+    A message is scanned once per match type; the result is a bitmask of
+    matched term ids. Each rule then resolves its any/all keyword logic and
+    exclusions from that bitmask with integer operations only.
+    """
+
+    def __init__(self, rules: Iterable[KeywordRule]) -> None:
+        self.rules: Tuple[KeywordRule, ...] = tuple(dict.fromkeys(rules))
+        contains_terms: Dict[str, None] = {}
+        specific_terms: Dict[str, None] = {}
+        for rule in self.rules:
+            for terms, mode in (
+                (rule.keywords, rule.keyword_match_type),
+                (rule.exclusions, rule.exclusion_match_type),
+            ):
+                bucket = specific_terms if mode == SPECIFIC else contains_terms
+                bucket.update(dict.fromkeys(terms))
+
+        self._contains = TermScanner(contains_terms, CONTAINS)
+        self._specific = TermScanner(specific_terms, SPECIFIC)
+        # Bit ids: contains terms first, specific terms after them.
+        self._specific_offset = len(self._contains)
+        self._masks: Dict[KeywordRule, _RuleMasks] = {
+            rule: _RuleMasks(
+                keywords=self._mask(rule.keywords, rule.keyword_match_type),
+                exclusions=self._mask(rule.exclusions, rule.exclusion_match_type),
+                keyword_logic=rule.keyword_logic,
+                exclusion_logic=rule.exclusion_logic,
+            )
+            for rule in self.rules
+        }
+
+    def _mask(self, terms: Iterable[str], mode: str) -> int:
+        if mode == SPECIFIC:
+            return self._specific.mask_for(terms, self._specific_offset)
+        return self._contains.mask_for(terms)
+
+    def scan(self, lowered: str) -> int:
+        """Bitmask of every term (from any rule) found in ``lowered``."""
+        hits = 0
+        for idx in self._contains.scan(lowered):
+            hits |= 1 << idx
+        for idx in self._specific.scan(lowered):
+            hits |= 1 << (self._specific_offset + idx)
+        return hits
+
+    def evaluate(self, rule: KeywordRule, hits: int) -> bool:
+        masks = self._masks[rule]
+        if not masks.keywords:
+            return False
+        if masks.keyword_logic == ALL:
+            if hits & masks.keywords != masks.keywords:
+                return False
+        elif not hits & masks.keywords:
+            return False
+        if not masks.exclusions:
+            return True
+        if masks.exclusion_logic == ALL:
+            return hits & masks.exclusions != masks.exclusions
+        return not hits & masks.exclusions
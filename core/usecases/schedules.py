@@ -0,0 +1,196 @@
+"""Wall-clock schedules for broadcasts: one-shot, fixed-rate and cron-like.
+
+All times are naive UTC ``datetime`` values, the same convention as
+``datetime.utcnow()`` elsewhere in the project. Cron expressions are evaluated
+in a configurable local time zone and converted back to UTC.
+
+Fixed-rate schedules are anchored (``anchor + k * interval``), so the time a
+send takes never shifts later fire times.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, FrozenSet, Mapping, Optional, Protocol, Tuple
+from zoneinfo import ZoneInfo
+
+CATCH_UP_SKIP = "skip"  # lewati slot yang terlewat, lanjut di slot berikutnya
+CATCH_UP_ONCE = "once"  # jalankan sekali segera, lalu lanjut di slot berikutnya
+CATCH_UP_ALL = "all"  # jalankan setiap slot yang terlewat secara berurutan
+CATCH_UP_POLICIES = (CATCH_UP_SKIP, CATCH_UP_ONCE, CATCH_UP_ALL)
+
+# Keterlambatan sampai batas ini dianggap tepat waktu, bukan slot terlewat.
+DEFAULT_GRACE = timedelta(seconds=60)
+
+
+class Schedule(Protocol):
+    def next_after(self, moment: datetime) -> Optional[datetime]:
+        """First fire time strictly after ``moment``, or ``None`` when finished."""
+
+
+@dataclass(frozen=True, slots=True)
+class OneShot:
+    at: datetime
+
+    def next_after(self, moment: datetime) -> Optional[datetime]:
+        return self.at if self.at > moment else None
+
+
+@dataclass(frozen=True, slots=True)
+class FixedRate:
+    interval: timedelta
+    anchor: datetime
+
+    def next_after(self, moment: datetime) -> Optional[datetime]:
+        if moment < self.anchor:
+            return self.anchor
+        steps = math.floor((moment - self.anchor) / self.interval) + 1
+        return self.anchor + steps * self.interval
+
+
+def _parse_field(text: str, low: int, high: int) -> FrozenSet[int]:
+    values = set()
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step <= 0:
+                raise ValueError(f"Step cron tidak valid: {text}")
+        if part in ("*", ""):
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"Nilai cron di luar rentang {low}-{high}: {text}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+@dataclass(frozen=True, slots=True)
+class CronSchedule:
+    """Five-field cron (``minute hour day month weekday``) with ``*``, lists, ranges and steps.
+
+    Weekday 0 and 7 are both Sunday. As in cron, when both day and weekday are
+    restricted a day matches if either one does.
+    """
+
+    expression: str
+    minutes: FrozenSet[int]
+    hours: FrozenSet[int]
+    days: FrozenSet[int]
+    months: FrozenSet[int]
+    weekdays: FrozenSet[int]
+    day_any: bool
+    weekday_any: bool
+    tz: ZoneInfo
+
+    @classmethod
+    def parse(cls, expression: str, tz: str = "UTC") -> "CronSchedule":
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Ekspresi cron harus 5 kolom: {expression!r}")
+        minute, hour, day, month, weekday = fields
+        weekdays = _parse_field(weekday, 0, 7)
+        return cls(
+            expression=expression,
+            minutes=_parse_field(minute, 0, 59),
+            hours=_parse_field(hour, 0, 23),
+            days=_parse_field(day, 1, 31),
+            months=_parse_field(month, 1, 12),
+            weekdays=frozenset(0 if value == 7 else value for value in weekdays),
+            day_any=day == "*",
+            weekday_any=weekday == "*",
+            tz=ZoneInfo(tz),
+        )
+
+    def _day_matches(self, local: datetime) -> bool:
+        if local.month not in self.months:
+            return False
+        in_days = local.day in self.days
+        # isoweekday: Senin=1..Minggu=7 -> cron: Minggu=0
+        in_weekdays = local.isoweekday() % 7 in self.weekdays
+        if self.day_any or self.weekday_any:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def next_after(self, moment: datetime) -> Optional[datetime]:
+        local = moment.replace(tzinfo=timezone.utc).astimezone(self.tz)
+        local = local.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        hours = sorted(self.hours)
+        minutes = sorted(self.minutes)
+        day = local.replace(hour=0, minute=0)
+        for offset in range(366 * 5):
+            candidate_day = (day + timedelta(days=offset)).replace(tzinfo=None)
+            if not self._day_matches(candidate_day):
+                continue
+            for hour in hours:
+                for minute in minutes:
+                    candidate = candidate_day.replace(hour=hour, minute=minute).replace(tzinfo=self.tz)
+                    if candidate < local:
+                        continue
+                    return candidate.astimezone(timezone.utc).replace(tzinfo=None)
+        return None
+
+
+def schedule_from_details(
+    schedule: Mapping[str, Any],
+    now: datetime,
+    stored_next_run: Optional[datetime],
+    tz: str,
+) -> Tuple[Schedule, str]:
+    """Build the schedule for a broadcast ``schedule`` detail; returns (schedule, catch_up policy).
+
+    ``stored_next_run`` (from ``tasks.next_run_at``) keeps fire times identical
+    across restarts.
+    """
+    mode = schedule.get("mode", "now")
+    catch_up = str(schedule.get("catch_up") or CATCH_UP_ONCE).lower()
+    if catch_up not in CATCH_UP_POLICIES:
+        raise ValueError(f"Kebijakan catch-up tidak dikenal: {catch_up}")
+    minutes = int(schedule.get("minutes", 0) or 0)
+
+    if mode == "delay":
+        return OneShot(stored_next_run or now + timedelta(minutes=max(minutes, 0))), catch_up
+    if mode == "interval":
+        # Putaran pertama langsung dikirim, berikutnya tiap `minutes` dari titik itu.
+        return FixedRate(timedelta(minutes=max(minutes, 1)), stored_next_run or now), catch_up
+    if mode == "cron":
+        return CronSchedule.parse(str(schedule.get("cron") or ""), tz), catch_up
+    raise ValueError(f"Mode jadwal '{mode}' tidak dikenali.")
+
+
+def first_fire_time(schedule: Schedule, now: datetime, stored_next_run: Optional[datetime]) -> Optional[datetime]:
+    if stored_next_run is not None:
+        return stored_next_run
+    if isinstance(schedule, (OneShot, FixedRate)):
+        return schedule.next_after(now - timedelta(microseconds=1))
+    return schedule.next_after(now)
+
+
+def plan_fire(
+    schedule: Schedule,
+    slot: datetime,
+    now: datetime,
+    catch_up: str,
+    grace: timedelta = DEFAULT_GRACE,
+) -> Tuple[bool, Optional[datetime]]:
+    """Decide whether the slot due at ``slot`` runs at ``now`` and when to fire next."""
+    if now - slot <= grace:
+        return True, _next_future(schedule, slot, now)
+    if catch_up == CATCH_UP_ALL:
+        # Slot berikutnya bisa masih di masa lalu; scheduler langsung menembakkannya lagi.
+        return True, schedule.next_after(slot)
+    return catch_up == CATCH_UP_ONCE, schedule.next_after(now)
+
+
+def _next_future(schedule: Schedule, slot: datetime, now: datetime) -> Optional[datetime]:
+    upcoming = schedule.next_after(slot)
+    if upcoming is not None and upcoming <= now - DEFAULT_GRACE:
+        upcoming = schedule.next_after(now)
+    return upcoming
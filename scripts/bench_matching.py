@@ -0,0 +1,128 @@
+"""Micro-benchmark: compiled KeywordMatcher vs. the old per-keyword checks.
+
+Jalankan dari root repo:
+
+    python scripts/bench_matching.py [--keywords 200] [--messages 2000]
+
+Skrip juga memverifikasi bahwa kedua implementasi memberi hasil yang sama.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import string
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.usecases.matching import KeywordMatcher, KeywordRule  # noqa: E402
+
+
+class LegacyMatcher:
+    """Salinan logika _WatcherState/_AutoReplyState sebelum matcher terkompilasi."""
+
+    def __init__(self, rule: KeywordRule) -> None:
+        self.rule = rule
+        self._keyword_checks = [self._make_checker(word, rule.keyword_match_type) for word in rule.keywords]
+        self._exclusion_checks = [self._make_checker(word, rule.exclusion_match_type) for word in rule.exclusions]
+
+    @staticmethod
+    def _make_checker(word: str, mode: str) -> Callable[[str, str], bool]:
+        if mode == "specific":
+            pattern = re.compile(rf"\b{re.escape(word)}\b", re.IGNORECASE)
+            return lambda original, _lowered: bool(pattern.search(original))
+        lowered_word = word.lower()
+        return lambda _original, lowered: lowered_word in lowered
+
+    def match(self, text: str) -> bool:
+        lowered = text.lower()
+        keyword_hits = [check(text, lowered) for check in self._keyword_checks]
+        if not keyword_hits:
+            return False
+        keywords_ok = all(keyword_hits) if self.rule.keyword_logic == "all" else any(keyword_hits)
+        if not keywords_ok:
+            return False
+        if not self._exclusion_checks:
+            return True
+        exclusion_hits = [check(text, lowered) for check in self._exclusion_checks]
+        blocked = all(exclusion_hits) if self.rule.exclusion_logic == "all" else any(exclusion_hits)
+        return not blocked
+
+
+def _random_word(rng: random.Random, low: int = 3, high: int = 9) -> str:
+    return "".join(rng.choice(string.ascii_lowercase[:12]) for _ in range(rng.randint(low, high)))
+
+
+def _make_messages(rng: random.Random, vocabulary: List[str], count: int) -> List[str]:
+    messages = []
+    for _ in range(count):
+        words = []
+        for _ in range(rng.randint(5, 60)):
+            word = rng.choice(vocabulary) if rng.random() < 0.05 else _random_word(rng, 2, 8)
+            words.append(word.upper() if rng.random() < 0.1 else word)
+        messages.append(rng.choice([" ", ", ", "-", ". "]).join(words))
+    return messages
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keywords", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    keywords = [_random_word(rng) for _ in range(args.keywords)]
+    # Sertakan prefix dan frasa agar kasus tumpang-tindih ikut teruji.
+    keywords += [keywords[0][:3], f"{keywords[1]} {keywords[2]}"]
+    exclusions = [_random_word(rng) for _ in range(max(args.keywords // 10, 1))]
+    messages = _make_messages(rng, keywords + exclusions, args.messages)
+
+    failures = 0
+    print(f"{'match_type':<10} {'logic':<5} {'legacy µs/msg':>14} {'compiled µs/msg':>16} {'speedup':>8}")
+    for match_type in ("contains", "specific"):
+        for logic in ("any", "all"):
+            rule_keywords = keywords if logic == "any" else keywords[:3]
+            rule = KeywordRule(
+                keywords=tuple(rule_keywords),
+                exclusions=tuple(exclusions),
+                keyword_match_type=match_type,
+                keyword_logic=logic,
+                exclusion_match_type=match_type,
+                exclusion_logic="any",
+            )
+            legacy = LegacyMatcher(rule)
+            compiled = KeywordMatcher(rule)
+
+            for text in messages:
+                if legacy.match(text) != compiled.match(text):
+                    failures += 1
+                    print(f"  MISMATCH ({match_type}/{logic}): {text[:80]!r}")
+
+            start = time.perf_counter()
+            for text in messages:
+                legacy.match(text)
+            legacy_us = (time.perf_counter() - start) / len(messages) * 1e6
+
+            start = time.perf_counter()
+            for text in messages:
+                compiled.match(text)
+            compiled_us = (time.perf_counter() - start) / len(messages) * 1e6
+
+            print(
+                f"{match_type:<10} {logic:<5} {legacy_us:>14.1f} {compiled_us:>16.1f} "
+                f"{legacy_us / compiled_us if compiled_us else float('inf'):>7.1f}x"
+            )
+
+    if failures:
+        print(f"{failures} hasil berbeda dari implementasi lama.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
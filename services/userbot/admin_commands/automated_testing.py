@@ -188,14 +188,10 @@ class AutomatedTestingCommand(UserbotCommand):
         await record('broadcast', 'completed', 'Dry run completed')
 
     async def _snapshot_tasks(self, ctx: CommandContext, record) -> None:
-        conn = get_db_connection()
-        try:
-            rows = conn.execute(
-                "SELECT process_id, command, status, details FROM tasks WHERE userbot_id = ? ORDER BY id DESC LIMIT 10",
-                (ctx.userbot_id,),
-            ).fetchall()
-        finally:
-            conn.close()
+        rows = get_db_connection().execute(
+            "SELECT process_id, command, status, details FROM tasks WHERE userbot_id = ? ORDER BY id DESC LIMIT 10",
+            (ctx.userbot_id,),
+        ).fetchall()
         snapshot = [
             {
                 'process_id': row['process_id'],
@@ -223,19 +219,20 @@ class AutomatedTestingCommand(UserbotCommand):
             job_logger=base_ctx.logger,
             update_status=_noop_status,
             refresh_task_details=_noop_refresh,
+            router=base_ctx.router,
+            entity_names=base_ctx.entity_names,
+            scheduler=base_ctx.scheduler,
+            borrow_client=base_ctx.borrow_client,
+            owns_userbot=base_ctx.owns_userbot,
         )
 
     @staticmethod
     def _fetch_groups(userbot_id: int) -> List[Dict[str, Any]]:
-        conn = get_db_connection()
-        try:
-            rows = conn.execute(
-                "SELECT telegram_group_id, group_name FROM groups WHERE userbot_id = ? ORDER BY group_name",
-                (userbot_id,),
-            ).fetchall()
-            return [dict(row) for row in rows]
-        finally:
-            conn.close()
+        rows = get_db_connection().execute(
+            "SELECT telegram_group_id, group_name FROM groups WHERE userbot_id = ? ORDER BY group_name",
+            (userbot_id,),
+        ).fetchall()
+        return [dict(row) for row in rows]
 
     def _resolve_target_pool(self, userbot_id: int, scope: str, raw_targets: List[Any]) -> List[int]:
         if scope == 'custom':
@@ -8,7 +8,7 @@ from typing import Dict, List
 
 from telethon.tl.types import Dialog
 
-from core.infra.database import get_db_connection
+from core.infra.database import transaction
 
 from services.userbot.commands.base import CommandContext, UserbotCommand
 
@@ -48,6 +48,10 @@ class SyncGroupsCommand(UserbotCommand):
                 logger.info("⏳ Sinkronisasi halaman %s/%s", page, total_pages)
 
         await self._persist_entries(ctx, entries)
+        ctx.entity_names.seed(
+            (int(entry['telegram_group_id']), str(entry['group_name'] or entry['username'] or ''))
+            for entry in entries
+        )
         await self._update_sync_log(ctx, entries)
 
         await ctx.refresh_task_details({'synced_items': len(entries)})
@@ -56,8 +60,7 @@ class SyncGroupsCommand(UserbotCommand):
 
     async def _persist_entries(self, ctx: CommandContext, entries: List[Dict[str, object]]) -> None:
         me = await ctx.client.get_me()
-        conn = get_db_connection()
-        try:
+        with transaction() as conn:
             conn.execute("DELETE FROM groups WHERE userbot_id = ?", (ctx.userbot_id,))
             if entries:
                 conn.executemany(
@@ -71,9 +74,6 @@ class SyncGroupsCommand(UserbotCommand):
                 "UPDATE userbots SET telegram_id = ?, username = ?, status = 'active' WHERE id = ?",
                 (getattr(me, 'id', None), getattr(me, 'username', None), ctx.userbot_id),
             )
-            conn.commit()
-        finally:
-            conn.close()
 
     async def _update_sync_log(self, ctx: CommandContext, entries: List[Dict[str, object]]) -> None:
         me = await ctx.client.get_me()
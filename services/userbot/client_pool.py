@@ -0,0 +1,318 @@
+"""Pool koneksi Telethon per userbot untuk task runner.
+
+Satu ``TelegramClient`` per userbot dipakai bersama oleh semua job. Pool
+memeriksa kesehatan koneksi secara berkala, menyambung ulang dengan backoff
+eksponensial, dan memutus client userbot yang tidak punya job setelah idle.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from telethon import TelegramClient, functions
+
+from core.infra.database import get_db_connection
+from services.userbot.entity_names import EntityNameCache, load_group_names
+from services.userbot.entity_session import PersistentStringSession, load_entity_rows, save_entity_rows
+from services.userbot.router import MessageRouter
+
+logger = logging.getLogger(__name__)
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        logger.warning("%s tidak valid, memakai nilai bawaan %s.", name, default)
+        return default
+
+
+# Client tanpa job diputus setelah idle sekian detik; 0 = tidak pernah.
+CLIENT_IDLE_TTL = _env_number('CLIENT_IDLE_TTL', 1800)
+CLIENT_HEALTH_INTERVAL = _env_number('CLIENT_HEALTH_INTERVAL', 60)
+# Batas koneksi Telegram baru yang dibuka bersamaan (warm-up saat startup dan start job paralel).
+CLIENT_CONNECT_CONCURRENCY = max(1, int(_env_number('CLIENT_CONNECT_CONCURRENCY', 5)))
+CLIENT_PROBE_TIMEOUT = 15.0
+RECONNECT_BACKOFF_MIN = 5.0
+RECONNECT_BACKOFF_MAX = 300.0
+
+
+@dataclass
+class ClientPoolStats:
+    connects: int = 0
+    reconnects: int = 0
+    reconnect_failures: int = 0
+    probe_failures: int = 0
+    idle_evictions: int = 0
+
+
+@dataclass
+class _ClientHealth:
+    last_used: float = field(default_factory=time.monotonic)
+    failures: int = 0
+    retry_at: float = 0.0
+
+
+class ClientManager:
+    """Pool koneksi Telethon per userbot dengan health probe, reconnect dan idle eviction.
+
+    Reconnect memakai objek ``TelegramClient`` yang sama sehingga handler router
+    tetap terpasang. ``busy(userbot_id)`` menandai userbot yang masih punya job;
+    client-nya tidak pernah diputus karena idle. Client yang sedang dipinjam
+    lewat :meth:`borrow` (mis. akun pool broadcast milik task lain) juga
+    dianggap sibuk.
+    """
+
+    def __init__(
+        self,
+        api_id: int,
+        api_hash: str,
+        busy: Optional[Callable[[int], bool]] = None,
+        entity_flush_interval: float = 60.0,
+        health_interval: float = CLIENT_HEALTH_INTERVAL,
+        idle_ttl: float = CLIENT_IDLE_TTL,
+        connect_concurrency: int = CLIENT_CONNECT_CONCURRENCY,
+    ) -> None:
+        self._api_id = api_id
+        self._api_hash = api_hash
+        self._clients: Dict[int, TelegramClient] = {}
+        self._sessions: Dict[int, PersistentStringSession] = {}
+        self._health: Dict[int, _ClientHealth] = {}
+        self._busy = busy or (lambda userbot_id: False)
+        self._borrowed: Dict[int, int] = {}
+        self._health_interval = health_interval
+        self._idle_ttl = idle_ttl
+        self._health_task: Optional[asyncio.Task[None]] = None
+        self._stats = ClientPoolStats()
+        self._connect_slots = asyncio.Semaphore(max(connect_concurrency, 1))
+        self._entity_flush_interval = entity_flush_interval
+        self._entity_flush_task: Optional[asyncio.Task[None]] = None
+        self._routers: Dict[int, MessageRouter] = {}
+        self._entity_names: Dict[int, EntityNameCache] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    async def get_client(self, userbot_id: int) -> TelegramClient:
+        if userbot_id in self._clients:
+            self._health[userbot_id].last_used = time.monotonic()
+            return self._clients[userbot_id]
+
+        lock = self._locks.setdefault(userbot_id, asyncio.Lock())
+        async with lock:
+            if userbot_id in self._clients:
+                return self._clients[userbot_id]
+
+            async with self._connect_slots:
+                session_value = self._fetch_session(userbot_id)
+                entities = await asyncio.to_thread(load_entity_rows, userbot_id)
+                session = PersistentStringSession(session_value, userbot_id, entities)
+                client = TelegramClient(session, self._api_id, self._api_hash)
+                await client.connect()
+                if not await client.is_user_authorized():
+                    raise RuntimeError("String session tidak valid atau kedaluwarsa.")
+
+            logger.info("Userbot %s terhubung dengan %s entitas dari cache.", userbot_id, len(entities))
+            self._clients[userbot_id] = client
+            self._sessions[userbot_id] = session
+            self._health[userbot_id] = _ClientHealth()
+            self._stats.connects += 1
+            if self._entity_flush_task is None:
+                self._entity_flush_task = asyncio.create_task(self._entity_flush_loop())
+            if self._health_task is None and self._health_interval > 0:
+                self._health_task = asyncio.create_task(self._health_loop())
+            return client
+
+    @asynccontextmanager
+    async def borrow(self, userbot_id: int) -> AsyncIterator[TelegramClient]:
+        """Pinjam client userbot; selama dipinjam client tidak diputus karena idle."""
+        self._borrowed[userbot_id] = self._borrowed.get(userbot_id, 0) + 1
+        try:
+            yield await self.get_client(userbot_id)
+        finally:
+            remaining = self._borrowed[userbot_id] - 1
+            if remaining:
+                self._borrowed[userbot_id] = remaining
+            else:
+                del self._borrowed[userbot_id]
+            health = self._health.get(userbot_id)
+            if health is not None:
+                health.last_used = time.monotonic()
+
+    def in_use(self, userbot_id: int) -> bool:
+        return userbot_id in self._borrowed or self._busy(userbot_id)
+
+    def get_router(self, userbot_id: int) -> MessageRouter:
+        """Router pesan tunggal untuk client userbot yang sudah terhubung."""
+        router = self._routers.get(userbot_id)
+        if router is None:
+            router = MessageRouter(self._clients[userbot_id])
+            self._routers[userbot_id] = router
+        return router
+
+    async def get_entity_names(self, userbot_id: int) -> EntityNameCache:
+        """Cache nama chat/pengirim per userbot, diisi awal dari tabel groups."""
+        names = self._entity_names.get(userbot_id)
+        if names is None:
+            names = EntityNameCache()
+            try:
+                names.seed(await asyncio.to_thread(load_group_names, userbot_id))
+            except sqlite3.Error as exc:
+                logger.warning("Gagal memuat nama grup untuk userbot %s: %s", userbot_id, exc)
+            names = self._entity_names.setdefault(userbot_id, names)
+        return names
+
+    async def flush_entities(self) -> None:
+        """Simpan entitas baru dari semua session ke tabel telethon_entities."""
+        for userbot_id, session in list(self._sessions.items()):
+            rows = session.take_dirty()
+            if not rows:
+                continue
+            try:
+                await asyncio.to_thread(save_entity_rows, userbot_id, rows)
+            except sqlite3.Error as exc:
+                logger.error("Gagal menyimpan %s entitas userbot %s: %s", len(rows), userbot_id, exc)
+                session.requeue(rows)
+
+    async def _entity_flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._entity_flush_interval)
+            await self.flush_entities()
+
+    async def release(self, userbot_id: int) -> None:
+        """Putuskan client userbot (dipindah ke worker lain atau idle terlalu lama)."""
+        client = self._clients.pop(userbot_id, None)
+        session = self._sessions.pop(userbot_id, None)
+        self._health.pop(userbot_id, None)
+        self._routers.pop(userbot_id, None)
+        self._entity_names.pop(userbot_id, None)
+        self._locks.pop(userbot_id, None)
+        if session is not None:
+            rows = session.take_dirty()
+            if rows:
+                try:
+                    await asyncio.to_thread(save_entity_rows, userbot_id, rows)
+                except sqlite3.Error as exc:
+                    logger.error("Gagal menyimpan %s entitas userbot %s: %s", len(rows), userbot_id, exc)
+        if client is not None:
+            try:
+                await client.disconnect()
+            except Exception:  # pragma: no cover - jaringan
+                pass
+
+    def connected_userbots(self) -> List[int]:
+        return list(self._clients)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'pool_size': len(self._clients),
+            'unhealthy': sum(1 for health in self._health.values() if health.failures),
+            'borrowed': len(self._borrowed),
+            **asdict(self._stats),
+        }
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._health_interval)
+            await self.check_health()
+
+    async def check_health(self) -> None:
+        """Putus client idle tanpa job, lalu probe (atau reconnect) client lainnya secara paralel."""
+        now = time.monotonic()
+        for userbot_id, health in list(self._health.items()):
+            if self._idle_ttl <= 0 or self.in_use(userbot_id) or now - health.last_used < self._idle_ttl:
+                continue
+            await self.release(userbot_id)
+            self._stats.idle_evictions += 1
+            logger.info("Client userbot %s diputus setelah idle %.0f detik tanpa job.", userbot_id, now - health.last_used)
+
+        due = [userbot_id for userbot_id, health in self._health.items() if health.retry_at <= now]
+        await asyncio.gather(*(self._probe(userbot_id) for userbot_id in due))
+
+    async def _probe(self, userbot_id: int) -> None:
+        client = self._clients.get(userbot_id)
+        health = self._health.get(userbot_id)
+        if client is None or health is None:
+            return
+        if not health.failures:
+            try:
+                if client.is_connected():
+                    await asyncio.wait_for(
+                        client(functions.PingRequest(ping_id=random.getrandbits(63))), CLIENT_PROBE_TIMEOUT
+                    )
+                    return
+                logger.warning("Client userbot %s terputus.", userbot_id)
+            except Exception as exc:  # pragma: no cover - jaringan
+                logger.warning("Health probe userbot %s gagal: %s", userbot_id, exc)
+            self._stats.probe_failures += 1
+        await self._reconnect(userbot_id, client, health)
+
+    async def _reconnect(self, userbot_id: int, client: TelegramClient, health: _ClientHealth) -> None:
+        self._stats.reconnects += 1
+        try:
+            try:
+                await client.disconnect()
+            except Exception:  # pragma: no cover - jaringan
+                pass
+            await asyncio.wait_for(client.connect(), CLIENT_PROBE_TIMEOUT)
+            if not await client.is_user_authorized():
+                raise RuntimeError("String session tidak valid atau kedaluwarsa.")
+        except Exception as exc:  # pragma: no cover - jaringan
+            health.failures += 1
+            delay = min(RECONNECT_BACKOFF_MIN * 2 ** (health.failures - 1), RECONNECT_BACKOFF_MAX)
+            health.retry_at = time.monotonic() + delay
+            self._stats.reconnect_failures += 1
+            logger.warning(
+                "Reconnect userbot %s gagal (percobaan %s): %s; dicoba lagi dalam %.0f detik.",
+                userbot_id, health.failures, exc, delay,
+            )
+            return
+        if self._clients.get(userbot_id) is not client:
+            # Client dilepas (idle/pindah worker) selama reconnect berlangsung.
+            await client.disconnect()
+            return
+        if health.failures:
+            logger.info("Userbot %s tersambung kembali setelah %s percobaan.", userbot_id, health.failures + 1)
+        else:
+            logger.info("Userbot %s tersambung kembali.", userbot_id)
+        health.failures = 0
+        health.retry_at = 0.0
+
+    async def close_all(self) -> None:
+        for task in (self._entity_flush_task, self._health_task):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._entity_flush_task = None
+        self._health_task = None
+        await self.flush_entities()
+        for client in list(self._clients.values()):
+            try:
+                await client.disconnect()
+            except Exception:  # pragma: no cover - jaringan
+                pass
+        self._clients.clear()
+        self._sessions.clear()
+        self._health.clear()
+        self._routers.clear()
+        self._entity_names.clear()
+        self._locks.clear()
+
+    @staticmethod
+    def _fetch_session(userbot_id: int) -> str:
+        row = get_db_connection().execute(
+            "SELECT string_session FROM userbots WHERE id = ?", (userbot_id,)
+        ).fetchone()
+
+        if not row or not row['string_session']:
+            raise RuntimeError(f"String session untuk userbot {userbot_id} tidak ditemukan.")
+        return row['string_session']
@@ -4,10 +4,14 @@ from __future__ import annotations
 import asyncio
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import Any, Awaitable, Callable, Dict, Optional
+from typing import Any, AsyncContextManager, Awaitable, Callable, Dict, Optional
 
 from telethon import TelegramClient
 
+from services.userbot.entity_names import EntityNameCache
+from services.userbot.router import MessageRouter
+from services.userbot.scheduler import Scheduler
+
 
 @dataclass(slots=True)
 class CommandContext:
@@ -21,6 +25,13 @@ class CommandContext:
     job_logger: Any
     update_status: Callable[[str, Optional[str]], Awaitable[None]]
     refresh_task_details: Callable[[Dict[str, Any]], Awaitable[None]]
+    router: MessageRouter
+    entity_names: EntityNameCache
+    scheduler: Scheduler
+    # Pinjam client userbot lain (akun pool); client tetap terhubung selama dipinjam.
+    borrow_client: Callable[[int], AsyncContextManager[TelegramClient]]
+    # False untuk userbot milik worker lain (mode sharding); client-nya tidak boleh dibuka di sini.
+    owns_userbot: Callable[[int], bool]
 
     @property
     def logger(self):
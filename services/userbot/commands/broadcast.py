@@ -3,12 +3,29 @@ from __future__ import annotations
 
 import asyncio
 import os
+from contextlib import AsyncExitStack
 from datetime import datetime
-from typing import Dict, List
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from telethon import TelegramClient
+
+from core.infra import broadcast_repository, task_repository
+from core.usecases.schedules import first_fire_time, plan_fire, schedule_from_details
+from services.userbot.delivery import DeliveryEngine, DeliveryReport, DeliveryResult, TokenBucket, get_rate_limiter
+from services.userbot.fanout import assign_targets
+from services.userbot.media_cache import media_uploads
 
 from .base import ActiveCommand, CommandContext, UserbotCommand
 
 
+# Zona waktu untuk jadwal cron broadcast.
+BROADCAST_TIMEZONE = os.getenv("BROADCAST_TIMEZONE") or "Asia/Jakarta"
+
+
+async def _wait_finished(finished: asyncio.Future[None]) -> None:
+    await finished
+
+
 class BroadcastCommand(UserbotCommand):
     def __init__(self) -> None:
         super().__init__(slug="broadcast")
@@ -21,27 +38,71 @@ class BroadcastCommand(UserbotCommand):
         schedule = details.get("schedule") or {"mode": "now", "minutes": 0}
         content: Dict[str, str] = details.get("content") or {}
         mode = schedule.get("mode", "now")
-        minutes = int(schedule.get("minutes", 0) or 0)
         dry_run = bool(details.get("dry_run"))
+        # Pool akun opsional: target dibagi ke akun yang menjadi anggota grup tersebut.
+        pool = [int(userbot_id) for userbot_id in details.get("userbot_pool") or []]
 
         if not targets or not content:
             logger.error("Broadcast tidak memiliki target atau konten yang valid. details=%s", details)
             await ctx.update_status("error", "Broadcast memerlukan target dan konten yang valid.")
             return None
 
-        async def _send_once() -> dict:
-            success = 0
-            failures: List[int] = []
-            for target in targets:
-                try:
+        async def _send_once(round_no: int = 1) -> dict:
+            already_sent = await asyncio.to_thread(
+                broadcast_repository.fetch_sent_targets, ctx.task_id, round_no
+            )
+            sent_keys = {str(target) for target in already_sent}
+            pending = [target for target in targets if str(target) not in sent_keys]
+            if sent_keys:
+                logger.info(
+                    "Melanjutkan broadcast putaran %s: %s target sudah terkirim, %s tersisa.",
+                    round_no,
+                    len(targets) - len(pending),
+                    len(pending),
+                )
+
+            async def _record(result: DeliveryResult) -> None:
+                await asyncio.to_thread(
+                    broadcast_repository.record_delivery,
+                    ctx.task_id,
+                    result.target,
+                    round_no,
+                    result.ok,
+                    result.attempts,
+                    result.error,
+                )
+
+            async def _run_account(userbot_id: int, account_targets: List[int]) -> DeliveryReport:
+                if userbot_id == ctx.userbot_id:
+                    return await _deliver_via(ctx.client, userbot_id, account_targets)
+                # Client akun pool dipinjam selama pengiriman agar tidak diputus sebagai client idle.
+                async with AsyncExitStack() as stack:
+                    try:
+                        client = await stack.enter_async_context(ctx.borrow_client(userbot_id))
+                    except Exception as exc:  # pragma: no cover - jaringan / session
+                        logger.error("Userbot %s tidak dapat dipakai untuk broadcast: %s", userbot_id, exc)
+                        for target in account_targets:
+                            await _record(DeliveryResult(target, False, 0, f"userbot {userbot_id}: {exc}"))
+                        return DeliveryReport(failures=list(account_targets))
+                    return await _deliver_via(client, userbot_id, account_targets)
+
+            async def _deliver_via(client: TelegramClient, userbot_id: int, account_targets: List[int]) -> DeliveryReport:
+                async def _deliver(target: int) -> None:
                     if dry_run:
-                        logger.info("Broadcast dry-run ke %s (tidak mengirim konten).", target)
-                    else:
-                        await self._send_content(ctx, target, content)
-                    success += 1
-                except Exception as exc:  # pragma: no cover - jaringan
-                    logger.warning("Gagal mengirim broadcast ke %s: %s", target, exc)
-                    failures.append(target)
+                        logger.info("Broadcast dry-run ke %s via userbot %s (tidak mengirim konten).", target, userbot_id)
+                        return
+                    await self._send_content(client, userbot_id, target, content)
+
+                # Dry-run tidak menyentuh Telegram, jadi tidak perlu memakai kuota akun.
+                limiter = TokenBucket(1000.0, 1000) if dry_run else get_rate_limiter(userbot_id)
+                return await DeliveryEngine(_deliver, limiter, on_result=_record).run(account_targets)
+
+            assignment = await self._assign_accounts(ctx, pool, pending)
+            reports = await asyncio.gather(
+                *(_run_account(userbot_id, account_targets) for userbot_id, account_targets in assignment.items())
+            )
+            success = len(targets) - len(pending) + sum(report.success for report in reports)
+            failures = [target for report in reports for target in report.failures]
             timestamp = datetime.utcnow().isoformat()
             await ctx.refresh_task_details(
                 {
@@ -67,52 +128,137 @@ class BroadcastCommand(UserbotCommand):
             await ctx.update_status("completed", None)
             return None
 
-        if mode == "delay":
-            await ctx.update_status("scheduled", None)
+        if mode in ("delay", "interval", "cron"):
+            return await self._start_scheduled(ctx, schedule, _send_once)
 
-            async def _delayed_delivery() -> None:
-                await asyncio.sleep(max(minutes, 0) * 60)
-                await ctx.update_status("running", None)
-                await _send_once()
-                await ctx.update_status("completed", None)
+        logger.error("Mode broadcast tidak dikenal: %s", mode)
+        await ctx.update_status("error", f"Mode jadwal '{mode}' tidak dikenali.")
+        return None
+
+    async def _start_scheduled(
+        self,
+        ctx: CommandContext,
+        schedule: Dict[str, Any],
+        send_once: Callable[[int], Awaitable[dict]],
+    ) -> ActiveCommand | None:
+        """Daftarkan broadcast ke scheduler pusat; waktu jalan disimpan di ``tasks.next_run_at``."""
+        logger = ctx.logger
+        mode = schedule.get("mode")
+        now = datetime.utcnow().replace(microsecond=0)
+        stored_next_run = await asyncio.to_thread(task_repository.get_next_run_at, ctx.task_id)
+        try:
+            plan, catch_up = schedule_from_details(schedule, now, stored_next_run, BROADCAST_TIMEZONE)
+        except ValueError as exc:
+            logger.error("Jadwal broadcast tidak valid: %s", exc)
+            await ctx.update_status("error", str(exc))
+            return None
 
-            task = asyncio.create_task(_delayed_delivery())
-            active = ActiveCommand()
-            active.register_task(task)
-            return active
+        first_fire = first_fire_time(plan, now, stored_next_run)
+        if first_fire is None:
+            await ctx.update_status("error", "Jadwal broadcast tidak memiliki waktu jalan berikutnya.")
+            return None
 
-        if mode == "interval":
-            interval_minutes = max(minutes, 1)
-            await ctx.update_status("interval", None)
+        recurring = mode != "delay"
+        await ctx.update_status("interval" if recurring else "scheduled", None)
+        await asyncio.to_thread(task_repository.set_next_run_at, ctx.task_id, first_fire)
+        if stored_next_run is not None:
+            logger.info("Jadwal broadcast dipulihkan; jalan berikutnya %s UTC.", first_fire)
+        delivery_count = int(ctx.details.get("delivery_count") or 0)
+        # Selesai saat jadwal habis atau pengiriman gagal; runner menutup job lewat task penunggunya.
+        finished: asyncio.Future[None] = asyncio.get_running_loop().create_future()
 
-            async def _loop() -> None:
-                delivery_count = 0
-                while True:
-                    await _send_once()
+        async def _on_fire(slot: datetime) -> Optional[datetime]:
+            nonlocal delivery_count
+            try:
+                run, next_fire = plan_fire(plan, slot, datetime.utcnow(), catch_up)
+                updates: Dict[str, Any] = {}
+                if run:
+                    if not recurring:
+                        await ctx.update_status("running", None)
+                    await send_once(delivery_count + 1)
                     delivery_count += 1
-                    await ctx.refresh_task_details({"delivery_count": delivery_count})
-                    await asyncio.sleep(interval_minutes * 60)
+                    updates["delivery_count"] = delivery_count
+                else:
+                    logger.info("Slot broadcast %s UTC terlewat dan dilewati (catch_up=%s).", slot, catch_up)
+                # Ronde dan jadwal berikutnya ditulis bersama: setelah crash ronde lama tidak dipakai ulang.
+                await asyncio.to_thread(task_repository.set_next_run_at, ctx.task_id, next_fire, updates)
+            except Exception as exc:
+                logger.exception("Broadcast terjadwal gagal: %s", exc)
+                await asyncio.to_thread(task_repository.set_next_run_at, ctx.task_id, None)
+                if not finished.done():
+                    finished.set_exception(exc)
+                return None
 
-            task = asyncio.create_task(_loop())
-            active = ActiveCommand()
-            active.register_task(task)
-            return active
+            if next_fire is None:
+                await ctx.update_status("completed", None)
+                if not finished.done():
+                    finished.set_result(None)
+            return next_fire
 
-        logger.error("Mode broadcast tidak dikenal: %s", mode)
-        await ctx.update_status("error", f"Mode jadwal '{mode}' tidak dikenali.")
-        return None
+        ctx.scheduler.schedule(ctx.process_id, first_fire, _on_fire)
+
+        async def _unschedule() -> None:
+            await ctx.scheduler.cancel(ctx.process_id)
+            await asyncio.to_thread(task_repository.set_next_run_at, ctx.task_id, None)
+
+        active = ActiveCommand()
+        active.add_stop_callback(_unschedule)
+        active.register_task(asyncio.create_task(_wait_finished(finished)))
+        return active
+
+    async def _assign_accounts(
+        self,
+        ctx: CommandContext,
+        pool: List[int],
+        targets: List[int],
+    ) -> Dict[int, List[int]]:
+        """Bagi target ke akun pool; tanpa pool semua target dikirim oleh userbot task.
+
+        Dalam mode sharding hanya akun pool milik worker ini yang dipakai: session
+        yang sama tidak boleh tersambung dari dua proses sekaligus. Target yang
+        semestinya dikirim akun lain dibagi ke akun yang tersisa.
+        """
+        foreign = [userbot_id for userbot_id in pool if not ctx.owns_userbot(userbot_id)]
+        if foreign:
+            ctx.logger.warning(
+                "Akun pool %s dimiliki worker lain dan tidak dipakai untuk broadcast ini.",
+                ", ".join(str(userbot_id) for userbot_id in foreign),
+            )
+        accounts = list(dict.fromkeys([ctx.userbot_id, *(uid for uid in pool if uid not in foreign)]))
+        if len(accounts) == 1 or not targets:
+            return {ctx.userbot_id: list(targets)} if targets else {}
+
+        memberships = await asyncio.to_thread(broadcast_repository.fetch_pool_memberships, accounts)
+        capacity = {userbot_id: get_rate_limiter(userbot_id).capacity() for userbot_id in accounts}
+        assignment, unassigned = assign_targets(targets, memberships, capacity)
+        if unassigned:
+            # Tidak ada anggota yang tercatat (mis. grup belum disinkronkan); coba lewat userbot task.
+            ctx.logger.warning(
+                "%s target tidak ditemukan di grup akun pool; dikirim lewat userbot %s.",
+                len(unassigned),
+                ctx.userbot_id,
+            )
+            assignment.setdefault(ctx.userbot_id, []).extend(unassigned)
+        ctx.logger.info(
+            "Broadcast dibagi ke %s akun: %s",
+            len(assignment),
+            ", ".join(f"{userbot_id}={len(items)}" for userbot_id, items in assignment.items()),
+        )
+        return assignment
 
-    async def _send_content(self, ctx: CommandContext, target: int, content: Dict[str, str]) -> None:
+    async def _send_content(self, client: TelegramClient, userbot_id: int, target: int, content: Dict[str, str]) -> None:
         content_type = content.get("type")
         if content_type == "text":
-            await ctx.client.send_message(target, content.get("text", ""))
+            await client.send_message(target, content.get("text", ""))
             return
 
         if content_type == "photo":
             path = content.get("path")
             if not path or not os.path.exists(path):
                 raise FileNotFoundError(f"File foto tidak ditemukan: {path}")
-            await ctx.client.send_file(
+            await media_uploads.send_file(
+                client,
+                userbot_id,
                 target,
                 path,
                 caption=content.get("caption"),
@@ -123,7 +269,9 @@ class BroadcastCommand(UserbotCommand):
             path = content.get("path")
             if not path or not os.path.exists(path):
                 raise FileNotFoundError(f"File dokumen tidak ditemukan: {path}")
-            await ctx.client.send_file(
+            await media_uploads.send_file(
+                client,
+                userbot_id,
                 target,
                 path,
                 caption=content.get("caption"),
@@ -134,7 +282,7 @@ class BroadcastCommand(UserbotCommand):
         if content_type == "forward":
             from_chat_id = int(content.get("from_chat_id"))
             message_id = int(content.get("message_id"))
-            await ctx.client.forward_messages(target, message_id, from_chat_id)
+            await client.forward_messages(target, message_id, from_chat_id)
             return
 
         raise ValueError(f"Jenis konten broadcast tidak dikenal: {content_type}")
@@ -1,11 +1,10 @@
 """Watcher command implementation."""
 from __future__ import annotations
 
-import re
 from dataclasses import dataclass
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from typing import Callable, List, Optional
+from typing import Optional
 
 from telethon import events
 
@@ -16,60 +15,21 @@ from core.infra.google_sheets import (
     GoogleSheetsPermissionError,
     GoogleSheetsRecorder,
 )
+from core.infra.sheet_spool import SheetRowSpool
+from core.infra.sheet_writer import BufferedSheetsWriter
+from core.usecases.matching import KeywordRule
+from services.userbot.router import IncomingMessage
 
 from .base import ActiveCommand, CommandContext, UserbotCommand
 
 
 @dataclass
 class _WatcherState:
-    keywords: List[str]
-    exclusions: List[str]
     destination: dict
     label: str
-    keyword_match_type: str = "contains"
-    keyword_logic: str = "any"
-    exclusion_match_type: str = "contains"
-    exclusion_logic: str = "any"
     counter: int = 0
     sheet_recorder: Optional[GoogleSheetsRecorder] = None
-    _keyword_checks: List[Callable[[str, str], bool]] | None = None
-    _exclusion_checks: List[Callable[[str, str], bool]] | None = None
-
-    def __post_init__(self) -> None:
-        self._keyword_checks = [self._make_checker(word, self.keyword_match_type) for word in self.keywords]
-        self._exclusion_checks = [self._make_checker(word, self.exclusion_match_type) for word in self.exclusions]
-
-    def _make_checker(self, word: str, mode: str) -> Callable[[str, str], bool]:
-        if mode == "specific":
-            pattern = re.compile(rf"\b{re.escape(word)}\b", re.IGNORECASE)
-            return lambda original, _lowered: bool(pattern.search(original))
-        lowered_word = word.lower()
-        return lambda _original, lowered: lowered_word in lowered
-
-    def match(self, text: str) -> bool:
-        lowered = text.lower()
-        keyword_hits = [check(text, lowered) for check in (self._keyword_checks or [])]
-        if not keyword_hits:
-            return False
-
-        if self.keyword_logic == "all":
-            keywords_ok = all(keyword_hits)
-        else:
-            keywords_ok = any(keyword_hits)
-
-        if not keywords_ok:
-            return False
-
-        if not self._exclusion_checks:
-            return True
-
-        exclusion_hits = [check(text, lowered) for check in self._exclusion_checks]
-        if self.exclusion_logic == "all":
-            blocked = all(exclusion_hits)
-        else:
-            blocked = any(exclusion_hits)
-
-        return not blocked
+    sheet_writer: Optional[BufferedSheetsWriter] = None
 
 
 class WatcherCommand(UserbotCommand):
@@ -80,14 +40,10 @@ class WatcherCommand(UserbotCommand):
         details = ctx.details
         logger = ctx.logger
         targets = details.get("targets") or []
-        keywords = [str(item).strip().lower() for item in details.get("keywords", []) if str(item).strip()]
-        exclusions = [str(item).strip().lower() for item in details.get("exclusions", []) if str(item).strip()]
+        rule = KeywordRule.from_details(details)
+        keywords = rule.keywords
         destination = details.get("destination") or {"mode": "local", "sheet_ref": None}
         label = details.get("label") or f"Watcher {ctx.process_id}" if ctx.process_id else "Watcher"
-        keyword_match_type = str(details.get("keyword_match_type") or "contains").lower()
-        keyword_logic = str(details.get("keyword_logic") or "any").lower()
-        exclusion_match_type = str(details.get("exclusion_match_type") or "contains").lower()
-        exclusion_logic = str(details.get("exclusion_logic") or "any").lower()
 
         if not targets or not keywords:
             logger.error("Data watcher tidak valid. targets=%s keywords=%s", targets, keywords)
@@ -158,26 +114,33 @@ class WatcherCommand(UserbotCommand):
             )
 
         state = _WatcherState(
-            keywords=keywords,
-            exclusions=exclusions,
             destination=destination,
             label=label,
-            keyword_match_type="specific" if keyword_match_type == "specific" else "contains",
-            keyword_logic="all" if keyword_logic == "all" else "any",
-            exclusion_match_type="specific" if exclusion_match_type == "specific" else "contains",
-            exclusion_logic="all" if exclusion_logic == "all" else "any",
             sheet_recorder=sheet_recorder,
         )
-        handler = events.NewMessage(chats=targets)
 
-        async def _on_message(event: events.NewMessage.Event) -> None:
-            if event.out:
-                return
-            message_text = event.raw_text or ""
-            if not message_text:
-                return
-            if not state.match(message_text):
+        async def _on_sheet_flush(written: int, error: Optional[GoogleSheetsError], depth: int) -> None:
+            now = datetime.now(ZoneInfo("Asia/Jakarta")).isoformat()
+            if error is not None:
+                ctx.logger.error("Gagal menulis ke Google Sheets (%s baris di spool): %s", depth, error)
+                await ctx.refresh_task_details(
+                    {"last_sheet_error": str(error), "last_sheet_error_at": now, "sheet_spool_depth": depth}
+                )
                 return
+            ctx.logger.info("Watcher mencatat %s baris baru ke Google Sheets.", written)
+            await ctx.refresh_task_details({"last_sheet_append": now, "sheet_spool_depth": depth})
+
+        if sheet_recorder is not None:
+            # Baris masuk spool SQLite dulu; pengiriman ke Sheets berjalan di latar belakang.
+            state.sheet_writer = BufferedSheetsWriter(
+                sheet_recorder,
+                queue=SheetRowSpool(ctx.process_id),
+                on_flush=_on_sheet_flush,
+            )
+            await state.sheet_writer.start()
+
+        async def _on_message(event: events.NewMessage.Event, message: IncomingMessage) -> None:
+            message_text = message.text
 
             state.counter += 1
             record_time = datetime.now(ZoneInfo("Asia/Jakarta")).isoformat()
@@ -194,26 +157,11 @@ class WatcherCommand(UserbotCommand):
                 "last_match_at": record_time,
             }
 
-            if state.sheet_recorder:
-                chat_name = ""
-                try:
-                    chat = await event.get_chat()
-                    chat_name = getattr(chat, "title", None) or getattr(chat, "username", None) or ""
-                except Exception:  # pragma: no cover - jaringan
-                    chat_name = ""
-
+            if state.sheet_writer:
+                # Nama diambil dari cache/entitas di update; RPC hanya bila keduanya kosong.
+                chat_name = await ctx.entity_names.chat_name(event)
+                username = await ctx.entity_names.sender_name(event)
                 sender_id = getattr(event, "sender_id", None)
-                username = ""
-                try:
-                    sender = await event.get_sender()
-                    username = getattr(sender, "username", None) or ""
-                    if not username:
-                        first_name = getattr(sender, "first_name", None) or ""
-                        last_name = getattr(sender, "last_name", None) or ""
-                        combined = (first_name + " " + last_name).strip()
-                        username = combined or ""
-                except Exception:  # pragma: no cover - jaringan
-                    username = ""
 
                 row = [
                     username,
@@ -227,26 +175,12 @@ class WatcherCommand(UserbotCommand):
                     str(event.id),
                 ]
 
-                try:
-                    await state.sheet_recorder.append_row(row)
-                except GoogleSheetsError as exc:
-                    ctx.logger.error("Gagal menulis ke Google Sheets: %s", exc)
-                    updates.update(
-                        {
-                            "last_sheet_error": str(exc),
-                            "last_sheet_error_at": record_time,
-                        }
-                    )
-                else:
-                    updates["last_sheet_append"] = record_time
-                    ctx.logger.info(
-                        "Watcher mencatat match #%s ke Google Sheets baris baru.",
-                        state.counter,
-                    )
+                await state.sheet_writer.append(row)
+                updates["sheet_spool_depth"] = state.sheet_writer.pending
 
             await ctx.refresh_task_details(updates)
 
-        ctx.client.add_event_handler(_on_message, handler)
+        subscription = await ctx.router.subscribe(targets, _on_message, name=ctx.process_id, rule=rule)
         await ctx.update_status("running", None)
         logger.info(
             "Watcher '%s' aktif pada %s target dengan %s kata kunci (process_id=%s)",
@@ -258,13 +192,9 @@ class WatcherCommand(UserbotCommand):
 
         active = ActiveCommand()
 
-        async def _remove_handler() -> None:
-            try:
-                ctx.client.remove_event_handler(_on_message, handler)
-            except ValueError:
-                pass
-
-        active.add_stop_callback(_remove_handler)
+        active.add_stop_callback(lambda: ctx.router.unsubscribe(subscription))
+        if state.sheet_writer is not None:
+            active.add_stop_callback(state.sheet_writer.close)
         return active
 
 
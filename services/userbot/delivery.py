@@ -0,0 +1,245 @@
+"""Concurrent, rate-aware delivery of one broadcast to many targets."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from telethon import errors
+
+logger = logging.getLogger(__name__)
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        logger.warning("%s tidak valid, memakai nilai bawaan %s.", name, default)
+        return default
+
+
+BROADCAST_WORKERS = max(1, int(_env_number('BROADCAST_WORKERS', 4)))
+BROADCAST_RATE_PER_SEC = max(0.01, _env_number('BROADCAST_RATE_PER_SEC', 1.0))
+BROADCAST_BURST = max(1, int(_env_number('BROADCAST_BURST', 5)))
+# FloodWait lebih lama dari ini dianggap gagal untuk target tersebut.
+MAX_FLOOD_WAIT_SECONDS = 900
+# Riwayat FloodWait menurunkan kapasitas akun; pengaruhnya meluruh dengan waktu paruh ini.
+FLOOD_PENALTY_HALF_LIFE = 600.0
+
+
+class TokenBucket:
+    """Token bucket shared by every sender of one Telegram account.
+
+    ``pause`` blocks all acquirers until the given delay passes, which is how an
+    account-wide ``FloodWaitError`` is honoured. The bucket also keeps the
+    observed send latency and flood-wait history used by :meth:`capacity`.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self._send_seconds = 0.0
+        self._flood_penalty = 0.0
+        self._penalty_updated = time.monotonic()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def record_send(self, duration: float) -> None:
+        if self._send_seconds:
+            self._send_seconds = 0.8 * self._send_seconds + 0.2 * duration
+        else:
+            self._send_seconds = duration
+
+    def _decayed_penalty(self) -> float:
+        now = time.monotonic()
+        self._flood_penalty *= 0.5 ** ((now - self._penalty_updated) / FLOOD_PENALTY_HALF_LIFE)
+        self._penalty_updated = now
+        return self._flood_penalty
+
+    def record_flood(self, seconds: float) -> None:
+        self._flood_penalty = self._decayed_penalty() + seconds
+
+    def capacity(self) -> float:
+        """Perkiraan pesan/detik yang sanggup dikirim akun ini sekarang."""
+        rate = self.rate
+        if self._send_seconds:
+            rate = min(rate, BROADCAST_WORKERS / self._send_seconds)
+        return rate / (1.0 + self._decayed_penalty() / 60.0)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+_limiters: Dict[int, TokenBucket] = {}
+
+
+def get_rate_limiter(userbot_id: int) -> TokenBucket:
+    """Limiter per akun; dipakai bersama oleh semua broadcast userbot tersebut."""
+    limiter = _limiters.get(userbot_id)
+    if limiter is None:
+        limiter = _limiters[userbot_id] = TokenBucket(BROADCAST_RATE_PER_SEC, BROADCAST_BURST)
+    return limiter
+
+
+@dataclass(slots=True)
+class DeliveryResult:
+    target: int
+    ok: bool
+    attempts: int
+    error: Optional[str] = None
+
+
+@dataclass(slots=True)
+class DeliveryReport:
+    success: int = 0
+    failures: List[int] = field(default_factory=list)
+
+
+SendFunc = Callable[[int], Awaitable[None]]
+ResultCallback = Callable[[DeliveryResult], Awaitable[None]]
+
+
+def _is_permanent(exc: Exception) -> bool:
+    # 400/403 dari Telegram (dilarang menulis, dibanned, chat privat) tidak berubah dengan retry.
+    return isinstance(
+        exc, (errors.BadRequestError, errors.ForbiddenError, FileNotFoundError, ValueError)
+    )
+
+
+class DeliveryEngine:
+    """Send to many targets with a bounded worker pool and a per-account rate limit.
+
+    ``FloodWaitError`` pauses the account limiter and defers the target until
+    the wait is over; ``SlowModeWaitError`` only defers that target. Such
+    deferrals do not use up attempts but are capped at ``max_deferrals`` per
+    target, after which the target is reported as failed. Other transient
+    errors are retried up to ``max_attempts`` times with exponential backoff
+    and jitter. Every final outcome is reported through
+    ``on_result`` so progress can be persisted.
+    """
+
+    def __init__(
+        self,
+        send: SendFunc,
+        limiter: TokenBucket,
+        workers: int = BROADCAST_WORKERS,
+        max_attempts: int = 3,
+        base_retry: float = 2.0,
+        on_result: Optional[ResultCallback] = None,
+        max_deferrals: int = 5,
+    ) -> None:
+        self._send = send
+        self._limiter = limiter
+        self._workers = max(1, workers)
+        self._max_attempts = max(1, max_attempts)
+        self._base_retry = base_retry
+        self._on_result = on_result
+        self._max_deferrals = max(0, max_deferrals)
+
+    async def run(self, targets: List[int]) -> DeliveryReport:
+        report = DeliveryReport()
+        if not targets:
+            return report
+
+        # (siap_pada, urutan, target, percobaan): target yang ditunda tidak menahan yang lain.
+        queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        for seq, target in enumerate(targets):
+            queue.put_nowait((0.0, seq, target, 0))
+        sequence = len(targets)
+        deferrals: Dict[int, int] = {}
+
+        async def _finish(result: DeliveryResult) -> None:
+            if result.ok:
+                report.success += 1
+            else:
+                report.failures.append(result.target)
+            if self._on_result is not None:
+                try:
+                    await self._on_result(result)
+                except Exception as exc:  # pragma: no cover - database terkunci
+                    logger.error("Gagal mencatat hasil pengiriman ke %s: %s", result.target, exc)
+
+        def _defer(target: int, attempt: int, delay: float) -> None:
+            nonlocal sequence
+            sequence += 1
+            queue.put_nowait((time.monotonic() + delay, sequence, target, attempt))
+
+        def _defer_wait(target: int, attempt: int, delay: float) -> bool:
+            """Tunda target karena FloodWait/SlowMode; False bila batas penundaan sudah habis."""
+            count = deferrals.get(target, 0) + 1
+            if count > self._max_deferrals:
+                return False
+            deferrals[target] = count
+            _defer(target, attempt - 1, delay)
+            return True
+
+        async def _worker() -> None:
+            while True:
+                ready_at, _, target, attempt = await queue.get()
+                try:
+                    wait = ready_at - time.monotonic()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    await self._limiter.acquire()
+                    attempt += 1
+                    started = time.monotonic()
+                    try:
+                        await self._send(target)
+                    except errors.FloodWaitError as exc:
+                        if exc.seconds > MAX_FLOOD_WAIT_SECONDS:
+                            self._limiter.record_flood(exc.seconds)
+                            await _finish(DeliveryResult(target, False, attempt, f"FloodWait {exc.seconds}s"))
+                            continue
+                        self._limiter.record_flood(exc.seconds)
+                        self._limiter.pause(exc.seconds)
+                        if not _defer_wait(target, attempt, exc.seconds):
+                            error = f"FloodWait {exc.seconds}s (ditunda {self._max_deferrals}x)"
+                            logger.warning("Gagal mengirim broadcast ke %s: %s", target, error)
+                            await _finish(DeliveryResult(target, False, attempt, error))
+                            continue
+                        logger.warning("FloodWait %ss saat mengirim ke %s; target ditunda.", exc.seconds, target)
+                    except errors.SlowModeWaitError as exc:
+                        if exc.seconds > MAX_FLOOD_WAIT_SECONDS or not _defer_wait(target, attempt, exc.seconds):
+                            await _finish(DeliveryResult(target, False, attempt, f"SlowMode {exc.seconds}s"))
+                            continue
+                    except Exception as exc:  # pragma: no cover - jaringan
+                        if _is_permanent(exc) or attempt >= self._max_attempts:
+                            logger.warning("Gagal mengirim broadcast ke %s: %s", target, exc)
+                            await _finish(DeliveryResult(target, False, attempt, str(exc)))
+                            continue
+                        delay = self._base_retry * (2 ** (attempt - 1))
+                        _defer(target, attempt, delay + random.uniform(0, delay))
+                    else:
+                        self._limiter.record_send(time.monotonic() - started)
+                        await _finish(DeliveryResult(target, True, attempt))
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(_worker()) for _ in range(min(self._workers, len(targets)))]
+        try:
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return report
@@ -0,0 +1,105 @@
+"""Write-behind buffer for task detail updates."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 0.5
+DEFAULT_MAX_PENDING = 50
+
+BatchWriter = Callable[[Dict[int, Dict[str, Any]]], None]
+
+
+class TaskDetailsBuffer:
+    """Coalesce ``refresh_task_details`` calls per task and flush them in one transaction.
+
+    Updates use ``dict.update`` semantics, so counters such as ``match_count``
+    and timestamps such as ``last_match_at`` simply keep their latest value
+    until the next flush. A flush happens ``flush_interval`` seconds after the
+    first buffered update, or sooner once ``max_pending`` updates are queued.
+    """
+
+    def __init__(
+        self,
+        writer: BatchWriter,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ) -> None:
+        self._writer = writer
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        # Jumlah merge yang belum ditulis, per task; totalnya dipakai untuk flush lebih awal.
+        self._merge_counts: Dict[int, int] = {}
+        self._pending_count = 0
+        self._has_data = asyncio.Event()
+        self._full = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._loop_task: Optional[asyncio.Task[None]] = None
+
+    def start(self) -> None:
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the background loop and force a final flush."""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+        await self.flush()
+
+    def merge(self, task_id: int, updates: Dict[str, Any]) -> None:
+        self._pending.setdefault(task_id, {}).update(updates)
+        self._merge_counts[task_id] = self._merge_counts.get(task_id, 0) + 1
+        self._pending_count += 1
+        self._has_data.set()
+        if self._pending_count >= self._max_pending:
+            self._full.set()
+
+    async def flush(self, task_id: Optional[int] = None) -> None:
+        """Write buffered updates now; only for ``task_id`` when given."""
+        async with self._flush_lock:
+            if task_id is None:
+                batch, self._pending = self._pending, {}
+                counts, self._merge_counts = self._merge_counts, {}
+            elif task_id in self._pending:
+                batch = {task_id: self._pending.pop(task_id)}
+                counts = {task_id: self._merge_counts.pop(task_id, 0)}
+            else:
+                return
+            self._pending_count = sum(self._merge_counts.values())
+            if not self._pending:
+                self._has_data.clear()
+            if self._pending_count < self._max_pending:
+                self._full.clear()
+            if not batch:
+                return
+
+            try:
+                await asyncio.to_thread(self._writer, batch)
+            except Exception as exc:  # pragma: no cover - database terkunci/rusak
+                logger.error("Gagal menulis %s pembaruan detail task: %s", len(batch), exc)
+                # Kembalikan ke buffer; pembaruan yang lebih baru tetap menang.
+                for pending_id, updates in batch.items():
+                    merged = dict(updates)
+                    merged.update(self._pending.get(pending_id, {}))
+                    self._pending[pending_id] = merged
+                    self._merge_counts[pending_id] = self._merge_counts.get(pending_id, 0) + counts.get(pending_id, 0)
+                self._pending_count = sum(self._merge_counts.values())
+                self._has_data.set()
+
+    async def _run(self) -> None:
+        while True:
+            await self._has_data.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
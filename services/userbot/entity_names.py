@@ -0,0 +1,108 @@
+"""In-process LRU cache of chat and sender display names for one userbot."""
+from __future__ import annotations
+
+import logging
+from collections import OrderedDict
+from typing import Any, Iterable, Optional, Tuple
+
+from telethon import events
+
+from core.infra.database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 4096
+
+
+def chat_display_name(entity: Any) -> str:
+    return getattr(entity, "title", None) or getattr(entity, "username", None) or ""
+
+
+def sender_display_name(entity: Any) -> str:
+    username = getattr(entity, "username", None) or ""
+    if username:
+        return username
+    first_name = getattr(entity, "first_name", None) or ""
+    last_name = getattr(entity, "last_name", None) or ""
+    return (first_name + " " + last_name).strip()
+
+
+def load_group_names(userbot_id: int) -> list[Tuple[int, str]]:
+    """Nama grup/channel dari tabel ``groups`` (diisi oleh sync_groups)."""
+    rows = get_db_connection().execute(
+        "SELECT telegram_group_id, group_name, username FROM groups WHERE userbot_id = ?",
+        (userbot_id,),
+    ).fetchall()
+    return [
+        (int(row['telegram_group_id']), row['group_name'] or row['username'] or "")
+        for row in rows
+    ]
+
+
+class EntityNameCache:
+    """Resolve chat/sender names for watcher rows without network calls when possible.
+
+    Lookup order: this cache (pre-seeded from ``groups``), then the entities
+    Telethon already attached to the update (``event.chat`` / ``event.sender``),
+    and only then ``get_chat()`` / ``get_sender()``. Results, including empty
+    names, are cached so a given peer costs at most one RPC.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        self._max_size = max_size
+        self._names: "OrderedDict[int, str]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def get(self, peer_id: Optional[int]) -> Optional[str]:
+        if peer_id is None:
+            return None
+        name = self._names.get(peer_id)
+        if name is not None:
+            self._names.move_to_end(peer_id)
+        return name
+
+    def put(self, peer_id: Optional[int], name: str) -> None:
+        if peer_id is None:
+            return
+        self._names[peer_id] = name
+        self._names.move_to_end(peer_id)
+        while len(self._names) > self._max_size:
+            self._names.popitem(last=False)
+
+    def seed(self, entries: Iterable[Tuple[int, str]]) -> None:
+        for peer_id, name in entries:
+            self.put(peer_id, name)
+
+    async def chat_name(self, event: events.NewMessage.Event) -> str:
+        cached = self.get(event.chat_id)
+        if cached is not None:
+            return cached
+        chat = event.chat
+        if chat is None:
+            try:
+                chat = await event.get_chat()
+            except Exception:  # pragma: no cover - jaringan
+                chat = None
+        name = chat_display_name(chat) if chat is not None else ""
+        self.put(event.chat_id, name)
+        return name
+
+    async def sender_name(self, event: events.NewMessage.Event) -> str:
+        sender = event.sender
+        if sender is not None:
+            # Entitas yang ikut di update selalu paling baru (username bisa berganti).
+            name = sender_display_name(sender)
+            self.put(event.sender_id, name)
+            return name
+        cached = self.get(event.sender_id)
+        if cached is not None:
+            return cached
+        try:
+            sender = await event.get_sender()
+        except Exception:  # pragma: no cover - jaringan
+            sender = None
+        name = sender_display_name(sender) if sender is not None else ""
+        self.put(event.sender_id, name)
+        return name
@@ -0,0 +1,91 @@
+"""Telethon ``StringSession`` whose entity cache survives restarts.
+
+``StringSession`` only encodes the auth key; its in-memory entity cache
+(ids, access hashes, usernames) is lost on every restart, so resolving
+targets and senders goes back to the network. ``PersistentStringSession``
+loads the cache from the ``telethon_entities`` table on start and writes new
+or changed entities back in batches via :meth:`flush`.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List, Tuple
+
+from telethon.sessions import StringSession
+
+from core.infra.database import get_db_connection, transaction
+
+logger = logging.getLogger(__name__)
+
+EntityRow = Tuple[int, int, Any, Any, Any]
+
+
+def load_entity_rows(userbot_id: int) -> List[EntityRow]:
+    conn = get_db_connection()
+    rows = conn.execute(
+        "SELECT entity_id, access_hash, username, phone, name FROM telethon_entities WHERE userbot_id = ?",
+        (userbot_id,),
+    ).fetchall()
+    known = {row['entity_id'] for row in rows}
+    entities: List[EntityRow] = [
+        (row['entity_id'], row['access_hash'], row['username'], row['phone'], row['name']) for row in rows
+    ]
+    # Grup/channel hasil sync_groups sudah punya access_hash; pakai sebagai cadangan.
+    for row in conn.execute(
+        "SELECT telegram_group_id, access_hash, username, group_name FROM groups "
+        "WHERE userbot_id = ? AND access_hash IS NOT NULL",
+        (userbot_id,),
+    ):
+        if row['telegram_group_id'] in known:
+            continue
+        try:
+            access_hash = int(row['access_hash'])
+        except (TypeError, ValueError):
+            continue
+        entities.append((row['telegram_group_id'], access_hash, row['username'], None, row['group_name']))
+    return entities
+
+
+def save_entity_rows(userbot_id: int, rows: List[EntityRow]) -> None:
+    with transaction() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO telethon_entities "
+            "(userbot_id, entity_id, access_hash, username, phone, name, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+            [(userbot_id, *row) for row in rows],
+        )
+
+
+class PersistentStringSession(StringSession):
+    """``StringSession`` with an entity cache backed by SQLite."""
+
+    def __init__(self, string: str, userbot_id: int, entities: List[EntityRow]) -> None:
+        super().__init__(string)
+        self.userbot_id = userbot_id
+        self._entities |= set(entities)
+        self._dirty: Dict[int, EntityRow] = {}
+
+    def process_entities(self, tlo: Any) -> None:
+        rows = self._entities_to_rows(tlo)
+        if not rows:
+            return
+        # Baris yang identik dengan cache sudah tersimpan; hanya entitas baru/berubah yang ditulis ulang.
+        new = set(rows) - self._entities
+        if not new:
+            return
+        self._entities |= new
+        for row in new:
+            self._dirty[row[0]] = row
+
+    def take_dirty(self) -> List[EntityRow]:
+        """Ambil entitas yang belum tersimpan (dipanggil dari event loop)."""
+        dirty, self._dirty = self._dirty, {}
+        return list(dirty.values())
+
+    def requeue(self, rows: List[EntityRow]) -> None:
+        for row in rows:
+            self._dirty.setdefault(row[0], row)
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty)
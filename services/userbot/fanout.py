@@ -0,0 +1,35 @@
+"""Assign broadcast targets across a pool of userbot accounts."""
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Mapping, Set, Tuple
+
+
+def assign_targets(
+    targets: Iterable[int],
+    members: Mapping[int, Set[int]],
+    capacity: Mapping[int, float],
+) -> Tuple[Dict[int, List[int]], List[int]]:
+    """Spread ``targets`` over accounts that are members of each target.
+
+    ``members`` maps userbot id -> chat ids it belongs to (from ``groups``);
+    ``capacity`` is each account's estimated messages per second. Targets with
+    the fewest candidate accounts are placed first, each on the candidate whose
+    queue would finish soonest (assigned / capacity). Returns the assignment
+    and the targets no account in the pool is a member of.
+    """
+    candidates: Dict[int, List[int]] = {}
+    unassigned: List[int] = []
+    for target in dict.fromkeys(targets):
+        accounts = [userbot_id for userbot_id, chats in members.items() if target in chats]
+        if accounts:
+            candidates[target] = accounts
+        else:
+            unassigned.append(target)
+
+    load: Dict[int, int] = {userbot_id: 0 for userbot_id in members}
+    assignment: Dict[int, List[int]] = {}
+    for target, accounts in sorted(candidates.items(), key=lambda item: len(item[1])):
+        best = min(accounts, key=lambda uid: (load[uid] + 1) / max(capacity.get(uid, 0.0), 1e-6))
+        load[best] += 1
+        assignment.setdefault(best, []).append(target)
+    return assignment, unassigned
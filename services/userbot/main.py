@@ -1,22 +1,31 @@
 import os
 import sys
+import argparse
 import asyncio
 import json
 import logging
+import sqlite3
+import time
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 from dotenv import load_dotenv
-from telethon import TelegramClient
-from telethon.sessions import StringSession
 
 from pkg.logger import setup_logger
 from pkg.pid_manager import PIDManager
-from core.infra.database import get_db_connection
+from core.infra import task_repository, worker_registry
+from core.infra.database import close_db_connections, initialize_database
+from core.infra.google_sheets import close_shared_clients
+from core.infra.task_signals import TaskSignalListener, notify_task_runner, worker_socket_path
 from services.userbot.commands import build_command_registry
 from services.userbot.commands.base import ActiveCommand, CommandContext, UserbotCommand
+from services.userbot.client_pool import ClientManager
+from services.userbot.details_buffer import TaskDetailsBuffer
+from services.userbot.scheduler import Scheduler
+from services.userbot.sheet_drainer import OrphanSpoolDrainer
+from services.userbot.sharding import WORKER_HEARTBEAT_INTERVAL, WORKER_TTL_SECONDS, HashRing
 
 load_dotenv()
 
@@ -40,54 +49,36 @@ except (TypeError, ValueError):
     logger.critical("API_ID harus berupa angka valid.")
     sys.exit(1)
 
-COMMAND_REGISTRY = build_command_registry()
+try:
+    # Task berstatus akhir yang lebih tua dari ini dipindah ke tasks_archive; 0 = nonaktif.
+    TASK_RETENTION_DAYS = int(os.getenv('TASK_RETENTION_DAYS') or 30)
+except ValueError:
+    logger.critical("TASK_RETENTION_DAYS harus berupa angka valid.")
+    sys.exit(1)
 
+try:
+    # Jumlah proses worker; >1 menjalankan supervisor yang membagi userbot antar worker.
+    USERBOT_WORKERS = int(os.getenv('USERBOT_WORKERS') or 1)
+except ValueError:
+    logger.critical("USERBOT_WORKERS harus berupa angka valid.")
+    sys.exit(1)
 
-class ClientManager:
-    """Cache koneksi Telethon per userbot."""
+COMMAND_REGISTRY = build_command_registry()
 
-    def __init__(self) -> None:
-        self._clients: Dict[int, TelegramClient] = {}
-        self._locks: Dict[int, asyncio.Lock] = {}
+# Status akhir; 'stop_requested' ikut dihitung karena runner yang akan menutupnya menjadi 'stopped'.
+TERMINAL_STATUSES = {'completed', 'error', 'stopped', 'stop_requested'}
 
-    async def get_client(self, userbot_id: int) -> TelegramClient:
-        if userbot_id in self._clients:
-            return self._clients[userbot_id]
+# Task yang baru diklaim, per userbot: userbot_id -> [(row, command)].
+ClaimedTasks = Dict[int, List[Tuple[Dict[str, Any], UserbotCommand]]]
 
-        lock = self._locks.setdefault(userbot_id, asyncio.Lock())
-        async with lock:
-            if userbot_id in self._clients:
-                return self._clients[userbot_id]
+# Status yang menandakan job sudah siap (listener terpasang atau jadwal terdaftar).
+ACTIVE_STATUSES = {'running', 'scheduled', 'interval'}
 
-            session_value = self._fetch_session(userbot_id)
-            client = TelegramClient(StringSession(session_value), API_ID, API_HASH)
-            await client.connect()
-            if not await client.is_user_authorized():
-                raise RuntimeError("String session tidak valid atau kedaluwarsa.")
+# Identitas runner tunggal untuk klaim task; PID lock menjamin hanya satu yang hidup.
+SINGLE_RUNNER_ID = 'main'
 
-            self._clients[userbot_id] = client
-            return client
-
-    async def close_all(self) -> None:
-        for client in list(self._clients.values()):
-            try:
-                await client.disconnect()
-            except Exception:  # pragma: no cover - jaringan
-                pass
-        self._clients.clear()
-        self._locks.clear()
-
-    @staticmethod
-    def _fetch_session(userbot_id: int) -> str:
-        conn = get_db_connection()
-        try:
-            row = conn.execute("SELECT string_session FROM userbots WHERE id = ?", (userbot_id,)).fetchone()
-        finally:
-            conn.close()
-
-        if not row or not row['string_session']:
-            raise RuntimeError(f"String session untuk userbot {userbot_id} tidak ditemukan.")
-        return row['string_session']
+# Kunci ring untuk pekerjaan global (retensi) agar hanya satu worker yang menjalankannya.
+MAINTENANCE_SHARD_KEY = 'maintenance'
 
 
 @dataclass
@@ -122,52 +113,276 @@ def create_job_logger(command: str, process_id: str) -> logging.Logger:
 
 
 class UserbotService:
-    def __init__(self) -> None:
-        self._client_manager = ClientManager()
+    def __init__(self, worker_id: Optional[str] = None) -> None:
+        self._client_manager = ClientManager(API_ID, API_HASH, busy=self._userbot_busy)
         self._active_jobs: Dict[str, ActiveJob] = {}
+        # Tanpa worker_id runner berjalan sebagai satu proses yang memiliki semua userbot.
+        self._worker_id = worker_id
+        self._runner_id = worker_id or SINGLE_RUNNER_ID
+        self._ring: Optional[HashRing] = None
+        # task_id -> userbot_id untuk task yang sudah diklaim dan sedang dijalankan command.start.
+        self._starting: Dict[int, int] = {}
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._signals = TaskSignalListener(worker_socket_path(worker_id) if worker_id else None)
+        self._details_buffer = TaskDetailsBuffer(self._write_task_details_batch)
+        self._scheduler = Scheduler()
+        # Polling cepat hanya dipakai bila socket sinyal tidak tersedia.
         self._loop_delay = 2.0
+        # Dengan socket sinyal aktif, polling hanya jaring pengaman.
+        self._fallback_poll_delay = 30.0
+        self._maintenance_interval = 3600.0
+        self._maintenance_task: Optional[asyncio.Task] = None
+        # Spool Sheets milik watcher yang sudah berhenti dikirim oleh runner pemilik userbot-nya.
+        self._spool_drainer = OrphanSpoolDrainer(self._owns)
+        self._drain_task: Optional[asyncio.Task] = None
+        self._startup_metrics: Dict[str, float] = {}
+        # Task startup pertama yang belum mencapai running/scheduled; None setelah metrik tercatat.
+        self._startup_waiting: Optional[Set[int]] = None
+        self._startup_began = 0.0
 
     async def run(self) -> None:
+        run_started = time.monotonic()
+        await asyncio.to_thread(initialize_database)
+        if self._worker_id:
+            await self._heartbeat()
+            await self._refresh_ring()
         await self._recover_inflight_tasks()
-        logger.info("Userbot task runner siap menerima instruksi.")
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        self._signals.start()
+        self._details_buffer.start()
+        self._scheduler.start()
+        poll_delay = self._fallback_poll_delay if self._signals.active else self._loop_delay
+        if self._worker_id:
+            poll_delay = min(poll_delay, WORKER_HEARTBEAT_INTERVAL)
+            logger.info("Worker %s siap menerima instruksi.", self._worker_id)
+        else:
+            logger.info("Userbot task runner siap menerima instruksi.")
 
         try:
             while True:
-                await self._process_pending_tasks()
+                if self._worker_id:
+                    await self._refresh_ring()
+                claimed = await self._claim_pending_tasks()
+                if self._maintenance_task is None:
+                    # Putaran pertama: job yang tertunda saat restart menentukan metrik startup.
+                    self._track_startup(claimed, run_started)
+                    self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+                    self._drain_task = asyncio.create_task(self._spool_drainer.run())
+                await self._start_claimed_tasks(claimed)
                 await self._process_stop_requests()
-                await asyncio.sleep(self._loop_delay)
+                await self._signals.wait(poll_delay)
         finally:
+            if self._heartbeat_task is not None:
+                self._heartbeat_task.cancel()
+            if self._maintenance_task is not None:
+                self._maintenance_task.cancel()
+            if self._drain_task is not None:
+                self._drain_task.cancel()
+            self._signals.close()
+            await self._scheduler.close()
+            await self._details_buffer.close()
+            await close_shared_clients()
             await self._client_manager.close_all()
+            close_db_connections()
 
-    async def _process_pending_tasks(self) -> None:
-        pending_rows = await asyncio.to_thread(self._fetch_pending_rows)
+    async def _claim_pending_tasks(self) -> ClaimedTasks:
+        """Klaim task pending milik runner ini, dikelompokkan per userbot."""
+        pending_rows = await asyncio.to_thread(task_repository.fetch_pending_tasks)
+        claimed: ClaimedTasks = {}
         for row in pending_rows:
             process_id = row['process_id']
-            if process_id in self._active_jobs:
+            if process_id in self._active_jobs or not self._owns(row['userbot_id']):
                 continue
             command = COMMAND_REGISTRY.get(row['command'])
             if not command:
                 await self._mark_task_error(row['id'], f"Command tidak dikenal: {row['command']}")
                 continue
+            if not await asyncio.to_thread(task_repository.claim_task, row['id'], self._runner_id):
+                # Sudah diklaim runner lain atau dihentikan sejak dibaca.
+                continue
+            self._starting[row['id']] = row['userbot_id']
+            claimed.setdefault(row['userbot_id'], []).append((row, command))
+        return claimed
+
+    async def _start_claimed_tasks(self, claimed: ClaimedTasks) -> None:
+        # Koneksi client dibatasi semaphore ClientManager; job satu akun tetap dimulai berurutan.
+        await asyncio.gather(*(self._start_userbot_tasks(items) for items in claimed.values()))
+
+    async def _start_userbot_tasks(self, items: List[Tuple[Dict[str, Any], UserbotCommand]]) -> None:
+        for row, command in items:
             try:
                 await self._start_task(row, command)
             except Exception as exc:  # pragma: no cover - jaringan
-                logger.exception("Gagal memulai task %s: %s", process_id, exc)
+                logger.exception("Gagal memulai task %s: %s", row['process_id'], exc)
                 await self._mark_task_error(row['id'], str(exc))
+            finally:
+                self._starting.pop(row['id'], None)
+                self._mark_started(row['id'])
+
+    def _track_startup(self, claimed: ClaimedTasks, began: float) -> None:
+        self._startup_began = began
+        self._startup_waiting = {row['id'] for items in claimed.values() for row, _ in items}
+        self._startup_metrics = {'startup_jobs': len(self._startup_waiting), 'startup_accounts': len(claimed)}
+        if not self._startup_waiting:
+            self._record_startup()
+
+    def _mark_started(self, task_id: int) -> None:
+        """Job dianggap sudah start saat mencapai running/scheduled/interval atau command.start selesai."""
+        if self._startup_waiting is None or task_id not in self._startup_waiting:
+            return
+        self._startup_waiting.discard(task_id)
+        if not self._startup_waiting:
+            self._record_startup()
+
+    def _record_startup(self) -> None:
+        # Hanya sampai job siap; pengiriman broadcast 'now' yang berjalan sesudahnya tidak ikut dihitung.
+        elapsed = time.monotonic() - self._startup_began
+        self._startup_waiting = None
+        self._startup_metrics['startup_seconds'] = round(elapsed, 3)
+        logger.info(
+            "Startup %s: %s job dari %s akun berjalan dalam %.2f detik.",
+            self._runner_id,
+            self._startup_metrics['startup_jobs'],
+            self._startup_metrics['startup_accounts'],
+            elapsed,
+        )
 
     async def _process_stop_requests(self) -> None:
-        stop_rows = await asyncio.to_thread(self._fetch_stop_rows)
+        stop_rows = await asyncio.to_thread(task_repository.fetch_stop_requests)
         if not stop_rows:
             return
         for row in stop_rows:
             process_id = row['process_id']
             job = self._active_jobs.pop(process_id, None)
-            if not job:
+            if job is None and not self._may_close(row):
+                continue
+            if job:
+                job.context.logger.info("Perintah dihentikan dari wizard.")
+                try:
+                    await job.command.stop(job.handle, job.context)
+                except Exception as exc:  # pragma: no cover - jaringan
+                    job.context.logger.exception("Gagal menghentikan job %s: %s", process_id, exc)
+                await self._details_buffer.flush(job.context.task_id)
+            # Tandai permintaan sudah ditangani agar tidak dipindai ulang di loop berikutnya.
+            await self._acknowledge_stop(row['id'])
+
+    async def _maintenance_loop(self) -> None:
+        while True:
+            await self._run_retention()
+            logger.info(
+                "Statistik runner %s: %s", self._runner_id, {**self._startup_metrics, **self._client_manager.stats()}
+            )
+            await asyncio.sleep(self._maintenance_interval)
+
+    async def _run_retention(self) -> None:
+        if TASK_RETENTION_DAYS <= 0 or not self._owns(MAINTENANCE_SHARD_KEY):
+            return
+        try:
+            archived = await asyncio.to_thread(task_repository.archive_terminal_tasks, TASK_RETENTION_DAYS)
+        except sqlite3.Error as exc:
+            logger.error("Retensi task gagal: %s", exc)
+            return
+        if archived:
+            logger.info("Retensi: %s task lebih tua dari %s hari dipindah ke arsip.", archived, TASK_RETENTION_DAYS)
+
+    def _userbot_busy(self, userbot_id: int) -> bool:
+        if userbot_id in self._starting.values():
+            return True
+        return any(job.context.userbot_id == userbot_id for job in self._active_jobs.values())
+
+    def _owns(self, key: Any) -> bool:
+        return self._ring is None or self._ring.owner(key) == self._worker_id
+
+    def _may_close(self, row: Dict[str, Any]) -> bool:
+        """Permintaan stop untuk job yang tidak berjalan di sini boleh ditutup bila tidak ada lease aktif lain."""
+        if row['worker_id'] not in (None, self._runner_id) and not row['lease_expired']:
+            return False
+        return self._owns(row['userbot_id'])
+
+    async def _heartbeat(self) -> None:
+        """Heartbeat registry (mode sharding), perpanjang lease, dan ambil ulang lease kedaluwarsa."""
+        try:
+            if self._worker_id:
+                await asyncio.to_thread(worker_registry.heartbeat, self._worker_id, os.getpid())
+            leased = {job.context.task_id for job in self._active_jobs.values()} | set(self._starting)
+            held = await asyncio.to_thread(task_repository.renew_leases, self._runner_id, leased)
+            reclaimed = await asyncio.to_thread(task_repository.reclaim_expired_leases)
+        except sqlite3.Error as exc:
+            logger.error("Heartbeat runner %s gagal: %s", self._runner_id, exc)
+            return
+        await self._drop_lost_jobs(leased - held)
+        if reclaimed:
+            logger.warning("Mengembalikan %s tugas dengan lease kedaluwarsa ke status pending.", reclaimed)
+            notify_task_runner()
+
+    async def _drop_lost_jobs(self, lost: Set[int]) -> None:
+        """Hentikan job lokal yang lease-nya sudah diambil atau dihentikan runner lain."""
+        if not lost:
+            return
+        for process_id, job in list(self._active_jobs.items()):
+            if job.context.task_id not in lost:
+                continue
+            self._active_jobs.pop(process_id, None)
+            job.context.logger.warning("Lease task %s hilang; job dihentikan di runner ini.", job.context.task_id)
+            try:
+                await job.command.stop(job.handle, job.context)
+            except Exception as exc:  # pragma: no cover - jaringan
+                job.context.logger.exception("Gagal menghentikan job %s: %s", process_id, exc)
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+            await self._heartbeat()
+
+    async def _refresh_ring(self) -> None:
+        """Hitung ulang pembagian userbot bila anggota worker yang hidup berubah."""
+        try:
+            live = await asyncio.to_thread(worker_registry.live_workers, WORKER_TTL_SECONDS)
+        except sqlite3.Error as exc:
+            logger.error("Gagal membaca registry worker: %s", exc)
+            return
+        ring = HashRing([*live, self._worker_id])
+        previous = self._ring
+        changed = previous is None or ring.nodes != previous.nodes
+        if changed:
+            self._ring = ring
+            logger.info("Worker %s: anggota shard sekarang %s.", self._worker_id, ', '.join(ring.nodes))
+        # Tiap putaran: client asing yang tadi masih dipakai job bisa jadi sudah bebas sekarang.
+        await self._release_foreign_userbots()
+        if changed and previous is not None:
+            # Task worker yang keluar dari ring tidak perlu menunggu lease-nya kedaluwarsa.
+            for departed in set(previous.nodes) - set(ring.nodes):
+                count = await asyncio.to_thread(task_repository.release_worker_tasks, departed)
+                if count:
+                    logger.warning("Mengembalikan %s tugas milik worker %s yang mati ke status pending.", count, departed)
+                    notify_task_runner()
+
+    async def _release_foreign_userbots(self) -> None:
+        """Hentikan job dan putuskan client userbot yang kini dimiliki worker lain."""
+        released: List[int] = []
+        for process_id, job in list(self._active_jobs.items()):
+            if self._owns(job.context.userbot_id):
                 continue
-            job.context.logger.info("Perintah dihentikan dari wizard.")
-            await job.command.stop(job.handle, job.context)
-            await job.context.refresh_task_details({'stopped_at': datetime.utcnow().isoformat()})
-            # Status sudah diset oleh wizard, pastikan detail konsisten
+            self._active_jobs.pop(process_id, None)
+            job.context.logger.info(
+                "Userbot %s pindah ke worker %s; job diserahkan.",
+                job.context.userbot_id, self._ring.owner(job.context.userbot_id),
+            )
+            try:
+                await job.command.stop(job.handle, job.context)
+            except Exception as exc:  # pragma: no cover - jaringan
+                job.context.logger.exception("Gagal menghentikan job %s: %s", process_id, exc)
+            await self._details_buffer.flush(job.context.task_id)
+            released.append(job.context.task_id)
+
+        for userbot_id in self._client_manager.connected_userbots():
+            # Client yang masih dipinjam broadcast (akun pool) diputus setelah pengirimannya selesai.
+            if not self._owns(userbot_id) and not self._client_manager.in_use(userbot_id):
+                await self._client_manager.release(userbot_id)
+
+        if released:
+            await asyncio.to_thread(task_repository.release_worker_tasks, self._runner_id, released)
+            notify_task_runner()
 
     async def _start_task(self, row: Dict[str, Any], command: UserbotCommand) -> None:
         task_id = row['id']
@@ -179,10 +394,14 @@ class UserbotService:
         job_logger = create_job_logger(command.slug, process_id)
 
         async def update_status(status: str, note: Optional[str]) -> None:
+            # Pastikan detail yang masih di buffer tertulis sebelum status berubah.
+            await self._details_buffer.flush(task_id)
             await self._update_task_status(task_id, status, note)
+            if status in ACTIVE_STATUSES:
+                self._mark_started(task_id)
 
         async def refresh_details(data: Dict[str, Any]) -> None:
-            await self._merge_task_details(task_id, data)
+            self._details_buffer.merge(task_id, data)
 
         ctx = CommandContext(
             userbot_id=userbot_id,
@@ -193,16 +412,22 @@ class UserbotService:
             job_logger=job_logger,
             update_status=update_status,
             refresh_task_details=refresh_details,
+            router=self._client_manager.get_router(userbot_id),
+            entity_names=await self._client_manager.get_entity_names(userbot_id),
+            scheduler=self._scheduler,
+            borrow_client=self._client_manager.borrow,
+            owns_userbot=self._owns,
         )
 
-        await ctx.update_status('running', None)
+        # Langsung ke repository: status awal ini belum berarti job siap (lihat _mark_started).
+        await self._update_task_status(task_id, 'running', None)
         job_logger.info("Menjalankan command '%s' (task_id=%s)", command.slug, task_id)
 
         active_handle = await command.start(ctx)
         if active_handle is None:
             job_logger.info("Command '%s' selesai tanpa job aktif.", command.slug)
             current_status = await self._get_task_status(task_id)
-            if current_status not in {'completed', 'error', 'stopped'}:
+            if current_status not in TERMINAL_STATUSES:
                 await ctx.update_status('completed', None)
             return
 
@@ -230,90 +455,37 @@ class UserbotService:
             return
 
         current_status = await self._get_task_status(ctx.task_id)
-        if current_status not in {'completed', 'error', 'stopped'}:
+        if current_status not in TERMINAL_STATUSES:
             await ctx.update_status('completed', None)
         self._active_jobs.pop(process_id, None)
 
     async def _update_task_status(self, task_id: int, status: str, note: Optional[str]) -> None:
-        def _update() -> None:
-            conn = get_db_connection()
-            try:
-                row = conn.execute("SELECT details FROM tasks WHERE id = ?", (task_id,)).fetchone()
-                details_dict: Dict[str, Any] = {}
-                if row and row['details']:
-                    try:
-                        details_dict = json.loads(row['details'])
-                    except json.JSONDecodeError:
-                        details_dict = {}
-                if note is not None:
-                    details_dict['last_status_note'] = note
-                conn.execute(
-                    "UPDATE tasks SET status = ?, details = ? WHERE id = ?",
-                    (status, json.dumps(details_dict), task_id),
-                )
-                conn.commit()
-            finally:
-                conn.close()
-        await asyncio.to_thread(_update)
+        await asyncio.to_thread(task_repository.update_task_status, task_id, status, note)
 
-    async def _merge_task_details(self, task_id: int, updates: Dict[str, Any]) -> None:
-        def _merge() -> None:
-            conn = get_db_connection()
-            try:
-                row = conn.execute("SELECT details FROM tasks WHERE id = ?", (task_id,)).fetchone()
-                current = {}
-                if row and row['details']:
-                    try:
-                        current = json.loads(row['details'])
-                    except json.JSONDecodeError:
-                        current = {}
-                current.update(updates)
-                conn.execute("UPDATE tasks SET details = ? WHERE id = ?", (json.dumps(current), task_id))
-                conn.commit()
-            finally:
-                conn.close()
-        await asyncio.to_thread(_merge)
+    @staticmethod
+    def _write_task_details_batch(batch: Dict[int, Dict[str, Any]]) -> None:
+        task_repository.merge_task_details_many(batch)
 
     async def _get_task_status(self, task_id: int) -> str:
-        def _fetch() -> str:
-            conn = get_db_connection()
-            try:
-                row = conn.execute("SELECT status FROM tasks WHERE id = ?", (task_id,)).fetchone()
-            finally:
-                conn.close()
-            return row['status'] if row else 'unknown'
-        return await asyncio.to_thread(_fetch)
+        return await asyncio.to_thread(task_repository.get_task_status, task_id)
 
     async def _mark_task_error(self, task_id: int, message: str) -> None:
-        def _update() -> None:
-            conn = get_db_connection()
-            try:
-                conn.execute(
-                    "UPDATE tasks SET status = 'error', details = json_set(COALESCE(details, '{}'), '$.error', ?) WHERE id = ?",
-                    (message, task_id),
-                )
-                conn.commit()
-            finally:
-                conn.close()
-        await asyncio.to_thread(_update)
+        await asyncio.to_thread(task_repository.mark_task_error, task_id, message)
+
+    async def _acknowledge_stop(self, task_id: int) -> None:
+        await asyncio.to_thread(task_repository.acknowledge_stop, task_id, datetime.utcnow().isoformat())
 
     async def _recover_inflight_tasks(self) -> None:
-        def _reset() -> int:
-            conn = get_db_connection()
-            try:
-                rows = conn.execute(
-                    "SELECT id FROM tasks WHERE status IN ('running', 'scheduled', 'interval')"
-                ).fetchall()
-                if not rows:
-                    return 0
-                conn.executemany("UPDATE tasks SET status = 'pending' WHERE id = ?", [(row['id'],) for row in rows])
-                conn.commit()
-                return len(rows)
-            finally:
-                conn.close()
-        count = await asyncio.to_thread(_reset)
-        if count:
-            logger.warning("Mengembalikan %s tugas yang belum selesai ke status pending setelah restart.", count)
+        """Lepas task dari instance runner ini sebelumnya, lalu task yang lease-nya kedaluwarsa.
+
+        Task yang masih di-lease runner lain yang hidup dibiarkan.
+        """
+        own = await asyncio.to_thread(task_repository.release_worker_tasks, self._runner_id)
+        expired = await asyncio.to_thread(task_repository.reclaim_expired_leases)
+        if own or expired:
+            logger.warning(
+                "Mengembalikan %s tugas yang belum selesai ke status pending setelah restart.", own + expired
+            )
 
     @staticmethod
     def _parse_details(raw: Optional[str]) -> Dict[str, Any]:
@@ -324,37 +496,45 @@ class UserbotService:
         except json.JSONDecodeError:
             return {}
 
-    @staticmethod
-    def _fetch_pending_rows() -> List[Dict[str, Any]]:
-        conn = get_db_connection()
-        try:
-            rows = conn.execute(
-                "SELECT * FROM tasks WHERE status = 'pending' ORDER BY id"
-            ).fetchall()
-            return [dict(row) for row in rows]
-        finally:
-            conn.close()
 
-    @staticmethod
-    def _fetch_stop_rows() -> List[Dict[str, Any]]:
-        conn = get_db_connection()
-        try:
-            rows = conn.execute(
-                "SELECT * FROM tasks WHERE status = 'stopped' ORDER BY id"
-            ).fetchall()
-            return [dict(row) for row in rows]
-        finally:
-            conn.close()
+async def main_async(worker_id: Optional[str] = None) -> None:
+    service = UserbotService(worker_id)
+    await service.run()
 
 
-async def main_async() -> None:
-    service = UserbotService()
-    await service.run()
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Userbot task runner Little Ghost.")
+    parser.add_argument(
+        '--workers', type=int, default=USERBOT_WORKERS,
+        help="Jumlah proses worker; lebih dari 1 menjalankan mode supervisor (default: USERBOT_WORKERS).",
+    )
+    parser.add_argument('--worker-id', help="Jalankan sebagai worker shard (dipakai oleh supervisor).")
+    args = parser.parse_args(argv)
+    if args.worker_id and not args.worker_id.replace('-', '').replace('_', '').isalnum():
+        parser.error("--worker-id hanya boleh berisi huruf, angka, '-' dan '_'.")
+    return args
 
 
 if __name__ == "__main__":
-    with PIDManager("userbot"):
-        try:
-            asyncio.run(main_async())
-        except KeyboardInterrupt:
-            logger.info("Layanan Userbot dihentikan secara manual.")
+    args = parse_args()
+    if args.worker_id:
+        # PID per worker; file pids/userbot.pid tetap milik supervisor atau runner tunggal.
+        with PIDManager(f"userbot-{args.worker_id}"):
+            try:
+                asyncio.run(main_async(args.worker_id))
+            except KeyboardInterrupt:
+                logger.info("Worker %s dihentikan secara manual.", args.worker_id)
+    elif args.workers > 1:
+        from services.userbot.supervisor import run_supervisor
+
+        with PIDManager("userbot"):
+            try:
+                run_supervisor(args.workers)
+            except KeyboardInterrupt:
+                logger.info("Supervisor Userbot dihentikan secara manual.")
+    else:
+        with PIDManager("userbot"):
+            try:
+                asyncio.run(main_async())
+            except KeyboardInterrupt:
+                logger.info("Layanan Userbot dihentikan secara manual.")
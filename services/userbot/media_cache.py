@@ -0,0 +1,111 @@
+"""Upload-once media handles for broadcasts.
+
+``client.send_file(target, path)`` uploads the file bytes on every call. The
+cache uploads a file once per (userbot, sha256, document flag), sends with the
+resulting ``InputFile`` and, after the first successful send, reuses the
+server-side ``Photo``/``Document`` from that message, so later targets and
+later interval rounds upload nothing.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from telethon import TelegramClient, errors
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRIES = 256
+_HASH_CHUNK = 1024 * 1024
+
+MediaKey = Tuple[int, str, bool]
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(_HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass(slots=True)
+class _MediaEntry:
+    input_file: Any
+    media: Any = None
+
+
+class MediaUploadCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES) -> None:
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[MediaKey, _MediaEntry]" = OrderedDict()
+        self._locks: Dict[MediaKey, asyncio.Lock] = {}
+        # (path, mtime, ukuran) -> sha256 agar file tidak di-hash ulang per target.
+        self._digests: Dict[Tuple[str, float, int], str] = {}
+
+    async def _digest(self, path: str) -> str:
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime, stat.st_size)
+        digest = self._digests.get(key)
+        if digest is None:
+            digest = self._digests[key] = await asyncio.to_thread(file_sha256, path)
+        return digest
+
+    async def _entry(self, client: TelegramClient, key: MediaKey, path: str) -> _MediaEntry:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                logger.info("Mengunggah media broadcast %s (sekali untuk semua target).", path)
+                entry = _MediaEntry(input_file=await client.upload_file(path))
+                self._entries[key] = entry
+                while len(self._entries) > self._max_entries:
+                    old_key, _ = self._entries.popitem(last=False)
+                    self._locks.pop(old_key, None)
+        return entry
+
+    def invalidate(self, key: MediaKey) -> None:
+        self._entries.pop(key, None)
+
+    async def send_file(
+        self,
+        client: TelegramClient,
+        userbot_id: int,
+        target: Any,
+        path: str,
+        caption: Optional[str] = None,
+        force_document: bool = False,
+    ) -> Any:
+        key: MediaKey = (userbot_id, await self._digest(path), force_document)
+        for attempt in range(2):
+            entry = await self._entry(client, key, path)
+            try:
+                message = await client.send_file(
+                    target,
+                    entry.media if entry.media is not None else entry.input_file,
+                    caption=caption,
+                    force_document=force_document,
+                )
+            except (errors.FileReferenceExpiredError, errors.FilePartMissingError, errors.MediaEmptyError) as exc:
+                # Handle kedaluwarsa di server: unggah ulang sekali lalu coba lagi.
+                self.invalidate(key)
+                if attempt:
+                    raise
+                logger.info("Handle media %s tidak berlaku lagi (%s), mengunggah ulang.", path, exc)
+                continue
+            if entry.media is None and message is not None:
+                entry.media = getattr(message, 'photo', None) or getattr(message, 'document', None)
+            return message
+        return None
+
+
+media_uploads = MediaUploadCache()
@@ -0,0 +1,138 @@
+"""Per-client message router: one Telethon handler fanned out to jobs by chat."""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, FrozenSet, Iterable, List, Optional
+
+from telethon import TelegramClient, events
+
+from core.usecases.matching import KeywordIndex, KeywordRule
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class IncomingMessage:
+    """Message text prepared once per update and shared by every job."""
+
+    text: str
+    lowered: str
+
+
+MessageCallback = Callable[[events.NewMessage.Event, IncomingMessage], Awaitable[None]]
+
+
+@dataclass(eq=False, slots=True)
+class Subscription:
+    name: str
+    chat_ids: FrozenSet[int]
+    callback: MessageCallback
+    rule: Optional[KeywordRule] = None
+
+
+class MessageRouter:
+    """Register a single ``NewMessage`` handler and dispatch through a ``chat_id`` index.
+
+    Telethon evaluates every registered handler's ``chats`` filter for every
+    update. With one handler per client, the cost per update is one dict lookup
+    plus the callbacks of jobs that actually watch that chat.
+
+    Subscriptions with a :class:`KeywordRule` share a per-chat
+    :class:`KeywordIndex`: the message is scanned once for the union of all
+    keywords in that chat and each job only receives messages its rule accepts.
+    Chats watched by the same set of rules share one index object.
+    """
+
+    def __init__(self, client: TelegramClient) -> None:
+        self._client = client
+        self._by_chat: Dict[int, List[Subscription]] = {}
+        self._index_by_chat: Dict[int, KeywordIndex] = {}
+        self._indexes: Dict[FrozenSet[KeywordRule], KeywordIndex] = {}
+        self._event_filter = events.NewMessage(incoming=True)
+        self._registered = False
+
+    async def subscribe(
+        self,
+        targets: Iterable[object],
+        callback: MessageCallback,
+        name: str,
+        rule: Optional[KeywordRule] = None,
+    ) -> Subscription:
+        chat_ids = await self._resolve_targets(targets)
+        subscription = Subscription(name=name, chat_ids=chat_ids, callback=callback, rule=rule)
+        for chat_id in chat_ids:
+            self._by_chat.setdefault(chat_id, []).append(subscription)
+        if rule is not None:
+            self._reindex(chat_ids)
+        if not self._registered:
+            self._client.add_event_handler(self._dispatch, self._event_filter)
+            self._registered = True
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for chat_id in subscription.chat_ids:
+            subscribers = self._by_chat.get(chat_id)
+            if not subscribers:
+                continue
+            try:
+                subscribers.remove(subscription)
+            except ValueError:
+                pass
+            if not subscribers:
+                del self._by_chat[chat_id]
+        if subscription.rule is not None:
+            self._reindex(subscription.chat_ids)
+        if not self._by_chat and self._registered:
+            self._client.remove_event_handler(self._dispatch, self._event_filter)
+            self._registered = False
+
+    def _reindex(self, chat_ids: Iterable[int]) -> None:
+        """Rebuild the keyword index of the given chats only."""
+        for chat_id in chat_ids:
+            rules = frozenset(
+                sub.rule for sub in self._by_chat.get(chat_id, ()) if sub.rule is not None
+            )
+            if not rules:
+                self._index_by_chat.pop(chat_id, None)
+                continue
+            index = self._indexes.get(rules)
+            if index is None:
+                index = self._indexes[rules] = KeywordIndex(rules)
+            self._index_by_chat[chat_id] = index
+        # Buang index yang tidak lagi dipakai chat mana pun.
+        in_use = {id(index) for index in self._index_by_chat.values()}
+        for key in [key for key, index in self._indexes.items() if id(index) not in in_use]:
+            del self._indexes[key]
+
+    async def _resolve_targets(self, targets: Iterable[object]) -> FrozenSet[int]:
+        chat_ids = set()
+        for target in targets:
+            if isinstance(target, int):
+                chat_ids.add(target)
+                continue
+            text = str(target).strip()
+            if text.lstrip("-").isdigit():
+                chat_ids.add(int(text))
+            else:
+                # Username / link: resolusi sekali saat subscribe, bukan per pesan.
+                chat_ids.add(await self._client.get_peer_id(text))
+        return frozenset(chat_ids)
+
+    async def _dispatch(self, event: events.NewMessage.Event) -> None:
+        subscribers = self._by_chat.get(event.chat_id)
+        if not subscribers:
+            return
+        text = event.raw_text or ""
+        if not text:
+            return
+        message = IncomingMessage(text=text, lowered=text.lower())
+        index = self._index_by_chat.get(event.chat_id)
+        hits = index.scan(message.lowered) if index is not None else 0
+        for subscription in tuple(subscribers):
+            if subscription.rule is not None and not (index and index.evaluate(subscription.rule, hits)):
+                continue
+            try:
+                await subscription.callback(event, message)
+            except Exception as exc:  # pragma: no cover - jaringan
+                logger.exception("Handler job %s gagal memproses pesan: %s", subscription.name, exc)
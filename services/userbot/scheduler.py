@@ -0,0 +1,131 @@
+"""Central wall-clock scheduler for the userbot service.
+
+One heap of ``(fire_at, seq, key)`` and one sleeping task serve every
+scheduled job, instead of one ``asyncio.sleep`` coroutine per job. Fire times
+are naive UTC ``datetime`` values; the callback returns the next fire time
+(or ``None`` to finish) and is responsible for persisting it.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FireCallback = Callable[[datetime], Awaitable[Optional[datetime]]]
+
+# Tidur paling lama sekian detik agar perubahan jam sistem tetap terdeteksi.
+MAX_SLEEP_SECONDS = 60.0
+
+
+@dataclass(eq=False, slots=True)
+class _Entry:
+    key: str
+    fire_at: datetime
+    callback: FireCallback
+    running: Optional[asyncio.Task[None]] = field(default=None)
+
+
+class Scheduler:
+    def __init__(self) -> None:
+        self._heap: List[Tuple[datetime, int, _Entry]] = []
+        self._entries: Dict[str, _Entry] = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for key in list(self._entries):
+            await self.cancel(key)
+
+    def schedule(self, key: str, fire_at: datetime, callback: FireCallback) -> None:
+        """Register (or replace) the job ``key`` to fire at ``fire_at``."""
+        previous = self._entries.get(key)
+        if previous is not None and previous.running is not None:
+            previous.running.cancel()
+        entry = _Entry(key=key, fire_at=fire_at, callback=callback)
+        self._entries[key] = entry
+        self._push(entry)
+
+    async def cancel(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None or entry.running is None:
+            return
+        entry.running.cancel()
+        try:
+            await entry.running
+        except asyncio.CancelledError:
+            pass
+
+    def next_fire(self, key: str) -> Optional[datetime]:
+        entry = self._entries.get(key)
+        return entry.fire_at if entry is not None else None
+
+    def _push(self, entry: _Entry) -> None:
+        heapq.heappush(self._heap, (entry.fire_at, next(self._seq), entry))
+        if self._heap[0][2] is entry:
+            self._wakeup.set()
+
+    def _is_current(self, fire_at: datetime, entry: _Entry) -> bool:
+        return self._entries.get(entry.key) is entry and entry.fire_at == fire_at and entry.running is None
+
+    async def _run(self) -> None:
+        while True:
+            # Buang entri yang sudah dibatalkan/diganti.
+            while self._heap and not self._is_current(self._heap[0][0], self._heap[0][2]):
+                heapq.heappop(self._heap)
+
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            fire_at, _, entry = self._heap[0]
+            delay = (fire_at - datetime.utcnow()).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), min(delay, MAX_SLEEP_SECONDS))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            entry.running = asyncio.create_task(self._fire(entry, fire_at))
+
+    async def _fire(self, entry: _Entry, slot: datetime) -> None:
+        next_fire: Optional[datetime] = None
+        try:
+            next_fire = await entry.callback(slot)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # pragma: no cover - bergantung pada job
+            logger.exception("Job terjadwal %s gagal: %s", entry.key, exc)
+        finally:
+            entry.running = None
+
+        if self._entries.get(entry.key) is not entry:
+            return
+        if next_fire is None:
+            del self._entries[entry.key]
+            return
+        entry.fire_at = next_fire
+        self._push(entry)
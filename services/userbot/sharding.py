@@ -0,0 +1,36 @@
+"""Pembagian userbot ke worker runner dengan consistent hashing.
+
+Setiap worker ditempatkan ``replicas`` kali di ring hash 64-bit; sebuah userbot
+dimiliki worker pertama searah jarum jam dari hash ``userbot_id``. Saat worker
+bertambah atau mati, hanya userbot milik worker itu yang berpindah.
+"""
+from __future__ import annotations
+
+import bisect
+import hashlib
+from typing import Iterable, List, Optional, Tuple
+
+# Heartbeat worker ke tabel runner_workers; worker dianggap mati setelah TTL tanpa heartbeat.
+WORKER_HEARTBEAT_INTERVAL = 10.0
+WORKER_TTL_SECONDS = 30.0
+
+
+def _hash(text: str) -> int:
+    # hashlib, bukan hash(): hasilnya harus sama di semua proses worker.
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    def __init__(self, nodes: Iterable[str], replicas: int = 64) -> None:
+        self.nodes: Tuple[str, ...] = tuple(sorted(set(nodes)))
+        points = sorted(
+            (_hash(f"{node}#{replica}"), node) for node in self.nodes for replica in range(replicas)
+        )
+        self._points: List[int] = [point for point, _ in points]
+        self._owners: List[str] = [node for _, node in points]
+
+    def owner(self, key: object) -> Optional[str]:
+        if not self._points:
+            return None
+        idx = bisect.bisect(self._points, _hash(str(key))) % len(self._points)
+        return self._owners[idx]
@@ -0,0 +1,126 @@
+"""Pengiriman baris spool Google Sheets milik watcher yang sudah tidak berjalan.
+
+``BufferedSheetsWriter.close`` hanya mencoba sekali; baris yang tersisa saat
+watcher dihentikan, error, atau diarsip tidak punya writer lagi. Drainer ini
+berjalan di runner, membangun ulang recorder dari ``destination`` task, dan
+mengirim sisa spool tersebut. Baris tidak pernah dibuang di sini: bila sheet
+belum bisa dipakai (izin dicabut, sheet dihapus, tujuan tidak valid), spool
+dicoba lagi dengan jeda yang makin panjang sampai sheet dipulihkan.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.infra.google_sheets import GoogleSheetsError, GoogleSheetsRecorder
+from core.infra.sheet_spool import SheetRowSpool, fetch_orphaned_spools
+from core.infra.sheet_writer import BufferedSheetsWriter
+
+logger = logging.getLogger(__name__)
+
+try:
+    SHEET_DRAIN_INTERVAL = float(os.getenv('SHEET_DRAIN_INTERVAL') or 300)
+except ValueError:
+    logger.warning("SHEET_DRAIN_INTERVAL tidak valid, memakai nilai bawaan 300.")
+    SHEET_DRAIN_INTERVAL = 300.0
+
+# Jeda terpanjang sebelum spool yang gagal terus dicoba lagi.
+SHEET_DRAIN_MAX_BACKOFF = 6 * 3600.0
+
+
+def _sheet_ref(details: Optional[str]) -> str:
+    try:
+        data = json.loads(details) if details else {}
+    except json.JSONDecodeError:
+        return ""
+    destination = data.get("destination") if isinstance(data, dict) else None
+    if not isinstance(destination, dict) or destination.get("mode") != "sheets":
+        return ""
+    return str(destination.get("sheet_ref") or "").strip()
+
+
+class OrphanSpoolDrainer:
+    """Kirim spool Sheets yang task-nya sudah berstatus akhir, per userbot milik runner ini."""
+
+    def __init__(self, owns: Callable[[int], bool], interval: float = SHEET_DRAIN_INTERVAL) -> None:
+        self._owns = owns
+        self._interval = interval
+        # process_id -> (jumlah gagal berturut-turut, waktu monotonic percobaan berikutnya)
+        self._backoff: Dict[str, Tuple[int, float]] = {}
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self.drain_once()
+            except sqlite3.Error as exc:
+                logger.error("Drainer spool Sheets gagal membaca database: %s", exc)
+
+    async def drain_once(self) -> int:
+        """Satu putaran: kirim spool yatim yang userbot-nya dimiliki runner ini; mengembalikan baris terkirim."""
+        written = 0
+        now = time.monotonic()
+        orphans = await asyncio.to_thread(fetch_orphaned_spools)
+        live = {spool["process_id"] for spool in orphans}
+        for process_id in [pid for pid in self._backoff if pid not in live]:
+            del self._backoff[process_id]
+        for spool in orphans:
+            userbot_id = spool["userbot_id"]
+            # Task yang hilang tidak punya pemilik; cukup satu runner yang menanganinya.
+            if not self._owns(userbot_id if userbot_id is not None else 0):
+                continue
+            failures, retry_at = self._backoff.get(spool["process_id"], (0, 0.0))
+            if retry_at > now:
+                continue
+            sent, error = await self._drain(spool)
+            written += sent
+            if error is None:
+                self._backoff.pop(spool["process_id"], None)
+                continue
+            failures += 1
+            delay = min(self._interval * 2 ** (failures - 1), SHEET_DRAIN_MAX_BACKOFF)
+            self._backoff[spool["process_id"]] = (failures, now + delay)
+            logger.warning(
+                "Spool Sheets %s belum bisa dikirim (%s); dicoba lagi dalam %.0f detik.",
+                spool["process_id"], error, delay,
+            )
+        return written
+
+    async def _drain(self, spool: Dict[str, Any]) -> Tuple[int, Optional[str]]:
+        """Kirim spool satu task; mengembalikan (baris terkirim, error bila spool belum habis)."""
+        process_id = spool["process_id"]
+        sheet_ref = _sheet_ref(spool["details"])
+        if not sheet_ref:
+            return 0, "tujuan Google Sheets task tidak ditemukan"
+
+        try:
+            recorder = await GoogleSheetsRecorder.create(sheet_ref)
+        except GoogleSheetsError as exc:
+            return 0, str(exc)
+
+        errors: List[str] = []
+
+        async def _on_flush(written: int, error: Optional[GoogleSheetsError], depth: int) -> None:
+            if error is not None:
+                errors.append(str(error))
+
+        queue = SheetRowSpool(process_id)
+        writer = BufferedSheetsWriter(recorder, queue=queue, on_flush=_on_flush)
+        written = 0
+        remaining = await queue.depth()
+        while remaining:
+            written += await writer.flush()
+            left = await queue.depth()
+            if left >= remaining:
+                break
+            remaining = left
+        if written:
+            logger.info("Mengirim %s baris spool Sheets milik task %s yang sudah berhenti.", written, process_id)
+        if remaining and errors:
+            return written, errors[-1]
+        return written, None
@@ -0,0 +1,106 @@
+"""Supervisor mode sharding: menjalankan N proses worker runner userbot.
+
+Setiap worker adalah ``python -m services.userbot.main --worker-id <id>`` dan
+hanya menjalankan task untuk userbot yang jatuh ke bagiannya di
+:class:`services.userbot.sharding.HashRing`. Worker yang berhenti dijalankan
+ulang dengan backoff; selama worker itu mati, worker lain mengambil alih
+userbot miliknya setelah heartbeat-nya kedaluwarsa.
+"""
+from __future__ import annotations
+
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from pkg.logger import setup_logger
+from core.infra import task_repository, worker_registry
+from core.infra.database import close_db_connections, initialize_database
+
+logger = setup_logger('userbot', 'supervisor')
+
+CHECK_INTERVAL = 1.0
+RESTART_BACKOFF_MIN = 1.0
+RESTART_BACKOFF_MAX = 60.0
+# Worker yang bertahan selama ini dianggap sehat; hitungan gagalnya direset.
+STABLE_AFTER = 60.0
+SHUTDOWN_TIMEOUT = 15.0
+
+
+@dataclass
+class WorkerProcess:
+    worker_id: str
+    process: Optional[subprocess.Popen] = None
+    failures: int = 0
+    started_at: float = 0.0
+    next_start: float = 0.0
+
+
+def worker_ids(count: int) -> List[str]:
+    return [f"w{index}" for index in range(1, count + 1)]
+
+
+def _spawn(worker: WorkerProcess) -> None:
+    command = [sys.executable, '-m', 'services.userbot.main', '--worker-id', worker.worker_id]
+    worker.process = subprocess.Popen(command)
+    worker.started_at = time.monotonic()
+    logger.info("Worker %s dijalankan dengan PID %s.", worker.worker_id, worker.process.pid)
+
+
+def _check(worker: WorkerProcess, now: float) -> None:
+    if worker.process is not None:
+        code = worker.process.poll()
+        if code is None:
+            if worker.failures and now - worker.started_at >= STABLE_AFTER:
+                worker.failures = 0
+            return
+        worker.failures += 1
+        delay = min(RESTART_BACKOFF_MIN * 2 ** (worker.failures - 1), RESTART_BACKOFF_MAX)
+        logger.warning(
+            "Worker %s (PID %s) berhenti dengan kode %s; dijalankan ulang dalam %.0f detik.",
+            worker.worker_id, worker.process.pid, code, delay,
+        )
+        worker.process = None
+        worker.next_start = now + delay
+    if now >= worker.next_start:
+        try:
+            _spawn(worker)
+        except OSError as exc:
+            logger.error("Gagal menjalankan worker %s: %s", worker.worker_id, exc)
+            worker.next_start = now + RESTART_BACKOFF_MAX
+
+
+def _terminate(workers: List[WorkerProcess]) -> None:
+    running = [worker.process for worker in workers if worker.process and worker.process.poll() is None]
+    for process in running:
+        process.terminate()
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+    for process in running:
+        try:
+            process.wait(max(deadline - time.monotonic(), 0.1))
+        except subprocess.TimeoutExpired:
+            logger.warning("Worker PID %s tidak berhenti, dipaksa kill.", process.pid)
+            process.kill()
+
+
+def run_supervisor(worker_count: int) -> None:
+    initialize_database()
+    # Semua worker baru start: task yang tertinggal dari run sebelumnya dikembalikan sekali di sini.
+    recovered = task_repository.reset_inflight_tasks()
+    if recovered:
+        logger.warning("Mengembalikan %s tugas yang belum selesai ke status pending setelah restart.", recovered)
+
+    workers = [WorkerProcess(worker_id) for worker_id in worker_ids(worker_count)]
+    worker_registry.reset_workers(worker.worker_id for worker in workers)
+    logger.info("Supervisor menjalankan %s worker userbot.", worker_count)
+
+    try:
+        while True:
+            now = time.monotonic()
+            for worker in workers:
+                _check(worker, now)
+            time.sleep(CHECK_INTERVAL)
+    finally:
+        _terminate(workers)
+        close_db_connections()
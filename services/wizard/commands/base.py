@@ -9,6 +9,11 @@ from telegram import Update, ReplyKeyboardMarkup
 from telegram.ext import ContextTypes
 
 
+# Balasan ``handle_response`` yang berarti: command selesai, dan teks admin bukan
+# untuk command ini sehingga wizard memprosesnya lagi sebagai pilihan menu.
+REDISPATCH = "\x00redispatch"
+
+
 @dataclass(slots=True)
 class CommandDependencies:
     """Dependencies that every wizard command requires."""
@@ -48,7 +53,9 @@ class WizardCommand(ABC):
         """Process a follow-up message from the admin.
 
         Returns a tuple ``(is_completed, response_message)``. When ``is_completed``
-        is ``True`` the conversation will return to the manage menu.
+        is ``True`` the conversation will return to the manage menu. Returning
+        ``(True, REDISPATCH)`` ends the command and lets the wizard handle the
+        same message as a regular menu selection.
         """
 
     async def cancel(self, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -4,8 +4,10 @@ from __future__ import annotations
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from .base import CommandDependencies, WizardCommand
-from .utils import fetch_userbot_tasks, safe_json_loads
+from .base import REDISPATCH, CommandDependencies, WizardCommand
+from .utils import count_userbot_tasks, fetch_userbot_tasks, page_buttons, safe_json_loads, turn_page
+
+PAGE_SIZE = 15
 
 
 class InfoCommand(WizardCommand):
@@ -17,14 +19,11 @@ class InfoCommand(WizardCommand):
             deps=deps,
         )
 
-    async def entry(self, update: Update, context: ContextTypes.DEFAULT_TYPE, userbot_id: int) -> str | None:
-        tasks = fetch_userbot_tasks(userbot_id)
-        if not tasks:
-            self.reset(context)
-            return "Belum ada tugas yang pernah dijalankan untuk userbot ini."
-
+    def _render_page(self, userbot_id: int, offset: int, total: int) -> str:
+        # Hanya ambil satu halaman; riwayat lengkap tidak perlu dimuat ke memori.
+        tasks = fetch_userbot_tasks(userbot_id, limit=PAGE_SIZE, offset=offset)
         lines = ["📊 *Status Tugas Userbot*", ""]
-        for row in tasks[:15]:  # batasi 15 entri terakhir agar mudah dibaca
+        for row in tasks:
             details = safe_json_loads(row["details"])
             lines.append(
                 "• "
@@ -34,20 +33,64 @@ class InfoCommand(WizardCommand):
                 lines.append(f"  ↳ Nama: {details['label']}")
             if details.get("schedule"):
                 lines.append(f"  ↳ Jadwal: {details['schedule']}")
-        if len(tasks) > 15:
-            lines.append("\nMenampilkan 15 tugas terbaru. Gunakan dashboard SQLite untuk arsip penuh.")
-
-        self.reset(context)
+        if total > PAGE_SIZE:
+            lines.append(
+                f"\nMenampilkan {offset + 1}-{offset + len(tasks)} dari {total} tugas terbaru. "
+                "Tugas lama dipindahkan ke tabel `tasks_archive` oleh retensi otomatis."
+            )
         return "\n".join(lines)
 
+    async def _send_page(self, update: Update, userbot_id: int, offset: int, total: int) -> None:
+        message = update.message
+        assert message is not None
+        text = self._render_page(userbot_id, offset, total)
+        reply_markup = self.make_keyboard([page_buttons(offset, PAGE_SIZE, total)])
+        await message.reply_text(text, reply_markup=reply_markup, parse_mode="Markdown")
+        self.log_out(message.from_user.id, text)
+
+    async def entry(self, update: Update, context: ContextTypes.DEFAULT_TYPE, userbot_id: int) -> str | None:
+        total = count_userbot_tasks(userbot_id)
+        if not total:
+            self.reset(context)
+            return "Belum ada tugas yang pernah dijalankan untuk userbot ini."
+        if total <= PAGE_SIZE:
+            self.reset(context)
+            return self._render_page(userbot_id, 0, total)
+
+        # Lebih dari satu halaman: tetap di command ini agar tombol navigasi bisa dipakai.
+        state = self.get_state(context)
+        state.clear()
+        state["offset"] = 0
+        await self._send_page(update, userbot_id, 0, total)
+        return None
+
     async def handle_response(
         self,
         update: Update,
         context: ContextTypes.DEFAULT_TYPE,
         userbot_id: int,
     ) -> tuple[bool, str | None]:
-        self.reset(context)
-        return True, None
+        message = update.message
+        assert message is not None
+        text = (message.text or "").strip()
+        if self.is_back(text):
+            self.reset(context)
+            return True, None
+
+        state = self.get_state(context)
+        total = count_userbot_tasks(userbot_id)
+        offset = turn_page(text, state.get("offset", 0), PAGE_SIZE, total)
+        if offset is None:
+            # Bukan tombol navigasi (mis. tombol menu lain): serahkan kembali ke wizard.
+            self.reset(context)
+            return True, REDISPATCH
+        if not total:
+            self.reset(context)
+            return True, "Belum ada tugas yang pernah dijalankan untuk userbot ini."
+
+        state["offset"] = offset
+        await self._send_page(update, userbot_id, offset, total)
+        return False, None
 
 
 def build_command(deps: CommandDependencies) -> InfoCommand:
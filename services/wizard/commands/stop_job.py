@@ -7,10 +7,18 @@ from telegram import Update
 from telegram.ext import ContextTypes
 
 from .base import CommandDependencies, WizardCommand
-from .utils import fetch_userbot_tasks, mark_tasks_stopped, parse_selection_indexes
+from .utils import (
+    count_userbot_tasks,
+    fetch_userbot_tasks,
+    mark_tasks_stopped,
+    page_buttons,
+    parse_selection_indexes,
+    turn_page,
+)
 
 
-STOPPABLE_STATUSES = {"pending", "running", "scheduled", "interval"}
+STOPPABLE_STATUSES = {"pending", "claimed", "running", "scheduled", "interval"}
+PAGE_SIZE = 10
 
 
 class StopJobCommand(WizardCommand):
@@ -22,16 +30,42 @@ class StopJobCommand(WizardCommand):
             deps=deps,
         )
 
+    async def _send_page(self, update: Update, context: ContextTypes.DEFAULT_TYPE, userbot_id: int, offset: int, total: int) -> None:
+        message = update.message
+        assert message is not None
+        tasks = fetch_userbot_tasks(userbot_id, statuses=STOPPABLE_STATUSES, limit=PAGE_SIZE, offset=offset)
+        state = self.get_state(context)
+        state["offset"] = offset
+        state["tasks"] = [dict(row) for row in tasks]
+
+        lines = [
+            "⛔ *Stop Jobs*",
+            "Process ID bisa dilihat melalui menu 📊 Job Status.",
+            "• Ketik angka (contoh `1` atau `1,3`) untuk memilih dari halaman di bawah.",
+            "• Masukkan langsung Process ID (misal: `d5f3-1234`).",
+            "• Ketik `all` untuk menghentikan semua task aktif.",
+            "Ketik 'batal' kapan saja untuk kembali.",
+            "",
+        ]
+        for idx, row in enumerate(tasks, start=1):
+            lines.append(f"{idx}. {row['command']} — `{row['process_id']}` ({row['status']})")
+        if total > PAGE_SIZE:
+            lines.append(f"\nMenampilkan {offset + 1}-{offset + len(tasks)} dari {total} task aktif.")
+
+        text = "\n".join(lines)
+        reply_markup = self.make_keyboard([page_buttons(offset, PAGE_SIZE, total)])
+        await message.reply_text(text, reply_markup=reply_markup, parse_mode="Markdown")
+        self.log_out(message.from_user.id, text)
+
     async def entry(self, update: Update, context: ContextTypes.DEFAULT_TYPE, userbot_id: int) -> str | None:
         message = update.message
         if message is None:
             return None
-        tasks = [row for row in fetch_userbot_tasks(userbot_id) if row["status"] in STOPPABLE_STATUSES]
         state = self.get_state(context)
         state.clear()
-        state["tasks"] = [dict(row) for row in tasks]
+        total = count_userbot_tasks(userbot_id, statuses=STOPPABLE_STATUSES)
 
-        if not tasks:
+        if not total:
             self.reset(context)
             info = (
                 "⛔ *Stop Jobs*\n"
@@ -41,25 +75,8 @@ class StopJobCommand(WizardCommand):
             self.log_out(message.from_user.id, info)
             return None
 
-        lines = [
-            "⛔ *Stop Jobs*",
-            "Process ID bisa dilihat melalui menu 📊 Job Status.",
-            "• Ketik angka (contoh `1` atau `1,3`) untuk memilih dari daftar di bawah.",
-            "• Masukkan langsung Process ID (misal: `d5f3-1234`).",
-            "• Ketik `all` untuk menghentikan semua task aktif.",
-            "Ketik 'batal' kapan saja untuk kembali.",
-            "",
-        ]
-        preview_limit = 10
-        for idx, row in enumerate(tasks[:preview_limit], start=1):
-            lines.append(f"{idx}. {row['command']} — `{row['process_id']}` ({row['status']})")
-        if len(tasks) > preview_limit:
-            lines.append(f"\nMenampilkan {preview_limit} task pertama. Lihat 📊 Job Status untuk daftar lengkap.")
-
         state["step"] = "await_selection"
-        text = "\n".join(lines)
-        await message.reply_text(text, reply_markup=self.make_keyboard(), parse_mode="Markdown")
-        self.log_out(message.from_user.id, text)
+        await self._send_page(update, context, userbot_id, 0, total)
         return None
 
     async def handle_response(
@@ -73,7 +90,7 @@ class StopJobCommand(WizardCommand):
         text = (message.text or "").strip()
         lower = text.lower()
 
-        if lower in {"batal", "cancel", "/cancel"}:
+        if lower in {"batal", "cancel", "/cancel"} or self.is_back(text):
             self.reset(context)
             return True, "Tidak ada task yang dihentikan."
 
@@ -83,12 +100,23 @@ class StopJobCommand(WizardCommand):
             self.reset(context)
             return True, "Terjadi kesalahan, silakan buka menu lagi."
 
+        total = count_userbot_tasks(userbot_id, statuses=STOPPABLE_STATUSES)
+        offset = turn_page(text, state.get("offset", 0), PAGE_SIZE, total)
+        if offset is not None:
+            if not total:
+                self.reset(context)
+                return True, "Saat ini tidak ada task aktif."
+            await self._send_page(update, context, userbot_id, offset, total)
+            return False, None
+
         tasks: List[dict] = state.get("tasks", [])
         process_ids: List[str]
 
         try:
             if lower == "all":
-                process_ids = [row["process_id"] for row in tasks]
+                process_ids = [
+                    row["process_id"] for row in fetch_userbot_tasks(userbot_id, statuses=STOPPABLE_STATUSES)
+                ]
             elif text.count("-") >= 1 and len(text) > 10:
                 process_ids = [text]
             else:
@@ -6,47 +6,95 @@ import sqlite3
 import uuid
 from typing import Iterable, List, Sequence, Tuple
 
-from core.infra.database import get_db_connection
+from core.infra.database import get_db_connection, transaction
+from core.infra.task_signals import notify_task_runner
 
 
 def fetch_userbot_groups(userbot_id: int, group_type: str | None = None) -> Sequence[sqlite3.Row]:
-    conn = get_db_connection()
-    try:
-        base_query = "SELECT telegram_group_id, group_name, group_type, username FROM groups WHERE userbot_id = ?"
-        params: list = [userbot_id]
-        if group_type:
-            base_query += " AND group_type = ?"
-            params.append(group_type)
-        base_query += " ORDER BY group_name"
-        return conn.execute(base_query, params).fetchall()
-    finally:
-        conn.close()
+    base_query = "SELECT telegram_group_id, group_name, group_type, username FROM groups WHERE userbot_id = ?"
+    params: list = [userbot_id]
+    if group_type:
+        base_query += " AND group_type = ?"
+        params.append(group_type)
+    base_query += " ORDER BY group_name"
+    return get_db_connection().execute(base_query, params).fetchall()
 
 
 def get_group_stats(userbot_id: int) -> Tuple[int, int]:
-    conn = get_db_connection()
-    try:
-        row = conn.execute(
-            "SELECT "
-            "SUM(CASE WHEN group_type = 'group' THEN 1 ELSE 0 END) AS groups_count,"
-            "SUM(CASE WHEN group_type = 'channel' THEN 1 ELSE 0 END) AS channels_count"
-            " FROM groups WHERE userbot_id = ?",
-            (userbot_id,),
-        ).fetchone()
-        return (row["groups_count"] or 0, row["channels_count"] or 0) if row else (0, 0)
-    finally:
-        conn.close()
-
-
-def fetch_userbot_tasks(userbot_id: int) -> Sequence[sqlite3.Row]:
-    conn = get_db_connection()
-    try:
-        return conn.execute(
-            "SELECT id, process_id, command, status, start_time, details FROM tasks WHERE userbot_id = ? ORDER BY id DESC",
-            (userbot_id,),
-        ).fetchall()
-    finally:
-        conn.close()
+    row = get_db_connection().execute(
+        "SELECT "
+        "SUM(CASE WHEN group_type = 'group' THEN 1 ELSE 0 END) AS groups_count,"
+        "SUM(CASE WHEN group_type = 'channel' THEN 1 ELSE 0 END) AS channels_count"
+        " FROM groups WHERE userbot_id = ?",
+        (userbot_id,),
+    ).fetchone()
+    return (row["groups_count"] or 0, row["channels_count"] or 0) if row else (0, 0)
+
+
+def _task_filters(userbot_id: int, command: str | None, statuses: Iterable[str] | None) -> tuple[str, list]:
+    clause = "WHERE userbot_id = ?"
+    params: list = [userbot_id]
+    if command:
+        clause += " AND command = ?"
+        params.append(command)
+    if statuses:
+        status_list = list(statuses)
+        clause += f" AND status IN ({', '.join('?' for _ in status_list)})"
+        params.extend(status_list)
+    return clause, params
+
+
+def fetch_userbot_tasks(
+    userbot_id: int,
+    command: str | None = None,
+    statuses: Iterable[str] | None = None,
+    limit: int | None = None,
+    offset: int = 0,
+) -> Sequence[sqlite3.Row]:
+    """Ambil task terbaru lebih dulu; gunakan ``limit``/``offset`` untuk paginasi."""
+    clause, params = _task_filters(userbot_id, command, statuses)
+    query = f"SELECT id, process_id, command, status, start_time, details FROM tasks {clause} ORDER BY id DESC"
+    if limit is not None:
+        query += " LIMIT ? OFFSET ?"
+        params.extend((limit, offset))
+    return get_db_connection().execute(query, params).fetchall()
+
+
+def count_userbot_tasks(
+    userbot_id: int,
+    command: str | None = None,
+    statuses: Iterable[str] | None = None,
+) -> int:
+    clause, params = _task_filters(userbot_id, command, statuses)
+    row = get_db_connection().execute(f"SELECT COUNT(*) AS total FROM tasks {clause}", params).fetchone()
+    return row["total"] if row else 0
+
+
+PAGE_PREV = "⬅️ Sebelumnya"
+PAGE_NEXT = "Berikutnya ➡️"
+
+
+def page_buttons(offset: int, page_size: int, total: int) -> List[str]:
+    """Tombol navigasi yang relevan untuk halaman ``offset`` dari ``total`` baris."""
+    buttons: List[str] = []
+    if offset > 0:
+        buttons.append(PAGE_PREV)
+    if offset + page_size < total:
+        buttons.append(PAGE_NEXT)
+    return buttons
+
+
+def turn_page(text: str, offset: int, page_size: int, total: int) -> int | None:
+    """Offset baru jika ``text`` adalah tombol navigasi, selain itu ``None``."""
+    if text == PAGE_NEXT:
+        offset += page_size
+    elif text == PAGE_PREV:
+        offset -= page_size
+    else:
+        return None
+    # Jumlah task bisa berkurang di antara dua halaman (stop/retensi); jaga offset tetap di halaman terakhir.
+    last_page = max(total - 1, 0) // page_size * page_size
+    return max(min(offset, last_page), 0)
 
 
 def create_task(
@@ -56,17 +104,14 @@ def create_task(
     status: str = "pending",
 ) -> tuple[str, int]:
     process_id = str(uuid.uuid4())
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute(
+    with transaction() as conn:
+        cursor = conn.execute(
             "INSERT INTO tasks (userbot_id, process_id, command, status, details) VALUES (?, ?, ?, ?, ?)",
             (userbot_id, process_id, command, status, json.dumps(details)),
         )
-        conn.commit()
-        return process_id, cursor.lastrowid
-    finally:
-        conn.close()
+        task_id = cursor.lastrowid
+    notify_task_runner("pending")
+    return process_id, task_id
 
 
 def parse_selection_indexes(text: str, max_index: int) -> List[int]:
@@ -99,15 +144,14 @@ def mark_tasks_stopped(userbot_id: int, process_ids: Iterable[str]) -> None:
     ids = list(process_ids)
     if not ids:
         return
-    conn = get_db_connection()
-    try:
+    with transaction() as conn:
+        # Runner yang mengubah 'stop_requested' menjadi 'stopped' setelah job benar-benar berhenti.
         conn.executemany(
-            "UPDATE tasks SET status = 'stopped' WHERE userbot_id = ? AND process_id = ?",
+            "UPDATE tasks SET status = 'stop_requested', updated_at = CURRENT_TIMESTAMP "
+            "WHERE userbot_id = ? AND process_id = ? AND status NOT IN ('completed', 'error', 'stopped')",
             [(userbot_id, pid) for pid in ids],
         )
-        conn.commit()
-    finally:
-        conn.close()
+    notify_task_runner("stop")
 
 
 def parse_custom_target_ids(raw: str) -> List[int]:
@@ -151,7 +151,7 @@ class WatcherCommand(WizardCommand):
         return False, "❌ Pilih opsi yang tersedia."
 
     async def _show_watcher_logs(self, message: Message, userbot_id: int) -> None:
-        rows = [row for row in fetch_userbot_tasks(userbot_id) if row["command"] == "watcher"]
+        rows = fetch_userbot_tasks(userbot_id, command="watcher", limit=8)
         if not rows:
             info = "Belum ada task Watcher untuk userbot ini."
             reply_markup = self.make_keyboard([[ACTION_CREATE], [ACTION_LOGS]])
@@ -161,14 +161,16 @@ class WatcherCommand(WizardCommand):
 
         status_icon = {
             "pending": "⏳",
+            "claimed": "⏳",
             "running": "🟡",
             "completed": "✅",
             "error": "❌",
+            "stop_requested": "⛔",
             "stopped": "⛔",
         }
 
         lines: list[str] = ["📜 Watcher Logs (maks 8 terbaru)"]
-        for idx, row in enumerate(rows[:8], start=1):
+        for idx, row in enumerate(rows, start=1):
             details = safe_json_loads(row["details"])
             label = details.get("label") or "(Tanpa label)"
             status = (row["status"] or "").lower()
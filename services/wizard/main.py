@@ -25,7 +25,7 @@ from telethon.sessions import StringSession
 from telethon.errors import SessionPasswordNeededError
 
 from .commands import build_command_registry
-from .commands.base import CommandDependencies, WizardCommand
+from .commands.base import REDISPATCH, CommandDependencies, WizardCommand
 from .commands.utils import create_task as enqueue_task, parse_custom_target_ids
 
 # Muat environment variables dari .env di root proyek
@@ -34,7 +34,7 @@ load_dotenv()
 # Impor modul proyek (sekarang berfungsi karena dijalankan dari root)
 from pkg.logger import setup_logger
 from pkg.pid_manager import PIDManager
-from core.infra.database import get_db_connection, initialize_database
+from core.infra.database import close_db_connections, get_db_connection, initialize_database, transaction
 
 # Setup logger
 logger = setup_logger('wizard', 'main')
@@ -347,8 +347,7 @@ async def _finalize_userbot_creation(update: Update, context: ContextTypes.DEFAU
     user = await client.get_me()
     string_session = client.session.save()
 
-    conn = get_db_connection()
-    try:
+    with transaction() as conn:
         cursor = conn.cursor()
         try:
             cursor.execute(
@@ -356,26 +355,20 @@ async def _finalize_userbot_creation(update: Update, context: ContextTypes.DEFAU
                 (user.id, user.username, string_session, 'inactive')
             )
             userbot_id = cursor.lastrowid
-            conn.commit()
             created_msg = "✅ String session baru berhasil dibuat dan disimpan. 🎉"
         except sqlite3.IntegrityError:
             existing = cursor.execute(
                 "SELECT id FROM userbots WHERE telegram_id = ? OR string_session = ?",
                 (user.id, string_session)
             ).fetchone()
-            if existing:
-                cursor.execute(
-                    "UPDATE userbots SET string_session = ?, username = ?, status = 'inactive', telegram_id = ? WHERE id = ?",
-                    (string_session, user.username, user.id, existing['id'])
-                )
-                conn.commit()
-                userbot_id = existing['id']
-                created_msg = "✅ String session diperbarui untuk userbot yang sudah ada. 🔄"
-            else:
-                conn.rollback()
+            if not existing:
                 raise
-    finally:
-        conn.close()
+            cursor.execute(
+                "UPDATE userbots SET string_session = ?, username = ?, status = 'inactive', telegram_id = ? WHERE id = ?",
+                (string_session, user.username, user.id, existing['id'])
+            )
+            userbot_id = existing['id']
+            created_msg = "✅ String session diperbarui untuk userbot yang sudah ada. 🔄"
 
     response = (
         f"{created_msg}\n\n🔑 String session:\n`{string_session}`\n\n"
@@ -863,9 +856,8 @@ async def receive_session_string(update: Update, context: ContextTypes.DEFAULT_T
         return ConversationHandler.END
 
     try:
-        conn = get_db_connection()
-        conn.execute("INSERT INTO userbots (string_session, status) VALUES (?, ?)", (session_string, 'inactive'))
-        conn.commit()
+        with transaction() as conn:
+            conn.execute("INSERT INTO userbots (string_session, status) VALUES (?, ?)", (session_string, 'inactive'))
         logger.info("String session baru disimpan lewat wizard.")
         message = "String session berhasil disimpan! 🎉\nGunakan menu 🛠️ Kelola Userbot untuk menjalankan tugas."
         await update.message.reply_text(message, reply_markup=MAIN_MENU_MARKUP)
@@ -879,19 +871,13 @@ async def receive_session_string(update: Update, context: ContextTypes.DEFAULT_T
         message = "Terjadi kesalahan saat menyimpan string session. Cek log wizard untuk detailnya."
         await update.message.reply_text(message, reply_markup=MAIN_MENU_MARKUP)
         log_outgoing(update.effective_user.id, message)
-    finally:
-        if 'conn' in locals(): conn.close()
     return ConversationHandler.END
 
 def _fetch_userbots() -> list[dict]:
-    conn = get_db_connection()
-    try:
-        rows = conn.execute(
-            "SELECT id, username, status FROM userbots ORDER BY id"
-        ).fetchall()
-        return [dict(row) for row in rows]
-    finally:
-        conn.close()
+    rows = get_db_connection().execute(
+        "SELECT id, username, status FROM userbots ORDER BY id"
+    ).fetchall()
+    return [dict(row) for row in rows]
 
 
 def _format_userbot_name(userbot: dict) -> str:
@@ -1067,6 +1053,11 @@ async def handle_manage_text(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await handle_active_command_message(update, context)
         return
 
+    await _dispatch_manage_text(update, context, text)
+
+
+async def _dispatch_manage_text(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> None:
+    """Proses teks menu Kelola Userbot saat tidak ada command yang aktif."""
     if text == CMD_BACK_TO_MENU:
         context.user_data['manage_active'] = False
         context.user_data.pop('active_command_slug', None)
@@ -1134,6 +1125,14 @@ async def handle_active_command_message(update: Update, context: ContextTypes.DE
 
     completed, response_message = await command.handle_response(update, context, userbot['id'])
 
+    if response_message == REDISPATCH:
+        # Admin menekan tombol menu lain selagi command aktif: tutup command lalu jalankan pilihan itu.
+        context.user_data.pop('active_command_slug', None)
+        command.reset(context)
+        context.user_data['manage_active'] = True
+        await _dispatch_manage_text(update, context, message.text.strip())
+        return
+
     if response_message:
         markup = MANAGE_COMMAND_MARKUP if completed else ReplyKeyboardRemove()
         if completed:
@@ -1196,6 +1195,8 @@ def main() -> None:
         except Exception as err:
             logger.exception("Wizard gagal dijalankan: %s", err)
             sys.exit(1)
+        finally:
+            close_db_connections()
 
 if __name__ == "__main__":
     main()
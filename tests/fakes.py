@@ -0,0 +1,99 @@
+"""Offline fakes for the Google Sheets helpers."""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from gspread.exceptions import APIError
+
+from core.infra.google_sheets import GoogleSheetsRecorder
+
+
+def api_error(status: int) -> APIError:
+    """``APIError`` as gspread raises it for an HTTP ``status`` response."""
+    payload = {"error": {"code": status, "message": f"HTTP {status}", "status": "FAKE"}}
+    response = SimpleNamespace(status_code=status, text=f"HTTP {status}", json=lambda: payload)
+    return APIError(response)
+
+
+class InMemoryWorksheet:
+    """Offline stand-in for ``gspread.Worksheet`` covering the calls used here.
+
+    ``fail_with`` holds the outcome of the next write calls (one per call):
+    an exception is raised, ``None`` lets the call succeed. This makes retry
+    and backoff behaviour easy to exercise without network access.
+    ``append_calls`` counts API calls, ``rows`` keeps data.
+    """
+
+    def __init__(self, title: str = "Sheet1", worksheet_id: int = 0) -> None:
+        self.title = title
+        self.id = worksheet_id
+        self.rows: List[List[str]] = []
+        self.append_calls = 0
+        self.fail_with: Deque[Optional[Exception]] = deque()
+
+    def _maybe_fail(self) -> None:
+        if self.fail_with:
+            error = self.fail_with.popleft()
+            if error is not None:
+                raise error
+
+    def append_row(self, values: Sequence[Any], value_input_option: str = "RAW") -> None:
+        self.append_rows([values], value_input_option=value_input_option)
+
+    def append_rows(self, values: Sequence[Sequence[Any]], value_input_option: str = "RAW") -> None:
+        self.append_calls += 1
+        self._maybe_fail()
+        self.rows.extend([list(row) for row in values])
+
+    def get_values(self, range_name: str = "") -> List[List[str]]:
+        if range_name == "1:1":
+            return [self.rows[0]] if self.rows else []
+        return [list(row) for row in self.rows]
+
+    def insert_row(self, values: Sequence[Any], index: int = 1) -> None:
+        self._maybe_fail()
+        self.rows.insert(index - 1, list(values))
+
+
+def make_recorder(worksheet: InMemoryWorksheet) -> GoogleSheetsRecorder:
+    return GoogleSheetsRecorder(
+        worksheet=worksheet,
+        spreadsheet_title="Test",
+        worksheet_title=worksheet.title,
+        spreadsheet_id="spreadsheet-test",
+        worksheet_id=worksheet.id,
+        _lock=asyncio.Lock(),
+        sheet_ref="spreadsheet-test",
+    )
+
+
+class DurableMemoryQueue:
+    """``RowQueue`` with durable semantics (rows are kept on failure), held in memory."""
+
+    durable = True
+
+    def __init__(self) -> None:
+        self.rows: Dict[int, List[str]] = {}
+        self.dead: Dict[int, Tuple[List[str], str]] = {}
+        self._next_key = 0
+
+    async def put(self, row: List[str]) -> None:
+        self._next_key += 1
+        self.rows[self._next_key] = row
+
+    async def peek(self, limit: int) -> List[Tuple[int, List[str]]]:
+        return sorted(self.rows.items())[:limit]
+
+    async def ack(self, keys: Sequence[int]) -> None:
+        for key in keys:
+            self.rows.pop(key, None)
+
+    async def depth(self) -> int:
+        return len(self.rows)
+
+    async def dead_letter(self, keys: Sequence[int], error: str) -> None:
+        for key in keys:
+            self.dead[key] = (self.rows.pop(key), error)
@@ -0,0 +1,118 @@
+"""Tests for batching, retries and rejected rows in ``core.infra.sheet_writer``."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from core.infra import database
+from core.infra.sheet_writer import BufferedSheetsWriter, append_rows_with_retry
+
+from tests.fakes import DurableMemoryQueue, InMemoryWorksheet, api_error, make_recorder
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    # HTTP 400 menghapus header terverifikasi dari tabel config; pakai database sementara.
+    monkeypatch.setattr(database, "DB_FILE", str(tmp_path / "userbots.db"))
+    database.close_db_connections()
+    database.initialize_database()
+    yield
+    database.close_db_connections()
+
+
+def _writer(worksheet: InMemoryWorksheet, **kwargs) -> BufferedSheetsWriter:
+    return BufferedSheetsWriter(make_recorder(worksheet), base_backoff=0.0, max_backoff=0.0, **kwargs)
+
+
+def test_rows_are_sent_in_batches():
+    worksheet = InMemoryWorksheet()
+
+    async def scenario() -> None:
+        writer = _writer(worksheet, batch_size=3)
+        for idx in range(7):
+            await writer.append([f"row-{idx}", idx])
+        while writer.pending:
+            await writer.flush()
+
+    asyncio.run(scenario())
+    assert worksheet.append_calls == 3
+    assert worksheet.rows == [[f"row-{idx}", str(idx)] for idx in range(7)]
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_transient_errors_are_retried(status):
+    worksheet = InMemoryWorksheet()
+    worksheet.fail_with.extend([api_error(status), api_error(status)])
+
+    asyncio.run(append_rows_with_retry(make_recorder(worksheet), [["a"], ["b"]], max_retries=3, base_backoff=0.0))
+
+    assert worksheet.append_calls == 3
+    assert worksheet.rows == [["a"], ["b"]]
+
+
+def test_durable_queue_keeps_rows_after_transient_failures():
+    worksheet = InMemoryWorksheet()
+    worksheet.fail_with.extend([api_error(503), api_error(503)])
+    queue = DurableMemoryQueue()
+
+    async def scenario() -> int:
+        writer = _writer(worksheet, queue=queue)
+        await writer.append(["a"])
+        return await writer.flush(max_retries=1)
+
+    assert asyncio.run(scenario()) == 0
+    assert list(queue.rows.values()) == [["a"]]
+    assert not queue.dead
+
+
+def test_rejected_batch_is_split_and_only_bad_rows_dead_lettered(temp_db):
+    worksheet = InMemoryWorksheet()
+    # Batch ditolak (400), lalu per baris: baris kedua tetap ditolak.
+    worksheet.fail_with.extend([api_error(400), None, api_error(400), None])
+    queue = DurableMemoryQueue()
+
+    async def scenario() -> int:
+        writer = _writer(worksheet, queue=queue)
+        for value in ("ok-1", "bad", "ok-2"):
+            await writer.append([value])
+        return await writer.flush()
+
+    assert asyncio.run(scenario()) == 2
+    assert worksheet.rows == [["ok-1"], ["ok-2"]]
+    assert not queue.rows
+    assert [row for row, _ in queue.dead.values()] == [["bad"]]
+
+
+@pytest.mark.parametrize("status", [403, 404])
+def test_sheet_level_rejections_keep_rows_queued(status):
+    worksheet = InMemoryWorksheet()
+    worksheet.fail_with.append(api_error(status))
+    queue = DurableMemoryQueue()
+
+    async def scenario() -> int:
+        writer = _writer(worksheet, queue=queue)
+        await writer.append(["a"])
+        await writer.append(["b"])
+        return await writer.flush()
+
+    assert asyncio.run(scenario()) == 0
+    assert worksheet.append_calls == 1
+    assert list(queue.rows.values()) == [["a"], ["b"]]
+    assert not queue.dead
+
+
+def test_invalid_row_data_is_not_retried():
+    worksheet = InMemoryWorksheet()
+    worksheet.fail_with.append(TypeError("Object of type set is not JSON serializable"))
+    queue = DurableMemoryQueue()
+
+    async def scenario() -> int:
+        writer = _writer(worksheet, queue=queue)
+        await writer.append(["a"])
+        return await writer.flush()
+
+    assert asyncio.run(scenario()) == 0
+    assert worksheet.append_calls == 1
+    assert not queue.rows
+    assert [row for row, _ in queue.dead.values()] == [["a"]]